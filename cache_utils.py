@@ -0,0 +1,197 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from cdp_utils import CdpConnection, CdpError, debugger_address
+
+DEFAULT_CACHE_DIR = Path(os.getenv("APPDATA", ".")) / "TRC_AUTO" / "asset_cache"
+# Bump to drop every cached asset, e.g. if the stored format changes
+CACHE_VERSION = "v1"
+ASSET_CACHE_MAX_MB = 200
+CACHEABLE_TYPES = ("Script", "Stylesheet", "Font")
+# Hosts serving the form's versioned static bundles; form and response endpoints never match
+CACHEABLE_HOSTS = ("www.gstatic.com", "fonts.gstatic.com", "ssl.gstatic.com", "fonts.googleapis.com")
+# Dropped when replaying, since getResponseBody returns the decoded body
+SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+def is_cacheable(url, resource_type):
+    """Tell whether a request is a static form asset that may be served from disk."""
+    parsed = urlparse(url)
+    return resource_type in CACHEABLE_TYPES and parsed.scheme == "https" and parsed.hostname in CACHEABLE_HOSTS
+
+class AssetCache:
+    """Versioned disk cache of static assets, keyed by URL."""
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=ASSET_CACHE_MAX_MB):
+        self.dir = Path(cache_dir) / CACHE_VERSION
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self._session = None
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.dir / f"{key}.body", self.dir / f"{key}.json"
+
+    def get(self, url):
+        """Return (headers, body) for a cached URL, or None."""
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        os.utime(meta_path)
+        return meta["headers"], body
+
+    def put(self, url, headers, body):
+        """Store an asset; the body is written before its metadata so a partial entry is never read."""
+        body_path, meta_path = self._paths(url)
+        kept = [h for h in headers if h["name"].lower() not in SKIPPED_HEADERS]
+        try:
+            tmp_path = body_path.with_suffix(".tmp")
+            tmp_path.write_bytes(body)
+            os.replace(tmp_path, body_path)
+            meta_path.write_text(json.dumps({"url": url, "headers": kept}), encoding="utf-8")
+        except OSError as e:
+            logging.warning(f"Failed to cache asset {url}: {e}")
+
+    def prune(self):
+        """Evict the least recently used assets until the cache fits in its size limit."""
+        entries = []
+        total = 0
+        for meta_path in self.dir.glob("*.json"):
+            body_path = meta_path.with_suffix(".body")
+            try:
+                size = body_path.stat().st_size
+                entries.append((meta_path.stat().st_mtime, size, meta_path, body_path))
+            except OSError:
+                continue
+            total += size
+        for _, size, meta_path, body_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+
+    async def _on_paused(self, connection, params, session_id):
+        """Serve a paused request from disk, or let it through and store its response."""
+        request_id = params["requestId"]
+        url = params["request"]["url"]
+        try:
+            if "responseStatusCode" not in params:
+                cached = self.get(url) if is_cacheable(url, params.get("resourceType")) else None
+                if cached is None:
+                    await connection.send("Fetch.continueRequest", {"requestId": request_id}, session_id)
+                    return
+                headers, body = cached
+                await connection.send("Fetch.fulfillRequest", {
+                    "requestId": request_id, "responseCode": 200, "responseHeaders": headers,
+                    "body": base64.b64encode(body).decode("ascii"),
+                }, session_id)
+                self.hits += 1
+                self.bytes_served += len(body)
+                return
+            if params["responseStatusCode"] == 200 and is_cacheable(url, params.get("resourceType")):
+                result = await connection.send("Fetch.getResponseBody", {"requestId": request_id}, session_id)
+                body = result["body"]
+                body = base64.b64decode(body) if result.get("base64Encoded") else body.encode("utf-8")
+                self.put(url, params.get("responseHeaders", []), body)
+                self.misses += 1
+            await connection.send("Fetch.continueRequest", {"requestId": request_id}, session_id)
+        except (CdpError, asyncio.TimeoutError, KeyError, ValueError) as e:
+            logging.debug(f"Asset cache could not handle {url}: {e}")
+            # A paused request that is never continued would stall the page
+            try:
+                await connection.send("Fetch.continueRequest", {"requestId": request_id}, session_id)
+            except (CdpError, asyncio.TimeoutError):
+                pass
+
+    async def _attach(self, connection, target_id):
+        """Attach to a page and intercept its static asset requests at both stages."""
+        try:
+            attached = await connection.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})
+            patterns = [
+                {"urlPattern": f"https://{host}/*", "resourceType": resource_type, "requestStage": stage}
+                for host in CACHEABLE_HOSTS for resource_type in CACHEABLE_TYPES for stage in ("Request", "Response")
+            ]
+            await connection.send("Fetch.enable", {"patterns": patterns}, attached["sessionId"])
+        except CdpError as e:
+            logging.debug(f"Asset cache could not attach to target {target_id}: {e}")
+
+    async def _serve(self, address, stop):
+        """Intercept every page target of the browser until it closes or stop is set."""
+        connection = await CdpConnection.connect(address)
+        tasks = set()
+
+        def spawn(coroutine):
+            task = asyncio.ensure_future(coroutine)
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        def listener(method, params, session_id):
+            if method == "Fetch.requestPaused":
+                spawn(self._on_paused(connection, params, session_id))
+            elif method == "Target.targetCreated" and params["targetInfo"]["type"] == "page":
+                spawn(self._attach(connection, params["targetInfo"]["targetId"]))
+
+        connection.add_listener(listener)
+        try:
+            # Also reports the pages that already exist, so they are attached too
+            await connection.send("Target.setDiscoverTargets", {"discover": True})
+            waiters = [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(connection.wait_closed())]
+            _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in pending:
+                waiter.cancel()
+        finally:
+            await connection.close()
+
+    def start(self, driver):
+        """Serve the driver's browser from the cache in a background thread until it quits."""
+        self.stop()
+        address = debugger_address(driver)
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            stop = asyncio.Event()
+            self._session = (loop, stop)
+            ready.set()
+            try:
+                loop.run_until_complete(self._serve(address, stop))
+            except Exception as e:
+                logging.warning(f"Asset cache stopped: {e}")
+            finally:
+                loop.close()
+                logging.info(
+                    f"Asset cache: {self.hits} hits ({self.bytes_served / 1024:.0f} KB), {self.misses} stored"
+                )
+
+        self.prune()
+        threading.Thread(target=run, name="asset-cache", daemon=True).start()
+        ready.wait()
+        logging.info(f"Serving static form assets from {self.dir}")
+        return driver
+
+    def stop(self):
+        """Stop intercepting the current browser, if any."""
+        if self._session is not None:
+            loop, stop = self._session
+            self._session = None
+            try:
+                loop.call_soon_threadsafe(stop.set)
+            except RuntimeError:
+                pass  # The loop already finished because the browser quit
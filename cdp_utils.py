@@ -0,0 +1,161 @@
+import asyncio
+import itertools
+import json
+import logging
+import aiohttp
+
+class CdpError(Exception):
+    """Raised when a DevTools command returns an error or a script throws."""
+
+def debugger_address(driver):
+    """Return the host:port of the DevTools endpoint of a Chrome launched by Selenium."""
+    return driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+
+class CdpConnection:
+    """Minimal asyncio Chrome DevTools Protocol client over one browser-level websocket."""
+    def __init__(self, http_session, websocket):
+        self.http_session = http_session
+        self.websocket = websocket
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = []
+        self._reader = asyncio.ensure_future(self._read_loop())
+
+    @classmethod
+    async def connect(cls, address):
+        """Connect to the browser endpoint at host:port."""
+        http_session = aiohttp.ClientSession()
+        try:
+            async with http_session.get(f"http://{address}/json/version") as response:
+                version = await response.json()
+            websocket = await http_session.ws_connect(version["webSocketDebuggerUrl"], max_msg_size=0)
+        except Exception:
+            await http_session.close()
+            raise
+        logging.info(f"Connected to DevTools at {address}")
+        return cls(http_session, websocket)
+
+    async def _read_loop(self):
+        """Resolve command replies and dispatch events until the socket closes."""
+        async for message in self.websocket:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            data = json.loads(message.data)
+            if "id" in data:
+                future = self._pending.pop(data["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in data:
+                    future.set_exception(CdpError(data["error"].get("message", str(data["error"]))))
+                else:
+                    future.set_result(data.get("result", {}))
+            else:
+                for listener in list(self._listeners):
+                    listener(data.get("method"), data.get("params", {}), data.get("sessionId"))
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(CdpError("DevTools connection closed"))
+
+    async def send(self, method, params=None, session_id=None, timeout=30):
+        """Send a command, optionally to an attached target session, and return its result."""
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        await self.websocket.send_str(json.dumps(message))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def wait_closed(self):
+        """Wait until the websocket closes."""
+        await asyncio.shield(self._reader)
+
+    def add_listener(self, listener):
+        """Call listener(method, params, session_id) for every event."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stop calling a listener added with add_listener."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def expect_event(self, method, session_id=None, predicate=None):
+        """Return a future for the next matching event; create it before triggering the event."""
+        future = asyncio.get_running_loop().create_future()
+
+        def listener(event_method, params, event_session):
+            if future.done() or event_method != method or (session_id and event_session != session_id):
+                return
+            if predicate is None or predicate(params):
+                future.set_result(params)
+
+        self.add_listener(listener)
+        future.add_done_callback(lambda _: self.remove_listener(listener))
+        return future
+
+    async def close(self):
+        """Close the websocket and its HTTP session."""
+        await self.websocket.close()
+        await self.http_session.close()
+        self._reader.cancel()
+
+class CdpTab:
+    """One page target driven over a flattened session of a shared CdpConnection."""
+    def __init__(self, connection, target_id, session_id):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+
+    @classmethod
+    async def open(cls, connection, url="about:blank"):
+        """Create a new tab and attach to it."""
+        target = await connection.send("Target.createTarget", {"url": url})
+        attached = await connection.send(
+            "Target.attachToTarget", {"targetId": target["targetId"], "flatten": True}
+        )
+        tab = cls(connection, target["targetId"], attached["sessionId"])
+        await tab.send("Page.enable")
+        await tab.send("Network.enable")
+        return tab
+
+    async def send(self, method, params=None, timeout=30):
+        """Send a command to this tab."""
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    def expect_event(self, method, predicate=None):
+        """Return a future for this tab's next matching event."""
+        return self.connection.expect_event(method, self.session_id, predicate)
+
+    async def navigate(self, url, timeout=30):
+        """Navigate and wait for the load event."""
+        loaded = self.expect_event("Page.loadEventFired")
+        try:
+            await self.send("Page.navigate", {"url": url})
+            await asyncio.wait_for(loaded, timeout)
+        finally:
+            loaded.cancel()
+
+    async def evaluate(self, expression, timeout=30):
+        """Evaluate an expression (awaiting promises) and return its JSON value."""
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression, "returnByValue": True, "awaitPromise": True
+        }, timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CdpError(details.get("exception", {}).get("description", details.get("text", "script error")))
+        return result.get("result", {}).get("value")
+
+    async def call(self, function, *args, timeout=30):
+        """Call a JS function declaration with JSON-serialisable arguments."""
+        return await self.evaluate(f"({function})(...{json.dumps(list(args))})", timeout)
+
+    async def close(self):
+        """Close the tab."""
+        try:
+            await self.connection.send("Target.closeTarget", {"targetId": self.target_id})
+        except CdpError as e:
+            logging.warning(f"Failed to close tab {self.target_id}: {e}")
@@ -0,0 +1,113 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# WebDriver wire commands grouped the way form_utils calls them
+COMMAND_CATEGORIES = {
+    "findElement": "find",
+    "findElements": "find",
+    "findChildElement": "find",
+    "findChildElements": "find",
+    "clickElement": "click",
+    "sendKeysToElement": "send_keys",
+    "clearElement": "clear",
+    "getElementText": "get_text",
+    "getElementAttribute": "get_attribute",
+    "getElementProperty": "get_attribute",
+    "executeScript": "execute_script",
+    "w3cExecuteScript": "execute_script",
+    "w3cExecuteScriptAsync": "execute_script",
+    "switchToFrame": "switch_to",
+    "switchToParentFrame": "switch_to",
+    "switchToWindow": "switch_to",
+    "get": "get",
+    "executeCdpCommand": "cdp",
+    "getLog": "get_log",
+}
+# Selenium implements these WebElement methods as scripts tagged with a leading comment
+SCRIPT_CATEGORIES = {
+    "/* getAttribute */": "get_attribute",
+    "/* isDisplayed */": "is_displayed",
+}
+
+_labels = contextvars.ContextVar("command_labels", default={})
+
+@contextmanager
+def command_scope(**labels):
+    """Attribute WebDriver commands issued inside the block to the given row/field/handler."""
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+def _categorize(driver_command, params):
+    """Map a wire command to the WebDriver call it came from."""
+    category = COMMAND_CATEGORIES.get(driver_command, driver_command)
+    if category == "execute_script" and params:
+        script = params.get("script", "")
+        for prefix, name in SCRIPT_CATEGORIES.items():
+            if script.startswith(prefix):
+                return name
+    return category
+
+class CommandAccounting:
+    """Count and time every WebDriver command, attributed to the current row, field and handler."""
+    def __init__(self):
+        self.by_handler = defaultdict(lambda: [0, 0.0])
+        self.by_field = defaultdict(lambda: [0, 0.0])
+        self.by_row = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    def instrument(self, driver):
+        """Wrap driver.execute, which every driver and element command goes through."""
+        original_execute = driver.execute
+
+        def execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return original_execute(driver_command, params)
+            finally:
+                self.record(_categorize(driver_command, params), time.perf_counter() - start)
+
+        driver.execute = execute
+        return driver
+
+    def record(self, command, seconds):
+        """Add one command's round trip under the current labels."""
+        labels = _labels.get()
+        handler = labels.get("handler", "-")
+        with self._lock:
+            for stats in (
+                self.by_handler[(handler, command)],
+                self.by_field[(labels.get("field", "-"), handler)],
+                self.by_row[labels.get("row", "-")],
+            ):
+                stats[0] += 1
+                stats[1] += seconds
+
+    def report(self, top=15):
+        """Return the per-run tables of round trips and wire time, worst offenders first."""
+        with self._lock:
+            by_handler = sorted(self.by_handler.items(), key=lambda item: -item[1][1])
+            by_field = sorted(self.by_field.items(), key=lambda item: -item[1][1])[:top]
+            rows = [stats for row, stats in self.by_row.items() if row != "-"]
+        lines = [f"{'Handler':<28} {'Command':<16} {'Calls':>7} {'Wire s':>9} {'Avg ms':>8}"]
+        for (handler, command), (calls, seconds) in by_handler:
+            lines.append(f"{handler[:28]:<28} {command[:16]:<16} {calls:>7} {seconds:>9.2f} {seconds / calls * 1000:>8.1f}")
+        lines.append("")
+        lines.append(f"{'Field':<45} {'Handler':<28} {'Calls':>7} {'Wire s':>9}")
+        for (field, handler), (calls, seconds) in by_field:
+            lines.append(f"{field[:45]:<45} {handler[:28]:<28} {calls:>7} {seconds:>9.2f}")
+        if rows:
+            total_calls = sum(calls for calls, _ in rows)
+            total_seconds = sum(seconds for _, seconds in rows)
+            lines.append("")
+            lines.append(
+                f"Rows: {len(rows)}, {total_calls / len(rows):.1f} round trips and "
+                f"{total_seconds / len(rows):.2f}s wire time per row"
+            )
+        return "\n".join(lines)
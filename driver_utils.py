@@ -1,7 +1,18 @@
+import hashlib
+import json
 import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
 import psutil
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
+from network_utils import PERFORMANCE_LOGGING_PREFS, PERF_LOGGING_PREFS
 
 try:
     from webdriver_manager.chrome import ChromeDriverManager
@@ -10,21 +21,253 @@ except ImportError:
     USE_WEBDRIVER_MANAGER = False
     logging.warning("webdriver_manager not installed. Using static chromedriver path.")
 
-def terminate_chrome_processes():
-    """Terminate all running Chrome processes."""
+def _same_path(a, b):
+    """Compare two filesystem paths the way the OS would."""
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+def terminate_profile_processes(user_data_dir):
+    """Terminate the Chrome processes using user_data_dir, leaving other browsers running.
+
+    A Chrome started without --user-data-dir counts as using the default user-data directory.
+    """
+    default_dir = Path(os.getenv("LOCALAPPDATA", "")) / "Google" / "Chrome" / "User Data"
     try:
-        for proc in psutil.process_iter(['pid', 'name']):
-            if proc.info['name'].lower() == "chrome.exe":
+        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+            if (proc.info['name'] or "").lower() not in ("chrome.exe", "chrome"):
+                continue
+            args = [arg for arg in proc.info['cmdline'] or [] if arg.startswith("--user-data-dir=")]
+            profile_dir = args[0].split("=", 1)[1].strip('"') if args else default_dir
+            if _same_path(profile_dir, user_data_dir):
                 proc.kill()
-                logging.info(f"Terminated Chrome process PID: {proc.pid}")
+                logging.info(f"Terminated Chrome process PID {proc.pid} holding {user_data_dir}")
     except Exception as e:
         logging.error(f"Error terminating Chrome processes: {e}")
 
+# Slim session snapshots: only the Google auth state is copied out of the user's profile
+SNAPSHOT_ROOT = Path(os.getenv("APPDATA", tempfile.gettempdir())) / "TRC_AUTO" / "session_snapshot"
+SNAPSHOT_MAX_AGE_HOURS = 12
+SNAPSHOT_PROFILE_FILES = ("Cookies", "Network/Cookies", "Preferences")
+SNAPSHOT_PROFILE_DIRS = ("Local Storage",)
+SNAPSHOT_SKIP_FILES = {"LOCK"}
+SNAPSHOT_META = "snapshot.json"
+SNAPSHOT_LOCK_TIMEOUT = 60
+# A lock file older than this was left by a crashed process; its holder touches it more often than that
+SNAPSHOT_LOCK_STALE_SECONDS = 120
+# Long-lived Google sign-in cookies: they change on sign-in or sign-out, unlike the rotating *PSIDTS ones
+SNAPSHOT_AUTH_COOKIES = ("SID", "HSID", "SSID", "APISID", "SAPISID")
+
+@contextmanager
+def _snapshot_lock(snapshot_dir):
+    """Hold a lock file beside the snapshot, so no session in any process sees it half replaced."""
+    lock_path = snapshot_dir.with_name(snapshot_dir.name + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + SNAPSHOT_LOCK_TIMEOUT
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock_path.stat().st_mtime > SNAPSHOT_LOCK_STALE_SECONDS:
+                    lock_path.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Session snapshot {snapshot_dir} is locked by another session")
+            time.sleep(0.1)
+    stop = threading.Event()
+
+    def keep_alive():
+        # A slow copy must not look like a crashed holder to other processes
+        while not stop.wait(SNAPSHOT_LOCK_STALE_SECONDS / 4):
+            try:
+                os.utime(lock_path)
+            except OSError:
+                return
+
+    try:
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        os.close(fd)
+        threading.Thread(target=keep_alive, daemon=True).start()
+        yield
+    finally:
+        stop.set()
+        try:
+            lock_path.unlink()
+        except FileNotFoundError:
+            pass
+
+def _copy_locked_file(src, dst):
+    """Copy a profile file, using SQLite's backup API when Chrome holds it open."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        shutil.copy2(src, dst)
+    except PermissionError:
+        source = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+        target = sqlite3.connect(str(dst))
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+def _auth_fingerprint(profile):
+    """Hash a profile's Google sign-in cookies, or return None if its cookie store cannot be read."""
+    for name in ("Network/Cookies", "Cookies"):
+        path = profile / name
+        if not path.is_file():
+            continue
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(
+                    "SELECT host_key, name, value, encrypted_value FROM cookies"
+                    f" WHERE host_key LIKE '%google.com' AND name IN ({', '.join('?' * len(SNAPSHOT_AUTH_COOKIES))})"
+                    " ORDER BY host_key, name",
+                    SNAPSHOT_AUTH_COOKIES
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logging.debug(f"Could not read sign-in cookies from {path}: {e}")
+            return None
+        return hashlib.sha256(repr(rows).encode("utf-8")).hexdigest()
+    return None
+
+def _snapshot_is_fresh(snapshot_dir, source_profile, max_age_hours):
+    """Tell whether an existing snapshot is younger than max_age_hours and has the profile's current sign-in.
+
+    Chrome rewrites its cookie store constantly, so only the long-lived sign-in cookies are
+    compared; when the running browser keeps the store locked, the age alone decides.
+    """
+    meta_path = snapshot_dir / SNAPSHOT_META
+    if not meta_path.is_file():
+        return False
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except Exception:
+        return False
+    if meta.get("source") != str(source_profile):
+        return False
+    if time.time() - meta.get("created", 0) > max_age_hours * 3600:
+        return False
+    current = _auth_fingerprint(source_profile)
+    if current is not None and meta.get("auth") is not None and current != meta["auth"]:
+        logging.info(f"Sign-in cookies of {source_profile} changed since the last snapshot")
+        return False
+    return True
+
+def _snapshot_dir(config):
+    """Return where the configured profile's snapshot is kept."""
+    return SNAPSHOT_ROOT / config["PROFILE_DIR"].replace(" ", "_")
+
+def refresh_session_snapshot(config, force=False):
+    """Extract cookies and local storage from the configured profile into a small snapshot.
+
+    Returns the snapshot's user-data directory, reusing it until it expires.
+    """
+    with _snapshot_lock(_snapshot_dir(config)):
+        return _refresh_snapshot(config, force)
+
+def _refresh_snapshot(config, force=False):
+    """Build or reuse the snapshot; the caller holds its lock."""
+    user_data_dir = Path(config["USER_DATA_DIR"])
+    source_profile = user_data_dir / config["PROFILE_DIR"]
+    snapshot_dir = _snapshot_dir(config)
+    max_age_hours = config.get("SESSION_SNAPSHOT_MAX_AGE_HOURS", SNAPSHOT_MAX_AGE_HOURS)
+    if not force and _snapshot_is_fresh(snapshot_dir, source_profile, max_age_hours):
+        return snapshot_dir
+
+    staging_dir = Path(tempfile.mkdtemp(prefix=snapshot_dir.name + ".", dir=snapshot_dir.parent))
+    try:
+        _build_snapshot(user_data_dir, source_profile, staging_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.replace(staging_dir, snapshot_dir)
+    logging.info(f"Refreshed session snapshot for {source_profile} at {snapshot_dir}")
+    return snapshot_dir
+
+def _build_snapshot(user_data_dir, source_profile, staging_dir):
+    """Copy the profile's auth state into staging_dir."""
+    target_profile = staging_dir / "Default"
+    # Local State holds the key Chrome uses to decrypt the copied cookies
+    _copy_locked_file(user_data_dir / "Local State", staging_dir / "Local State")
+    copied = 0
+    for name in SNAPSHOT_PROFILE_FILES:
+        if (source_profile / name).is_file():
+            _copy_locked_file(source_profile / name, target_profile / name)
+            copied += 1
+    for name in SNAPSHOT_PROFILE_DIRS:
+        source = source_profile / name
+        if source.is_dir():
+            for path in source.rglob("*"):
+                if path.is_file() and path.name not in SNAPSHOT_SKIP_FILES:
+                    _copy_locked_file(path, target_profile / name / path.relative_to(source))
+    if not copied:
+        raise FileNotFoundError(f"No cookie store found in profile {source_profile}")
+    with open(staging_dir / SNAPSHOT_META, "w", encoding="utf-8") as f:
+        json.dump({"source": str(source_profile), "created": time.time(), "auth": _auth_fingerprint(target_profile)}, f)
+
+def prepare_session_profile(config):
+    """Copy the session snapshot into a throwaway user-data directory for one launch."""
+    session_dir = Path(tempfile.mkdtemp(prefix="trc_session_"))
+    try:
+        # Held while copying too, so another session cannot replace the snapshot mid-copy
+        with _snapshot_lock(_snapshot_dir(config)):
+            shutil.copytree(_refresh_snapshot(config), session_dir, dirs_exist_ok=True)
+    except Exception:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise
+    return session_dir
+
+def close_driver(driver):
+    """Quit the driver and remove its throwaway profile, if it was launched from a snapshot."""
+    try:
+        driver.quit()
+        logging.info("WebDriver closed")
+    finally:
+        session_dir = getattr(driver, "session_profile_dir", None)
+        if session_dir:
+            shutil.rmtree(session_dir, ignore_errors=True)
+
+_driver_path_lock = threading.Lock()
+_driver_path = None
+
+def resolve_driver_path(config):
+    """Resolve the ChromeDriver executable once and cache it for later launches."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = (
+                ChromeDriverManager().install()
+                if USE_WEBDRIVER_MANAGER
+                else config['CHROMEDRIVER_PATH']
+            )
+            logging.info(f"Resolved ChromeDriver path: {_driver_path}")
+        return _driver_path
+
 def initialize_driver(config):
     """Initialize and configure Chrome WebDriver."""
+    session_dir = None
+    if config.get("USE_SESSION_SNAPSHOT", True):
+        try:
+            session_dir = prepare_session_profile(config)
+        except Exception as e:
+            logging.warning(f"Session snapshot unavailable, launching the full profile: {e}")
+
     options = webdriver.ChromeOptions()
-    options.add_argument(f"--user-data-dir={config['USER_DATA_DIR']}")
-    options.add_argument(f"--profile-directory={config['PROFILE_DIR']}")
+    if session_dir:
+        options.add_argument(f"--user-data-dir={session_dir}")
+        options.add_argument("--profile-directory=Default")
+    else:
+        # The full profile cannot be opened while the user's own Chrome is using it; other browsers keep running
+        terminate_profile_processes(config['USER_DATA_DIR'])
+        options.add_argument(f"--user-data-dir={config['USER_DATA_DIR']}")
+        options.add_argument(f"--profile-directory={config['PROFILE_DIR']}")
     options.add_argument("--start-maximized")
     options.add_argument("--lang=en-US")
     options.add_argument("--disable-notifications")
@@ -33,19 +276,22 @@ def initialize_driver(config):
     options.add_argument("--disable-infobars")  
     options.add_argument("--disable-extensions")  
     options.add_argument("--disable-blink-features=AutomationControlled")
+    # Preloaded and multi-tab forms run in background tabs, which Chrome would otherwise throttle
+    options.add_argument("--disable-background-timer-throttling")
+    options.add_argument("--disable-renderer-backgrounding")
+    options.add_argument("--disable-backgrounding-occluded-windows")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
+    options.add_experimental_option("perfLoggingPrefs", PERF_LOGGING_PREFS)
+    options.set_capability("goog:loggingPrefs", PERFORMANCE_LOGGING_PREFS)
     options.add_argument(
         "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
         "(KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
     )
     try:
-        service = (
-            Service(ChromeDriverManager().install())
-            if USE_WEBDRIVER_MANAGER
-            else Service(config['CHROMEDRIVER_PATH'])
-        )
+        service = Service(resolve_driver_path(config))
         driver = webdriver.Chrome(service=service, options=options)
+        driver.session_profile_dir = session_dir
         driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
             "source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
         })
@@ -53,4 +299,6 @@ def initialize_driver(config):
         return driver
     except Exception as e:
         logging.error(f"Failed to initialize WebDriver: {e}")
-        raise
\ No newline at end of file
+        if session_dir:
+            shutil.rmtree(session_dir, ignore_errors=True)
+        raise
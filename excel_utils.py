@@ -1,25 +1,254 @@
+import csv
+import io
+import json
 import logging
+import os
+import time
 from datetime import datetime
 from pathlib import Path
 import openpyxl
 
+STATUS_SIDECAR_SUFFIX = ".status.json"
+# Per-row checkpoints write a workbook's notes at most this often; the final save always writes
+STATUS_CHECKPOINT_SECONDS = 30
+
+def _clean_header(value):
+    """Format a header cell value as a string."""
+    return value.strftime("%Y-%m-%d") if isinstance(value, datetime) else str(value).strip()
+
+def note_position(header_row):
+    """Return the index of the Note column in a raw header row, blank cells included, or None."""
+    return next(
+        (i for i, value in enumerate(header_row) if isinstance(value, str) and value.strip().lower() == "note"), None
+    )
+
+def stream_excel_rows(filepath, start_row=2):
+    """Yield a workbook's header row and last row number, then (row_idx, row) for each row from start_row on.
+
+    The sheet XML is streamed in read-only mode, so no cell objects are built and rows
+    above start_row are skipped cheaply. It is streamed from an in-memory copy of the
+    file, so status notes can be saved to the file while rows are still being read.
+    The last row number comes from the sheet's stored dimensions and is None when the
+    file has none.
+    """
+    wb = openpyxl.load_workbook(io.BytesIO(Path(filepath).read_bytes()), read_only=True)
+    try:
+        sheet = wb.active
+        yield list(next(sheet.iter_rows(max_row=1, values_only=True), ())), sheet.max_row
+        for idx, row in enumerate(sheet.iter_rows(min_row=start_row, values_only=True), start=start_row):
+            yield idx, ["" if val is None else val for val in row]
+    finally:
+        wb.close()
+
+def stream_csv_rows(filepath, start_row=2):
+    """Yield a CSV file's header row and None, then (row_idx, row) for each row from start_row on, line by line."""
+    with open(filepath, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        yield next(reader, []), None
+        for idx, row in enumerate(reader, start=2):
+            if idx >= start_row:
+                yield idx, list(row)
+
+# Input adapters by file suffix; each yields (header row, last row number or None), then (row_idx, row) pairs
+INPUT_READERS = {
+    ".xlsx": stream_excel_rows,
+    ".xlsm": stream_excel_rows,
+    ".csv": stream_csv_rows,
+}
+# Formats whose status notes can be written back into the file itself
+WRITABLE_SUFFIXES = {".xlsx", ".xlsm"}
+
+class InputRows:
+    """An input file's headers, read up front, and its data rows streamed as (row_idx, row) pairs.
+
+    Rows are read only as the caller iterates, so processing can start as soon as the
+    header row is in. Use as a context manager to close the file if iteration stops early.
+    """
+    def __init__(self, filepath, start_row=2):
+        self.filepath = Path(filepath)
+        suffix = self.filepath.suffix.lower()
+        reader = INPUT_READERS.get(suffix)
+        if reader is None:
+            raise ValueError(f"Unsupported input format '{suffix}', expected one of {sorted(INPUT_READERS)}")
+        if not self.filepath.exists():
+            raise FileNotFoundError(f"Input file not found: {self.filepath}")
+        self._rows = reader(self.filepath, max(start_row, 2))
+        header_row, self._max_row = next(self._rows)
+        self.headers = [header for header in (_clean_header(value) for value in header_row if value) if header]
+        self.note_position = note_position(header_row)
+
+    def count_rows(self):
+        """Return the number of data rows, for progress totals.
+
+        Workbooks report it from their dimensions; a CSV file's lines are counted in one
+        fast binary pass, which overcounts quoted values that span lines.
+        """
+        if self._max_row is not None:
+            return max(self._max_row - 1, 0)
+        lines, last = 0, b"\n"
+        with open(self.filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+        if last != b"\n":
+            lines += 1  # The last line has no newline
+        return max(lines - 1, 0)
+
+    def __iter__(self):
+        return self._rows
+
+    def close(self):
+        self._rows.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_input_data(filepath):
+    """Read (headers, rows) from any supported input file, including empty rows."""
+    with InputRows(filepath) as input_rows:
+        data = [row for _, row in input_rows]
+    logging.info(f"Read {len(data)} rows from {Path(filepath).name}")
+    return input_rows.headers, data
+
 def read_excel_data(filepath):
     """Read headers and all data rows from Excel file, including empty rows."""
-    filepath = Path(filepath)
-    if not filepath.exists():
-        raise FileNotFoundError(f"Excel file not found: {filepath}")
-
-    wb = openpyxl.load_workbook(filepath)
-    sheet = wb.active
-    headers = [
-        cell.value.strftime("%Y-%m-%d") if isinstance(cell.value, datetime)
-        else str(cell.value).strip()
-        for cell in sheet[1] if cell.value
-    ]
-    # Read all rows without filtering
-    data = [
-        ["" if val is None else val for val in row]
-        for row in sheet.iter_rows(min_row=2, values_only=True)
-    ]
-    logging.info(f"Read {len(data)} rows from {filepath.name}: {data}")
-    return headers, data
\ No newline at end of file
+    return read_input_data(filepath)
+
+def read_rows_from(filepath, start_row=2):
+    """Read headers and the data rows from sheet row start_row on, as (row_idx, row) pairs."""
+    with InputRows(filepath, start_row) as input_rows:
+        return input_rows.headers, list(input_rows)
+
+def read_note_position(filepath):
+    """Return the Note column's index in an input file's header row, reading only that row."""
+    with InputRows(filepath) as input_rows:
+        return input_rows.note_position
+
+def row_note(position, row):
+    """Return a row's Note cell value, or None."""
+    if position is None or position >= len(row):
+        return None
+    return row[position] or None
+
+class WorkbookStatus:
+    """Read and write row status notes in the workbook's Note column.
+
+    Notes are read from the rows already read or streamed by the caller; the workbook
+    itself is only loaded for writing, by a save or a due checkpoint.
+    """
+    def __init__(self, filepath, headers, rows=None, note_position=None):
+        self.filepath = Path(filepath)
+        self.headers = headers
+        self.rows = rows
+        self.note_position = note_position
+        self.workbook = None
+        self.sheet = None
+        self.note_column = None
+        self.pending = {}
+        self.saved_at = time.monotonic()
+
+    def _load(self):
+        """Load the writable workbook and find or add its Note column."""
+        self.workbook = openpyxl.load_workbook(self.filepath)
+        self.sheet = self.workbook.active
+        position = note_position([cell.value for cell in self.sheet[1]])
+        if position is not None:
+            self.note_column = position + 1
+        else:
+            self.note_column = len(self.headers) + 1
+            self.sheet.cell(row=1, column=self.note_column).value = "Note"
+            logging.info(f"Added 'Note' column to Excel file at column {self.note_column}")
+
+    def get(self, row_idx, row=None):
+        """Return the note for a sheet row number, taken from row when the caller has it."""
+        if row_idx in self.pending:
+            return self.pending[row_idx]
+        if self.workbook is None and row is None and self.rows is not None and 0 <= row_idx - 2 < len(self.rows):
+            row = self.rows[row_idx - 2]
+        if self.workbook is None and row is not None:
+            if self.note_position is None:
+                self.note_position = read_note_position(self.filepath)
+            return row_note(self.note_position, row)
+        if self.workbook is None:
+            self._load()
+        return self.sheet.cell(row=row_idx, column=self.note_column).value
+
+    def set(self, row_idx, note):
+        """Set the note for a sheet row number."""
+        self.pending[row_idx] = note
+
+    def save(self):
+        """Write new notes back to the workbook, loading it on the first save that has any."""
+        self.saved_at = time.monotonic()
+        if not self.pending:
+            return
+        if self.workbook is None:
+            self._load()
+        for row_idx, note in self.pending.items():
+            self.sheet.cell(row=row_idx, column=self.note_column).value = note
+        self.workbook.save(self.filepath)
+        self.pending = {}
+
+    def checkpoint(self):
+        """Save after a row only once STATUS_CHECKPOINT_SECONDS have passed since the last save.
+
+        Loading and saving a large workbook takes seconds, so doing it per row would stall
+        the run; the submission index already stops a row whose note was lost from being
+        submitted twice.
+        """
+        if time.monotonic() - self.saved_at >= STATUS_CHECKPOINT_SECONDS:
+            self.save()
+
+class SidecarStatus:
+    """Keep row status notes in a JSON file next to an input that cannot be written back."""
+    def __init__(self, filepath, headers=None):
+        self.filepath = Path(filepath)
+        self.sidecar_path = self.filepath.with_name(self.filepath.name + STATUS_SIDECAR_SUFFIX)
+        self.notes = {}
+        if self.sidecar_path.is_file():
+            try:
+                with open(self.sidecar_path, "r", encoding="utf-8") as f:
+                    self.notes = json.load(f)
+            except Exception as e:
+                logging.error(f"Failed to read status sidecar {self.sidecar_path}: {e}")
+        logging.info(f"Recording row status in sidecar {self.sidecar_path}")
+
+    def get(self, row_idx, row=None):
+        """Return the note for a sheet row number."""
+        return self.notes.get(str(row_idx))
+
+    def set(self, row_idx, note):
+        """Set the note for a sheet row number."""
+        self.notes[str(row_idx)] = note
+
+    def checkpoint(self):
+        """Save after a row; the sidecar is small, so this always writes."""
+        self.save()
+
+    def save(self):
+        """Write the sidecar atomically so a crash never leaves it half written."""
+        tmp_path = self.sidecar_path.with_name(self.sidecar_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.notes, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.sidecar_path)
+
+def read_notes(filepath, headers, rows):
+    """Return the status note of every row without writing to the input or its sidecar."""
+    if Path(filepath).suffix.lower() in WRITABLE_SUFFIXES:
+        position = read_note_position(filepath)
+        return [row_note(position, row) for row in rows]
+    status = SidecarStatus(filepath, headers)
+    return [status.get(idx) for idx in range(2, len(rows) + 2)]
+
+def open_status(filepath, headers, rows=None, note_position=None):
+    """Open the status store for an input file, using a sidecar when it cannot be written back.
+
+    Pass the rows from read_input_data, or the note_position of an InputRows stream and
+    each row to get(), so a workbook's notes are read without loading it again.
+    """
+    if Path(filepath).suffix.lower() in WRITABLE_SUFFIXES:
+        return WorkbookStatus(filepath, headers, rows, note_position)
+    return SidecarStatus(filepath, headers)
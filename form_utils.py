@@ -4,30 +4,28 @@ import os
 import time
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlencode
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from bs4 import BeautifulSoup
 import re
 import unicodedata
-from retrying import retry
 
 # Assuming image_utils is a custom module
 from image_utils import download_google_drive_image
+from progress_utils import ProgressTracker
+from network_utils import network_log
+from command_utils import command_scope
+from retry_utils import StepRetryPolicy
+from trace_utils import trace_span
+from governor_utils import SignInRequired, acquire_slot, report_reply
+from logging_config import configure_app_logging
 
 # Configure logging
-log_handlers = [logging.FileHandler("app.log", encoding="utf-8")]
-
-# Only add StreamHandler if running in a console environment
-if hasattr(sys, 'stdout') and sys.stdout is not None and hasattr(sys.stdout, 'encoding'):
-    log_handlers.append(logging.StreamHandler(sys.stdout))
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=log_handlers
-)
+configure_app_logging()
 logger = logging.getLogger(__name__)
 
 # Safely handle UTF-8 encoding for stdout
@@ -38,6 +36,118 @@ if hasattr(sys, 'stdout') and sys.stdout is not None and hasattr(sys.stdout, 'en
     except Exception as e:
         logger.warning(f"Failed to reconfigure stdout to UTF-8: {e}")
 
+SUBMIT_TIMEOUT = 60
+UPLOAD_TIMEOUT = 45
+INJECT_TIMEOUT = 3
+LISTED_FILE_TIMEOUT = 5
+UPLOAD_BUDGET_SECONDS = 120
+REPAIR_UPLOAD_BUDGET_SECONDS = 60
+
+# Pre-filled URL mode: Google Forms question types whose answers can go in the URL
+ENTRY_TYPE_DATE = 9
+ENTRY_TYPE_CHECKBOX = 4
+PREFILL_ENTRY_TYPES = {0, 1, 2, 3, ENTRY_TYPE_CHECKBOX, ENTRY_TYPE_DATE}
+_FORM_ENTRY_CACHE = {}
+# Collects every question's current answers, keyed by its title
+FORM_ANSWERS_SCRIPT = """
+const out = {};
+document.querySelectorAll("div[role='listitem']").forEach(item => {
+    const title = item.querySelector("span.M7eMe");
+    if (!title) return;
+    const values = [];
+    item.querySelectorAll("input, textarea").forEach(e => { if (e.value) values.push(e.value); });
+    item.querySelectorAll("[role=checkbox][aria-checked=true], [role=radio][aria-checked=true]").forEach(
+        e => values.push(e.getAttribute("data-answer-value") || e.getAttribute("data-value") || ""));
+    item.querySelectorAll("[role=option][aria-selected=true]").forEach(
+        e => values.push(e.getAttribute("data-value") || ""));
+    out[title.textContent] = values;
+});
+return out;
+"""
+
+# Shared page helpers, prepended to every field script (used by the repair pass and tab_utils)
+PAGE_HELPERS = """
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+const findItem = header => {
+    for (const item of document.querySelectorAll("div[role='listitem']")) {
+        const title = item.querySelector("span.M7eMe");
+        if (title && title.textContent.replace(/\\s+/g, " ").includes(header)) return item;
+    }
+    return null;
+};
+const setValue = (element, value) => {
+    const proto = element.tagName === "TEXTAREA" ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, "value").set.call(element, value);
+    element.dispatchEvent(new Event("input", {bubbles: true}));
+    element.dispatchEvent(new Event("change", {bubbles: true}));
+};
+"""
+
+TEXT_SCRIPT = PAGE_HELPERS + """
+return (header, value) => {
+    const item = findItem(header);
+    const input = item && item.querySelector("input[type=text], input[type=number], textarea");
+    if (!input) return false;
+    setValue(input, value);
+    return input.value === value;
+};
+"""
+
+DATE_SCRIPT = PAGE_HELPERS + """
+return (header, month, day, year) => {
+    const item = findItem(header);
+    if (!item) return false;
+    const dateInput = item.querySelector("input[type=date]");
+    if (dateInput) {
+        setValue(dateInput, `${year}-${month}-${day}`);
+        return dateInput.value === `${year}-${month}-${day}`;
+    }
+    const parts = {"Month": month, "Day of the month": day, "Year": year};
+    for (const [label, value] of Object.entries(parts)) {
+        const input = item.querySelector(`input[aria-label='${label}']`);
+        if (!input) return false;
+        setValue(input, value);
+    }
+    return true;
+};
+"""
+
+CHECKBOX_SCRIPT = PAGE_HELPERS + """
+return (header, values) => {
+    const item = findItem(header);
+    if (!item) return false;
+    return values.every(value => {
+        const box = [...item.querySelectorAll("[role=checkbox]")].find(
+            b => b.getAttribute("data-answer-value") === value);
+        if (!box) return false;
+        if (box.getAttribute("aria-checked") !== "true") box.click();
+        return box.getAttribute("aria-checked") === "true";
+    });
+};
+"""
+
+DROPDOWN_SCRIPT = PAGE_HELPERS + """
+return async (header, value) => {
+    const item = findItem(header);
+    const listbox = item && item.querySelector("[role=listbox]");
+    if (!listbox) return false;
+    listbox.click();
+    for (let i = 0; i < 50; i++) {
+        const option = [...document.querySelectorAll("[role=option]")].find(
+            o => o.offsetParent && o.textContent.includes(value.slice(0, 30)));
+        if (option) {
+            option.click();
+            await sleep(200);
+            return listbox.textContent.includes(value);
+        }
+        await sleep(100);
+    }
+    return false;
+};
+"""
+
+FILE_FIELD_KEYWORDS = ["Picture of Damage Cable", "Picture of drawing in google map"]
+
 # Field configuration
 FIELD_TYPES = {
     "date": {
@@ -65,6 +175,10 @@ FIELD_TYPES = {
     }
 }
 
+def page_function(script):
+    """Wrap a helper script that returns a function into a callable function expression."""
+    return f"(() => {{ {script} }})()"
+
 def scroll_into_view(driver, element):
     """Scroll an element into view smoothly."""
     driver.execute_script(
@@ -72,21 +186,35 @@ def scroll_into_view(driver, element):
     )
     time.sleep(0.1)
 
-def parse_date(value):
-    """Convert date to MM/DD/YYYY format."""
+def date_parts(value):
+    """Parse a date cell into zero-padded (year, month, day) strings, or None.
+
+    Every path that fills, pre-fills or verifies a date uses this, so they agree on which part is the month.
+    """
     if not value:
         return None
     if isinstance(value, datetime):
-        return value.strftime("%m/%d/%Y")
+        parsed = value
+    else:
+        parsed = None
+        for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y"):
+            try:
+                parsed = datetime.strptime(str(value), fmt)
+                break
+            except ValueError:
+                continue
+        if parsed is None:
+            logger.warning(f"Invalid date format: {value}")
+            return None
+    return parsed.strftime("%Y"), parsed.strftime("%m"), parsed.strftime("%d")
 
-    date_formats = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y"]
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(str(value), fmt).strftime("%m/%d/%Y")
-        except ValueError:
-            continue
-    logger.warning(f"Invalid date format: {value}")
-    return None
+def parse_date(value):
+    """Convert date to MM/DD/YYYY format."""
+    parts = date_parts(value)
+    if not parts:
+        return None
+    year, month, day = parts
+    return f"{month}/{day}/{year}"
 
 def normalize_text(text):
     """Normalize text for comparison."""
@@ -110,19 +238,97 @@ def get_form_headers(driver, config):
         if not headers:
             raise ValueError("No headers found in form")
         logger.info(f"Retrieved {len(headers)} form headers")
+        load_form_entries(driver, config["GOOGLE_FORM_URL"])
         return headers
     except Exception as e:
         logger.error(f"Failed to fetch form headers: {e}")
         raise
 
+def load_form_entries(driver, form_url):
+    """Read each question's entry ID and type from the loaded form's FB_PUBLIC_LOAD_DATA_."""
+    try:
+        data = driver.execute_script("return typeof FB_PUBLIC_LOAD_DATA_ !== 'undefined' ? FB_PUBLIC_LOAD_DATA_ : null;")
+        entries = {}
+        for item in (data or [None, [None, []]])[1][1] or []:
+            if len(item) > 4 and item[1] and item[4]:
+                entries[normalize_text(item[1])] = (item[4][0][0], item[3])
+        _FORM_ENTRY_CACHE[form_url] = entries
+        logger.info(f"Found {len(entries)} pre-fillable entry IDs in form")
+    except Exception as e:
+        logger.warning(f"Could not read form entry IDs, pre-fill mode unavailable: {e}")
+        _FORM_ENTRY_CACHE[form_url] = {}
+    return _FORM_ENTRY_CACHE[form_url]
+
+def prefill_enabled(config):
+    """Tell whether rows should be loaded through pre-filled URLs for this form."""
+    return config.get("FILL_MODE") == "prefill" and bool(_FORM_ENTRY_CACHE.get(config["GOOGLE_FORM_URL"]))
+
+def build_prefilled_url(form_url, row, headers, header_mapping):
+    """Build the viewform?usp=pp_url URL that pre-fills a row's simple answers.
+
+    Returns the URL and the form headers it pre-fills; file questions are never included.
+    """
+    entries = _FORM_ENTRY_CACHE.get(form_url) or {}
+    params = [("usp", "pp_url")]
+    prefilled = {}
+    for excel_header, value in zip(headers, row):
+        if excel_header not in header_mapping or value in ("", None):
+            continue
+        form_header = header_mapping[excel_header]
+        entry = entries.get(normalize_text(form_header))
+        if entry is None or entry[1] not in PREFILL_ENTRY_TYPES:
+            continue
+        entry_id, entry_type = entry
+        if entry_type == ENTRY_TYPE_DATE:
+            parts = date_parts(value)
+            if not parts:
+                continue
+            year, month, day = parts
+            answers = [f"{year}-{month}-{day}"]
+        elif entry_type == ENTRY_TYPE_CHECKBOX:
+            answers = [v.strip() for v in str(value).split(",") if v.strip()]
+        else:
+            answers = [str(value)]
+        params.extend((f"entry.{entry_id}", answer) for answer in answers)
+        prefilled[form_header] = answers
+    base_url = form_url.split("?", 1)[0]
+    if not base_url.rstrip("/").endswith("/viewform"):
+        base_url = base_url.rstrip("/") + "/viewform"
+    return f"{base_url}?{urlencode(params)}", prefilled
+
+def form_url_for_row(row, headers, header_mapping, config):
+    """Return the URL to load for a row and the form headers that URL pre-fills."""
+    if prefill_enabled(config):
+        return build_prefilled_url(config["GOOGLE_FORM_URL"], row, headers, header_mapping)
+    return config["GOOGLE_FORM_URL"], {}
+
+def read_form_answers(driver):
+    """Read every question's current answers in one script call, keyed by normalized title."""
+    answers = driver.execute_script(FORM_ANSWERS_SCRIPT)
+    return {normalize_text(title): values for title, values in (answers or {}).items()}
+
+def prefilled_answer_ok(form_answers, form_header_cleaned, expected):
+    """Tell whether the page shows every expected pre-filled answer for a question."""
+    values = form_answers.get(form_header_cleaned, [])
+    for answer in expected:
+        if answer in values:
+            continue
+        # Split date questions show month, day and year in separate inputs
+        parts = answer.split("-")
+        if len(parts) == 3 and all(part in values or part.lstrip("0") in values for part in parts):
+            continue
+        return False
+    return True
+
 def handle_date_field(driver, form_header, value, form_header_cleaned):
     """Handle date input fields."""
-    date_value = parse_date(value)
-    if not date_value:
+    parts = date_parts(value)
+    if not parts:
         logger.warning(f"Invalid date value for '{form_header}': {value}")
         return False
 
-    day, month, year = date_value.split("/")
+    year, month, day = parts
+    date_value = f"{year}-{month}-{day}"
     date_input_xpath = (
         f"//*[contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
         f"/ancestor::div[@role='listitem']//input[@type='date']"
@@ -131,7 +337,10 @@ def handle_date_field(driver, form_header, value, form_header_cleaned):
         date_inputs = driver.find_elements(By.XPATH, date_input_xpath)
         if date_inputs:
             scroll_into_view(driver, date_inputs[0])
-            date_inputs[0].send_keys(f"{month}{day}{year}")
+            # Typed keystrokes follow the browser locale's day/month order, so set the ISO value instead
+            if not run_field_script(driver, DATE_SCRIPT, form_header_cleaned[:50], month, day, year):
+                logger.warning(f"Date field '{form_header}' did not take '{date_value}'")
+                return False
         else:
             date_container = driver.find_element(
                 By.XPATH,
@@ -230,124 +439,467 @@ def handle_text_field(driver, form_header, value, form_header_cleaned):
         logger.error(f"Error filling text field '{form_header}': {e}")
         return False
 
+def handle_cable_core_field(driver, form_header, value, form_header_cleaned):
+    """Handle the "Number of cable * Core" field, located by its heading's first word."""
+    xpath_text_other = (
+        f"//div[@role='heading' and contains(., '{form_header_cleaned.split()[0]}')]"
+        f"/ancestor::div[@role='listitem']//input[@type='text' or @type='number']"
+    )
+    try:
+        input_elements = driver.find_elements(By.XPATH, xpath_text_other)
+        if not input_elements:
+            logger.warning("No input element found for 'Number of cable * Core'")
+            return False
+        scroll_into_view(driver, input_elements[0])
+        input_elements[0].clear()
+        input_elements[0].send_keys(str(value))
+        time.sleep(0.5)
+        if input_elements[0].get_attribute("value") == str(value):
+            logger.info(f"Filled 'Number of cable * Core' with value: {value}")
+            return True
+        logger.warning(f"Failed to fill 'Number of cable * Core' with value: {value}")
+        return False
+    except Exception as e:
+        logger.error(f"Error filling 'Number of cable * Core': {e}")
+        return False
+
+def is_file_field(form_header):
+    """Tell whether a form question takes a file upload."""
+    return any(keyword in form_header for keyword in FILE_FIELD_KEYWORDS)
+
 def fill_form_field(driver, form_header, value, form_header_cleaned):
     """Fill a single form field based on header content, excluding file uploads."""
     for field_type, config in FIELD_TYPES.items():
         if any(keyword in form_header_cleaned for keyword in config["keywords"]):
             handler = globals()[config["handler"]]
-            return handler(driver, form_header, value, form_header_cleaned)
+            with command_scope(handler=config["handler"]):
+                return handler(driver, form_header, value, form_header_cleaned)
     logger.warning(f"Unknown field type for header: {form_header}")
     return False
 
-@retry(stop_max_attempt_number=3, wait_fixed=2000)
-def upload_file(driver, form_header, form_header_cleaned, temp_file_path):
-    """Attempt to upload a file with retries."""
-    file_name = os.path.basename(temp_file_path)
-    try:
-        driver.switch_to.default_content()
-        # upload_btn_xpath = (
-        #     f"//span[@class='M7eMe' and contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
-        #     f"/ancestor::div[@role='listitem']//div[@role='button' and contains(@aria-label, 'Add File')]"
-        # )
-#         upload_btn_xpath = (
-#     f"//span[@class='M7eMe' and contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
-#     f"/ancestor::div[@role='listitem']//div[@role='button' and "
-#     f"(@aria-label='Add File' or contains(@class, 'uArJ5e') or contains(@class, 'cd29Sd') or @jsname='mWZCyf')]"
-# )
-        upload_btn_xpath = (
-            f"//span[@class='M7eMe' and contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
-            f"/ancestor::div[@role='listitem']//div[@role='button' and ("
-            f"@aria-label='Add File' or "
-            f"contains(@class, 'uArJ5e') or "
-            f"contains(@class, 'cd29Sd') or "
-            f".//span[contains(@class, 'NPEfkd') and contains(@class, 'RveJvd') and contains(@class, 'snByac') and contains(., 'Add File')]"
-            f")]"
+def field_kind(form_header_cleaned):
+    """Return the FIELD_TYPES key of a question, "cable_core" for the special case, or None."""
+    if "Number of cable * Core" in form_header_cleaned:
+        return "cable_core"
+    for field_type, config in FIELD_TYPES.items():
+        if any(keyword in form_header_cleaned for keyword in config["keywords"]):
+            return field_type
+    return None
+
+def field_answer_ok(form_answers, form_header_cleaned, value):
+    """Tell whether read_form_answers shows the row's value for a question."""
+    expected = "" if value is None else " ".join(str(value).split())
+    if not expected:
+        # An empty cell leaves the question unanswered, which read_form_answers does not list
+        return True
+    kind = field_kind(form_header_cleaned)
+    if kind == "date":
+        parts = date_parts(value)
+        if not parts:
+            return False
+        year, month, day = parts
+        return prefilled_answer_ok(form_answers, form_header_cleaned, [f"{year}-{month}-{day}"])
+    if kind == "checkbox":
+        expected = [v.strip() for v in str(value).split(",") if v.strip()]
+        return prefilled_answer_ok(form_answers, form_header_cleaned, expected)
+    values = [" ".join(v.split()) for v in form_answers.get(form_header_cleaned, [])]
+    if kind == "dropdown":
+        return any(expected[:30] in v for v in values)
+    return expected in values
+
+def run_field_script(driver, script, *args):
+    """Run one of the shared field scripts in the page and return its result."""
+    return driver.execute_async_script(
+        "const done = arguments[arguments.length - 1];"
+        f"Promise.resolve(({page_function(script)})(...Array.from(arguments).slice(0, -1)))"
+        ".then(done, () => done(false));",
+        *args
+    )
+
+def _set_field_by_script(driver, form_header, value, form_header_cleaned):
+    """Repair strategy: set the answer from page script, as the tab engine does."""
+    kind = field_kind(form_header_cleaned)
+    header = form_header_cleaned.split()[0] if kind == "cable_core" else form_header_cleaned[:50]
+    if kind == "date":
+        parts = date_parts(value)
+        if not parts:
+            return False
+        year, month, day = parts
+        return run_field_script(driver, DATE_SCRIPT, header, month, day, year)
+    if kind == "checkbox":
+        return run_field_script(driver, CHECKBOX_SCRIPT, header, [v.strip() for v in str(value).split(",") if v.strip()])
+    if kind == "dropdown":
+        return run_field_script(driver, DROPDOWN_SCRIPT, header, str(value))
+    return run_field_script(driver, TEXT_SCRIPT, header, str(value))
+
+def _type_field(driver, form_header, value, form_header_cleaned):
+    """Repair strategy: clear a text answer with the keyboard, type it again and leave the field."""
+    kind = field_kind(form_header_cleaned)
+    if kind not in ("text", "cable_core"):
+        return False
+    if kind == "cable_core":
+        xpath = (
+            f"//div[@role='heading' and contains(., '{form_header_cleaned.split()[0]}')]"
+            f"/ancestor::div[@role='listitem']//input[@type='text' or @type='number']"
         )
-        upload_button = WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.XPATH, upload_btn_xpath))
+    else:
+        xpath = (
+            f"//*[contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
+            f"/ancestor::div[@role='listitem']//*[(self::input[@type='text' or @type='number'] or self::textarea)]"
         )
-        scroll_into_view(driver, upload_button)
+    element = WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.XPATH, xpath)))
+    scroll_into_view(driver, element)
+    element.click()
+    element.send_keys(Keys.CONTROL, "a")
+    element.send_keys(Keys.DELETE)
+    element.send_keys(str(value), Keys.TAB)
+    return element.get_attribute("value") == str(value)
+
+def _refill_field(driver, form_header, value, form_header_cleaned):
+    """Repair strategy: re-locate the question and run its normal handler again."""
+    if field_kind(form_header_cleaned) == "cable_core":
+        return handle_cable_core_field(driver, form_header, value, form_header_cleaned)
+    return fill_form_field(driver, form_header, value, form_header_cleaned)
+
+# Tried in order until the page shows the value
+REPAIR_STRATEGIES = (
+    ("re-locate", _refill_field),
+    ("script", _set_field_by_script),
+    ("keyboard", _type_field),
+)
+
+def repair_field(driver, form_header, value, form_header_cleaned):
+    """Re-try one field with alternative strategies, verifying the page after each; True once repaired."""
+    for name, strategy in REPAIR_STRATEGIES:
+        with command_scope(handler=f"repair_{name}", field=form_header):
+            try:
+                strategy(driver, form_header, value, form_header_cleaned)
+                repaired = field_answer_ok(read_form_answers(driver), form_header_cleaned, value)
+            except Exception as e:
+                logger.warning(f"Repair strategy '{name}' failed for '{form_header}': {e}")
+                continue
+        if repaired:
+            logger.info(f"Repaired field '{form_header}' with strategy '{name}'")
+            return True
+    logger.error(f"Could not repair field '{form_header}' with value '{value}'")
+    return False
+
+def repair_fields(driver, filled, failed, failed_uploads):
+    """Repair pass before submit: verify filled fields in one read, then re-try only what failed.
+
+    filled and failed hold (form_header, form_header_cleaned, value); failed_uploads holds
+    (form_header, form_header_cleaned, temp_file_path). Returns True when every field is good.
+    """
+    form_answers = read_form_answers(driver) if filled else {}
+    to_repair = list(failed)
+    for form_header, form_header_cleaned, value in filled:
+        if form_header_cleaned not in form_answers:
+            continue  # Question title not matched on the page, so it cannot be verified here
+        if not field_answer_ok(form_answers, form_header_cleaned, value):
+            logger.warning(f"Field '{form_header}' does not show '{value}' after filling")
+            to_repair.append((form_header, form_header_cleaned, value))
+    all_ok = True
+    for form_header, form_header_cleaned, value in to_repair:
+        if not repair_field(driver, form_header, value, form_header_cleaned):
+            all_ok = False
+    for form_header, form_header_cleaned, temp_file_path in failed_uploads:
+        logger.info(f"Retrying upload for '{form_header}' in the repair pass")
+        policy = StepRetryPolicy(max_attempts=2, budget_seconds=REPAIR_UPLOAD_BUDGET_SECONDS)
+        with command_scope(handler="repair_upload", field=form_header):
+            if not upload_file(driver, form_header, form_header_cleaned, temp_file_path, policy):
+                all_ok = False
+    return all_ok
+
+def _node_attributes(node):
+    """Return a DevTools DOM node's flat attribute list as a dict."""
+    attrs = node.get("attributes", [])
+    return dict(zip(attrs[::2], attrs[1::2]))
+
+def find_picker_file_input(node, in_picker=False):
+    """Find the backendNodeId of a file input inside the picker iframe's document."""
+    name = node.get("nodeName", "")
+    if name == "IFRAME" and "docs.google.com/picker" in _node_attributes(node).get("src", ""):
+        content = node.get("contentDocument")
+        return find_picker_file_input(content, True) if content else None
+    if in_picker and name == "INPUT" and _node_attributes(node).get("type") == "file":
+        return node.get("backendNodeId")
+    for child in node.get("children", []) + node.get("shadowRoots", []):
+        found = find_picker_file_input(child, in_picker)
+        if found:
+            return found
+    content = node.get("contentDocument")
+    return find_picker_file_input(content, in_picker) if content else None
+
+def inject_file_input(driver, temp_file_path, timeout=INJECT_TIMEOUT):
+    """Set the file on the picker's input through DevTools, without switching frames.
+
+    Returns False if the input is not reachable from the page's DOM tree (for example
+    when the picker runs as an out-of-process iframe), so the caller can fall back.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        document = driver.execute_cdp_cmd("DOM.getDocument", {"depth": -1, "pierce": True})
+        backend_node_id = find_picker_file_input(document["root"])
+        if backend_node_id:
+            driver.execute_cdp_cmd("DOM.setFileInputFiles", {
+                "files": [os.path.abspath(temp_file_path)],
+                "backendNodeId": backend_node_id
+            })
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.2)
+
+def _is_final_upload_response(response):
+    """Tell whether a Drive upload response is the one that completes the upload."""
+    headers = {k.lower(): v for k, v in response.get("headers", {}).items()}
+    return headers.get("x-goog-upload-status", "final").lower() == "final"
+
+def _listed_file_xpath(form_header_cleaned, file_name):
+    """XPath of the uploaded file's entry under its question."""
+    return (
+        f"//span[@class='M7eMe' and contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
+        f"/ancestor::div[@role='listitem']//div[@role='listitem']//div[contains(text(), '{file_name}')]"
+    )
+
+def _file_is_listed(driver, form_header_cleaned, file_name):
+    """Tell, without waiting, whether the form already lists the file under its question."""
+    driver.switch_to.default_content()
+    return bool(driver.find_elements(By.XPATH, _listed_file_xpath(form_header_cleaned, file_name)))
+
+def _wait_for_listed_file(driver, form_header_cleaned, file_name, timeout):
+    """Wait until the form lists the uploaded file under its question."""
+    file_element = WebDriverWait(driver, timeout).until(
+        EC.presence_of_element_located((By.XPATH, _listed_file_xpath(form_header_cleaned, file_name)))
+    )
+    displayed_file_name = file_element.text.strip()
+
+    if file_name.lower() in displayed_file_name.lower():
+        logger.info(f"File name matched: expected '{file_name}', got '{displayed_file_name}'")
+        return True
+    logger.warning(f"File name mismatch: expected '{file_name}', got '{displayed_file_name}'")
+    return False
+
+PICKER_DIALOG_XPATH = "//div[contains(@class, 'picker-dialog') and not(contains(@style, 'display: none'))]"
+PICKER_IFRAME_XPATH = f"{PICKER_DIALOG_XPATH}//iframe[contains(@src, 'docs.google.com/picker')]"
+
+def _open_picker(driver, form_header, form_header_cleaned):
+    """Upload step 1: click 'Add File' unless the picker is already open, and return its iframes."""
+    driver.switch_to.default_content()
+    iframes = driver.find_elements(By.XPATH, PICKER_IFRAME_XPATH)
+    if iframes:
+        return iframes
+    # upload_btn_xpath = (
+    #     f"//span[@class='M7eMe' and contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
+    #     f"/ancestor::div[@role='listitem']//div[@role='button' and contains(@aria-label, 'Add File')]"
+    # )
+    upload_btn_xpath = (
+        f"//span[@class='M7eMe' and contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
+        f"/ancestor::div[@role='listitem']//div[@role='button' and ("
+        f"@aria-label='Add File' or "
+        f"contains(@class, 'uArJ5e') or "
+        f"contains(@class, 'cd29Sd') or "
+        f".//span[contains(@class, 'NPEfkd') and contains(@class, 'RveJvd') and contains(@class, 'snByac') and contains(., 'Add File')]"
+        f")]"
+    )
+    upload_button = WebDriverWait(driver, 5).until(
+        EC.element_to_be_clickable((By.XPATH, upload_btn_xpath))
+    )
+    scroll_into_view(driver, upload_button)
+    with trace_span(driver, "picker_open"):
         driver.execute_script("arguments[0].click();", upload_button)
         logger.info(f"Clicked 'Add File' button for '{form_header}'")
 
-        picker_dialog_xpath = "//div[contains(@class, 'picker-dialog') and not(contains(@style, 'display: none'))]"
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.XPATH, picker_dialog_xpath))
-        )
-
-        iframe_xpath = f"{picker_dialog_xpath}//iframe[contains(@src, 'docs.google.com/picker')]"
         iframes = WebDriverWait(driver, 5).until(
-            EC.presence_of_all_elements_located((By.XPATH, iframe_xpath))
+            EC.presence_of_all_elements_located((By.XPATH, PICKER_IFRAME_XPATH))
         )
-        if not iframes:
-            raise Exception("No iframe found for file picker")
+    if not iframes:
+        raise Exception("No iframe found for file picker")
+    return iframes
+
+def _send_file(driver, form_header, form_header_cleaned, temp_file_path):
+    """Upload step 2: put the file on the picker input; returns True if it was injected via DevTools."""
+    iframes = _open_picker(driver, form_header, form_header_cleaned)
+    if inject_file_input(driver, temp_file_path):
+        logger.info(f"Injected file into picker input via DevTools: {temp_file_path}")
+        return True
 
-        iframe = iframes[-1]
-        iframe_id = iframe.get_attribute("id")
-        logger.info(f"Switching to iframe with id: {iframe_id}")
+    # Fallback: walk into the picker iframe and send the path to its input
+    logger.info(f"Picker input not reachable via DevTools for '{form_header}', using picker frame")
+    iframe = iframes[-1]
+    iframe_id = iframe.get_attribute("id")
+    logger.info(f"Switching to iframe with id: {iframe_id}")
+    try:
         driver.switch_to.frame(iframe)
-
         WebDriverWait(driver, 15).until(
             EC.presence_of_element_located((By.XPATH, "//input[@type='file']"))
         )
         file_input = driver.find_element(By.XPATH, "//input[@type='file']")
         file_input.send_keys(temp_file_path)
         logger.info(f"Sent file path to file input: {temp_file_path}")
-
+    finally:
         driver.switch_to.default_content()
-        time.sleep(2)
+    return False
 
-        file_list_xpath = (
-            f"//span[@class='M7eMe' and contains(normalize-space(.), '{form_header_cleaned[:50]}')]"
-            f"/ancestor::div[@role='listitem']//div[@role='listitem']//div[contains(text(), '{file_name}')]"
+def _confirm_upload(driver, form_header, form_header_cleaned, file_name, events, mark, injected, policy):
+    """Upload step 3: confirm from the upload response, or from the file list when none is visible."""
+    if injected:
+        response = events.wait_for_response(
+            "/upload/", mark, policy.timeout(UPLOAD_TIMEOUT), accept=_is_final_upload_response
         )
-        file_element = WebDriverWait(driver, 45).until(
-            EC.presence_of_element_located((By.XPATH, file_list_xpath))
-        )
-        displayed_file_name = file_element.text.strip()
+        if response is not None:
+            if response.error or not 200 <= response.status < 300:
+                raise UploadRejected(f"Upload failed: status {response.status} {response.error or ''}")
+            logger.info(f"Upload response received in {response.latency:.2f}s for '{form_header}'")
+            return _wait_for_listed_file(driver, form_header_cleaned, file_name, LISTED_FILE_TIMEOUT)
+        if events.available:
+            # The upload never completed; only glance at the file list before the retry sends it again
+            return _wait_for_listed_file(
+                driver, form_header_cleaned, file_name, policy.timeout(LISTED_FILE_TIMEOUT)
+            )
+    else:
+        time.sleep(2)
+    return _wait_for_listed_file(driver, form_header_cleaned, file_name, policy.timeout(UPLOAD_TIMEOUT))
+
+class UploadRejected(Exception):
+    """Raised when the upload request itself fails, so waiting longer cannot help."""
+
+def upload_file(driver, form_header, form_header_cleaned, temp_file_path, policy=None):
+    """Upload a file, retrying only the step that failed within the row's time budget."""
+    policy = policy or StepRetryPolicy()
+    file_name = os.path.basename(temp_file_path)
 
-        if file_name.lower() in displayed_file_name.lower():
-            logger.info(f"File name matched: expected '{file_name}', got '{displayed_file_name}'")
+    sent = {}
+
+    def listed_or_none():
+        return True if _file_is_listed(driver, form_header_cleaned, file_name) else None
+
+    def send():
+        sent["mark"] = events.mark()
+        sent["injected"] = _send_file(driver, form_header, form_header_cleaned, temp_file_path)
+
+    def resend_unless_listed():
+        # Waiting again cannot help an upload that never completed, so the retry sends the file again
+        if listed_or_none():
             return True
-        logger.warning(f"File name mismatch: expected '{file_name}', got '{displayed_file_name}'")
-        return False
-    except TimeoutException as te:
-        logger.error(f"Timeout during file upload attempt for '{form_header}': {te}")
-        driver.switch_to.default_content()
-        raise
+        logger.info(f"Sending '{file_name}' again for '{form_header}'")
+        send()
+        return None
+
+    try:
+        if _file_is_listed(driver, form_header_cleaned, file_name):
+            logger.info(f"File '{file_name}' already listed for '{form_header}', skipping upload")
+            return True
+
+        events = network_log(driver)
+        # Never re-send a file the form already lists
+        if policy.run("send file", send, before_retry=listed_or_none):
+            return True  # Listed after a failed send attempt
+        return policy.run(
+            "confirm upload",
+            lambda: _confirm_upload(
+                driver, form_header, form_header_cleaned, file_name, events, sent["mark"], sent["injected"], policy
+            ),
+            before_retry=resend_unless_listed,
+            fatal=(UploadRejected,)
+        )
     except Exception as e:
-        logger.error(f"Error during file upload attempt for '{form_header}': {e}")
+        logger.error(f"Error during file upload for '{form_header}': {e}")
         driver.switch_to.default_content()
         raise
 
-def fill_google_form(driver, row, headers, header_mapping, config):
-    """Fill and submit a Google Form for one row of data."""
+def submit_and_confirm(driver, submit_btn, progress):
+    """Click Submit and confirm from the formResponse POST seen on the network."""
+    progress.add_timing("throttle_wait", acquire_slot("submit"))
+    events = network_log(driver)
+    mark = events.mark()
+    driver.execute_script("arguments[0].click();", submit_btn)
+    response = events.wait_for_response("formResponse", mark, SUBMIT_TIMEOUT, method="POST")
+    if response is None:
+        if events.available:
+            raise TimeoutException(f"No formResponse reply within {SUBMIT_TIMEOUT}s")
+        # No performance log on this driver; fall back to watching the page URL
+        try:
+            WebDriverWait(driver, SUBMIT_TIMEOUT).until(EC.url_contains("formResponse"))
+        except TimeoutException:
+            reason = report_reply("submit", url=driver.current_url)
+            if reason:
+                logger.error(f"Form submission throttled by Google ({reason})")
+                return False
+            raise
+        report_reply("submit", 200, driver.current_url)
+        logger.info("Form submitted successfully")
+        return True
+
+    progress.add_timing("submit_latency", response.latency)
+    reason = report_reply("submit", response.status, response.url)
+    if reason:
+        logger.error(f"Form submission throttled by Google after {response.latency:.2f}s ({reason})")
+        return False
+    if response.error:
+        logger.error(f"Form submission failed after {response.latency:.2f}s: {response.error}")
+        return False
+    if not (200 <= response.status < 300 and "formResponse" in response.url):
+        logger.error(
+            f"Form submission rejected after {response.latency:.2f}s: "
+            f"status {response.status}, url {response.url}"
+        )
+        return False
+    logger.info(f"Form submitted successfully (status {response.status}, {response.latency:.2f}s)")
+    return True
+
+def fill_google_form(driver, row, headers, header_mapping, config, progress=None, preloader=None, before_submit=None):
+    """Fill and submit a Google Form for one row of data.
+
+    With a FormPreloader, the row starts on the tab preloaded for it and the
+    next row's form is loaded in a background tab while this one is filled.
+    before_submit is called just before Submit is clicked; if it returns False the row is abandoned.
+    """
+    progress = progress or ProgressTracker()
+    # One upload retry budget per row, shared by all of the row's file questions; it starts at the first upload
+    upload_policy = StepRetryPolicy(budget_seconds=config.get("UPLOAD_BUDGET_SECONDS", UPLOAD_BUDGET_SECONDS))
     temp_dir = Path("images")
     temp_dir.mkdir(exist_ok=True)
     temp_files = []
     fields_filled = True
+    # Fields to check or re-try in the repair pass before submit
+    filled_fields, failed_fields, failed_uploads = [], [], []
 
     try:
-        driver.get(config["GOOGLE_FORM_URL"])
-        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.XPATH, "//form")))
+        form_url, prefilled = form_url_for_row(row, headers, header_mapping, config)
+        with progress.stage("load"), command_scope(handler="load"), trace_span(driver, "form_load"):
+            if preloader is None or not preloader.activate(driver, form_url):
+                driver.get(form_url)
+            try:
+                WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.XPATH, "//form")))
+            except TimeoutException:
+                reason = report_reply("submit", url=driver.current_url, text=driver.page_source)
+                if reason:
+                    logger.error(f"Google served a throttling page instead of the form ({reason})")
+                raise
         logger.info("Google Form loaded successfully")
+        if preloader is not None:
+            with command_scope(handler="preload"):
+                preloader.preload_next(driver)
+        form_answers = read_form_answers(driver) if prefilled else {}
 
         # Handle email checkbox once
-        try:
-            checkbox_xpath = '//div[.//span[text()="Email"]]/following::div[@role="checkbox"][1]'
-            checkbox = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH, checkbox_xpath))
-            )
-            scroll_into_view(driver, checkbox)
-            if checkbox.get_attribute("aria-checked") != "true":
-                checkbox.click()
-                logger.info("Checked 'Email' collection checkbox")
-            else:
-                logger.info("Email checkbox already checked, skipping")
-        except TimeoutException:
-            logger.info("No email checkbox found — skipping")
-        except Exception as e:
-            logger.error(f"Error handling email checkbox: {e}")
+        with command_scope(handler="email_checkbox"):
+            try:
+                checkbox_xpath = '//div[.//span[text()="Email"]]/following::div[@role="checkbox"][1]'
+                checkbox = WebDriverWait(driver, 5).until(
+                    EC.element_to_be_clickable((By.XPATH, checkbox_xpath))
+                )
+                scroll_into_view(driver, checkbox)
+                if checkbox.get_attribute("aria-checked") != "true":
+                    checkbox.click()
+                    logger.info("Checked 'Email' collection checkbox")
+                else:
+                    logger.info("Email checkbox already checked, skipping")
+            except TimeoutException:
+                logger.info("No email checkbox found — skipping")
+            except Exception as e:
+                logger.error(f"Error handling email checkbox: {e}")
 
         # Process each header
         for excel_header, value in zip(headers, row):
@@ -359,24 +911,29 @@ def fill_google_form(driver, row, headers, header_mapping, config):
             logger.info(f"Processing field: {form_header}")
 
             # Handle file upload fields
-            if "Picture of Damage Cable" in form_header or "Picture of drawing in google map" in form_header:
+            if is_file_field(form_header):
                 if isinstance(value, str) and "drive.google.com" in value:
                     start_time = time.time()
-                    temp_file_path = download_google_drive_image(value,driver, temp_dir=str(temp_dir))
+                    with progress.stage("download"), command_scope(handler="download", field=form_header):
+                        temp_file_path = download_google_drive_image(value,driver, temp_dir=str(temp_dir))
                     download_duration = time.time() - start_time
                     logger.info(f"Download took {download_duration:.2f} seconds for URL: {value}")
 
                     if temp_file_path:
                         temp_files.append(temp_file_path)
                         try:
-                            if upload_file(driver, form_header, form_header_cleaned, temp_file_path):
+                            with progress.stage("upload"), command_scope(handler="upload_file", field=form_header):
+                                uploaded = upload_file(
+                                    driver, form_header, form_header_cleaned, temp_file_path, upload_policy
+                                )
+                            if uploaded:
                                 logger.info(f"Successfully uploaded file for '{form_header}'")
                             else:
                                 logger.error(f"Failed to upload file for '{form_header}'")
-                                fields_filled = False
+                                failed_uploads.append((form_header, form_header_cleaned, temp_file_path))
                         except Exception as e:
                             logger.error(f"Failed to upload file for '{form_header}' after retries: {e}")
-                            fields_filled = False
+                            failed_uploads.append((form_header, form_header_cleaned, temp_file_path))
                     else:
                         logger.warning(f"Failed to download image from Google Drive for '{form_header}': {value}")
                         fields_filled = False
@@ -386,63 +943,68 @@ def fill_google_form(driver, row, headers, header_mapping, config):
                 time.sleep(0.5)
                 continue
 
+            # Answers pre-filled through the URL only need verifying
+            if form_header in prefilled:
+                if prefilled_answer_ok(form_answers, form_header_cleaned, prefilled[form_header]):
+                    logger.info(f"Verified pre-filled answer for '{form_header}'")
+                    continue
+                logger.warning(f"Pre-filled answer for '{form_header}' not shown, filling it directly")
+
             # Handle special case for "Number of cable * Core"
             if "Number of cable * Core" in form_header_cleaned:
-                xpath_text_other = (
-                    f"//div[@role='heading' and contains(., '{form_header_cleaned.split()[0]}')]"
-                    f"/ancestor::div[@role='listitem']//input[@type='text' or @type='number']"
-                )
-                try:
-                    input_elements = driver.find_elements(By.XPATH, xpath_text_other)
-                    if input_elements:
-                        scroll_into_view(driver, input_elements[0])
-                        input_elements[0].clear()
-                        input_elements[0].send_keys(str(value))
-                        time.sleep(0.5)
-                        if input_elements[0].get_attribute("value") == str(value):
-                            logger.info(f"Filled 'Number of cable * Core' with value: {value}")
-                        else:
-                            logger.warning(f"Failed to fill 'Number of cable * Core' with value: {value}")
-                            fields_filled = False
-                    else:
-                        logger.warning("No input element found for 'Number of cable * Core'")
-                        fields_filled = False
-                except Exception as e:
-                    logger.error(f"Error filling 'Number of cable * Core': {e}")
-                    fields_filled = False
-                continue
-
-            # Fill other fields
-            if not fill_form_field(driver, form_header, value, form_header_cleaned):
+                with progress.stage("fill"), command_scope(handler="handle_cable_core_field", field=form_header):
+                    field_ok = handle_cable_core_field(driver, form_header, value, form_header_cleaned)
+            else:
+                # Fill other fields
+                with progress.stage("fill"), command_scope(field=form_header):
+                    field_ok = fill_form_field(driver, form_header, value, form_header_cleaned)
+                time.sleep(0.2)
+            if field_ok:
+                filled_fields.append((form_header, form_header_cleaned, value))
+            else:
                 logger.warning(f"Failed to fill field '{form_header}' with value '{value}'")
-                fields_filled = False
-            time.sleep(0.2)
+                failed_fields.append((form_header, form_header_cleaned, value))
 
-        # Submit the form if all fields were filled successfully
+        # Repair failed or unverified fields in place rather than losing the row to a reload;
+        # download failures cannot be repaired here
         if fields_filled:
-             time.sleep(2)
+            with progress.stage("repair"), command_scope(handler="repair"):
+                fields_filled = repair_fields(driver, filled_fields, failed_fields, failed_uploads)
+        if not fields_filled:
+            logger.error("Not submitting the form: some fields could not be filled or repaired")
+            return False
+
+        # Submit the form now that all fields are filled
+        time.sleep(2)
         try:
-            submit_btn = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//span[text()='Submit']/ancestor::div[@role='button']"))
-            )
-            scroll_into_view(driver, submit_btn)
-            if submit_btn.get_attribute("aria-disabled") == "true":
-                logger.error("Submit button is disabled, likely due to unfilled required fields")
-                # Ghi log các trường bắt buộc còn trống
-                required_fields = driver.find_elements(By.XPATH, "//*[contains(@aria-required, 'true')]")
-                for field in required_fields:
-                    value = field.get_attribute("value") or field.text
-                    if not value:
-                        logger.warning(f"Required field empty: {field.get_attribute('aria-label')}")
-                return False
-            driver.execute_script("arguments[0].click();", submit_btn)
-            WebDriverWait(driver, 60).until(EC.url_contains("formResponse"))
-            logger.info("Form submitted successfully")
-            return True
+            with progress.stage("submit"), command_scope(handler="submit"):
+                submit_btn = WebDriverWait(driver, 10).until(
+                    EC.element_to_be_clickable((By.XPATH, "//span[text()='Submit']/ancestor::div[@role='button']"))
+                )
+                scroll_into_view(driver, submit_btn)
+                if submit_btn.get_attribute("aria-disabled") == "true":
+                    logger.error("Submit button is disabled, likely due to unfilled required fields")
+                    # Ghi log các trường bắt buộc còn trống
+                    required_fields = driver.find_elements(By.XPATH, "//*[contains(@aria-required, 'true')]")
+                    for field in required_fields:
+                        value = field.get_attribute("value") or field.text
+                        if not value:
+                            logger.warning(f"Required field empty: {field.get_attribute('aria-label')}")
+                    return False
+                if before_submit is not None and not before_submit():
+                    logger.warning("Not submitting the form: the row may no longer be submitted here")
+                    return False
+                with trace_span(driver, "submit"):
+                    return submit_and_confirm(driver, submit_btn, progress)
+        except SignInRequired:
+            raise
         except Exception as e:
             logger.error(f"Form submission failed: {e}", exc_info=True)
             return False
 
+    except SignInRequired:
+        # Every later row would fail the same way, so stop the run instead of failing one row
+        raise
     except Exception as e:
         logger.error(f"Error while filling the form: {e}")
         fields_filled = False
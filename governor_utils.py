@@ -0,0 +1,362 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEFAULT_GOVERNOR_PATH = Path(os.getenv("APPDATA", ".")) / "TRC_AUTO" / "governor.db"
+DEFAULT_CONFIG_PATH = Path(os.getenv("APPDATA", ".")) / "TRC_AUTO" / "config.json"
+# Per bucket: starting, minimum and maximum rate in calls per minute, and burst size
+BUCKET_DEFAULTS = {
+    "submit": {"rate": 30.0, "min_rate": 2.0, "max_rate": 120.0, "burst": 2},
+    "download": {"rate": 60.0, "min_rate": 6.0, "max_rate": 240.0, "burst": 4},
+}
+ADDITIVE_INCREASE_PER_MIN = 1.0
+MULTIPLICATIVE_DECREASE = 0.5
+THROTTLE_COOLDOWN_SECONDS = 60
+MAX_COOLDOWN_SECONDS = 600
+MAX_WAIT_STEP = 1.0
+# URL fragments and page text Google serves instead of the expected reply when throttling
+THROTTLE_URL_MARKERS = ("/sorry/", "google.com/sorry", "/recaptcha/")
+THROTTLE_TEXT_MARKERS = ("unusual traffic", "g-recaptcha", "our systems have detected")
+# A sign-in page means the session lost its login, e.g. an expired session snapshot, not throttling
+SIGN_IN_URL_MARKERS = ("accounts.google.com/ServiceLogin", "accounts.google.com/v3/signin", "accounts.google.com/signin")
+
+class SignInRequired(Exception):
+    """Raised when Google redirects to its sign-in page instead of serving the reply."""
+
+def is_sign_in(url):
+    """Tell whether a URL is Google's sign-in page."""
+    return any(marker in (url or "") for marker in SIGN_IN_URL_MARKERS)
+
+def classify_throttle(status=None, url="", text=""):
+    """Return why a reply looks like throttling (rate_limited, captcha), or None."""
+    if status == 429:
+        return "rate_limited"
+    if any(marker in (url or "") for marker in THROTTLE_URL_MARKERS):
+        return "captcha"
+    lowered = (text or "")[:20000].lower()
+    if any(marker in lowered for marker in THROTTLE_TEXT_MARKERS):
+        return "captcha"
+    return None
+
+class RateGovernor:
+    """Token buckets paced with AIMD, kept in SQLite so every session and worker on the machine shares them."""
+    def __init__(self, path=DEFAULT_GOVERNOR_PATH, buckets=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.buckets = buckets or BUCKET_DEFAULTS
+        # Bucket name -> time.time() of the last throttling this process saw on it
+        self.last_throttle = {}
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " name TEXT PRIMARY KEY, rate REAL NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL,"
+                " paused_until REAL NOT NULL DEFAULT 0, strikes INTEGER NOT NULL DEFAULT 0,"
+                " configured REAL NOT NULL DEFAULT 0, max_rate REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(buckets)")}
+            for column in ("configured", "max_rate"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE buckets ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+            conn.execute("BEGIN IMMEDIATE")
+            for name, settings in self.buckets.items():
+                row = conn.execute(
+                    "SELECT configured, max_rate FROM buckets WHERE name = ?", (name,)
+                ).fetchone()
+                if row is None or row != (settings["rate"], settings["max_rate"]):
+                    # New or changed settings take effect at once, dropping the rate learned under the old ones
+                    conn.execute(
+                        "INSERT OR REPLACE INTO buckets (name, rate, tokens, updated, configured, max_rate)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (name, settings["rate"], settings["burst"], time.time(), settings["rate"], settings["max_rate"])
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE buckets SET rate = MIN(MAX(rate, ?), ?) WHERE name = ?",
+                        (settings["min_rate"], settings["max_rate"], name)
+                    )
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection per call, as lease_utils does, so threads and processes can share the file."""
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _take(self, name):
+        """Take a token if one is available; return 0 on success or the seconds to wait."""
+        settings = self.buckets[name]
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rate, tokens, updated, paused_until = conn.execute(
+                "SELECT rate, tokens, updated, paused_until FROM buckets WHERE name = ?", (name,)
+            ).fetchone()
+            tokens = min(settings["burst"], tokens + max(now - updated, 0) * rate / 60)
+            if now < paused_until:
+                wait = paused_until - now
+                tokens = 0
+            elif tokens >= 1:
+                wait = 0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) * 60 / rate
+            conn.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, name))
+            conn.execute("COMMIT")
+        return wait
+
+    def acquire(self, name):
+        """Block until the named bucket grants a call; returns the seconds spent waiting."""
+        start = time.monotonic()
+        while True:
+            wait = self._take(name)
+            if wait <= 0:
+                waited = time.monotonic() - start
+                if waited > 0.5:
+                    logging.info(f"Rate governor held '{name}' for {waited:.1f}s")
+                return waited
+            time.sleep(min(wait, MAX_WAIT_STEP))
+
+    def report_success(self, name):
+        """Additive increase: raise the bucket's rate a little after each accepted call."""
+        settings = self.buckets[name]
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE buckets SET rate = MIN(rate + ?, ?), strikes = 0 WHERE name = ?",
+                (ADDITIVE_INCREASE_PER_MIN, settings["max_rate"], name)
+            )
+
+    def report_throttle(self, name, reason):
+        """Multiplicative decrease: halve the rate and pause the bucket, longer on repeated throttling."""
+        settings = self.buckets[name]
+        now = time.time()
+        self.last_throttle[name] = now
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rate, strikes, paused_until = conn.execute(
+                "SELECT rate, strikes, paused_until FROM buckets WHERE name = ?", (name,)
+            ).fetchone()
+            if now < paused_until:
+                # Calls already in flight when the pause began; one decrease per throttling episode
+                conn.execute("COMMIT")
+                logging.info(f"Throttling on '{name}' ({reason}) during an existing pause")
+                return
+            new_rate = max(rate * MULTIPLICATIVE_DECREASE, settings["min_rate"])
+            cooldown = min(THROTTLE_COOLDOWN_SECONDS * 2 ** strikes, MAX_COOLDOWN_SECONDS)
+            conn.execute(
+                "UPDATE buckets SET rate = ?, tokens = 0, updated = ?, paused_until = MAX(paused_until, ?),"
+                " strikes = strikes + 1 WHERE name = ?",
+                (new_rate, now, now + cooldown, name)
+            )
+            conn.execute("COMMIT")
+        logging.warning(
+            f"Throttling detected on '{name}' ({reason}): rate {rate:.1f} -> {new_rate:.1f}/min, "
+            f"pausing {cooldown:.0f}s"
+        )
+
+    def reset(self):
+        """Forget learned rates and pauses, starting every bucket again from its defaults."""
+        with self._connect() as conn:
+            for name, settings in self.buckets.items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, rate, tokens, updated, configured, max_rate)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, settings["rate"], settings["burst"], time.time(), settings["rate"], settings["max_rate"])
+                )
+
+    def throttled_since(self, timestamp):
+        """Return the bucket this process last saw throttled after timestamp (a time.time() value), or None."""
+        recent = [(seen, name) for name, seen in self.last_throttle.items() if seen >= timestamp]
+        return max(recent)[1] if recent else None
+
+    def rates(self):
+        """Return {bucket: (rate per minute, paused seconds left)}."""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, rate, paused_until FROM buckets").fetchall()
+        return {name: (rate, max(paused_until - now, 0)) for name, rate, paused_until in rows}
+
+def read_rates(path=DEFAULT_GOVERNOR_PATH):
+    """Return {bucket: (rate per minute, paused seconds left)} without creating or changing anything."""
+    if not Path(path).exists():
+        return {}
+    now = time.time()
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True, timeout=30)
+    try:
+        rows = conn.execute("SELECT name, rate, paused_until FROM buckets").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+    return {name: (rate, max(paused_until - now, 0)) for name, rate, paused_until in rows}
+
+def bucket_settings(config):
+    """Return the bucket settings config asks for, starting from BUCKET_DEFAULTS."""
+    buckets = {name: dict(settings) for name, settings in BUCKET_DEFAULTS.items()}
+    for name, key in (("submit", "SUBMIT_RATE_PER_MIN"), ("download", "DOWNLOAD_RATE_PER_MIN")):
+        if key in config:
+            # A configured rate is also the ceiling additive increase may not climb above
+            buckets[name]["rate"] = buckets[name]["max_rate"] = float(config[key])
+            buckets[name]["min_rate"] = min(buckets[name]["min_rate"], buckets[name]["rate"])
+    return buckets
+
+_governor = None
+
+def configure_governor(config):
+    """Create the process-wide governor from config, or turn pacing off with RATE_GOVERNOR false."""
+    global _governor
+    if not config.get("RATE_GOVERNOR", True):
+        _governor = None
+        return None
+    _governor = RateGovernor(config.get("GOVERNOR_DB", DEFAULT_GOVERNOR_PATH), bucket_settings(config))
+    return _governor
+
+def acquire_slot(name):
+    """Wait for the named bucket when a governor is configured; returns the seconds waited."""
+    return _governor.acquire(name) if _governor is not None else 0.0
+
+def report_reply(name, status=None, url="", text=""):
+    """Feed a reply back to the governor; returns the throttle reason, or None if it looked normal.
+
+    Raises SignInRequired for a redirect to Google sign-in, which pacing cannot fix.
+    """
+    if is_sign_in(url):
+        raise SignInRequired(
+            f"Google redirected the '{name}' request to its sign-in page; "
+            "sign in to Chrome again so a fresh session snapshot is taken"
+        )
+    reason = classify_throttle(status, url, text)
+    if _governor is not None:
+        if reason:
+            _governor.report_throttle(name, reason)
+        elif status is not None and 200 <= status < 400:
+            _governor.report_success(name)
+    return reason
+
+def wait_out_pause(name):
+    """Sleep until the named bucket is no longer paused after throttling."""
+    if _governor is None:
+        return
+    paused = _governor.rates().get(name, (0, 0))[1]
+    if paused > 0:
+        logging.info(f"Waiting {paused:.0f}s for the '{name}' throttling pause to end")
+        time.sleep(paused)
+
+def throttled_since(timestamp):
+    """Return the bucket throttled in this process after timestamp, or None."""
+    return _governor.throttled_since(timestamp) if _governor is not None else None
+
+class _ThrottlingHandler(BaseHTTPRequestHandler):
+    """Local stand-in for a rate-limited endpoint: 429 above its allowed rate, a CAPTCHA page when abused."""
+    def do_GET(self):
+        server = self.server
+        if self.path.startswith("/sorry/"):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"<html>Our systems have detected unusual traffic from your computer network.</html>")
+            return
+        with server.lock:
+            now = time.monotonic()
+            server.calls = [t for t in server.calls if now - t < 60] + [now]
+            over = len(server.calls) - server.limit_per_min
+        if over > server.limit_per_min:
+            self.send_response(302)
+            self.send_header("Location", "/sorry/index")
+            self.end_headers()
+        elif over > 0:
+            self.send_response(429)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+def simulate(limit_per_min, workers, seconds):
+    """Drive a local throttling stand-in with several workers through one governor and report the outcome."""
+    import tempfile
+    import requests
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ThrottlingHandler)
+    server.lock, server.calls, server.limit_per_min = threading.Lock(), [], limit_per_min
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/formResponse"
+    path = Path(tempfile.mkdtemp()) / "governor.db"
+    governor = RateGovernor(path, {"submit": dict(BUCKET_DEFAULTS["submit"])})
+    results = {"ok": 0, "throttled": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker():
+        while time.monotonic() < deadline:
+            governor.acquire("submit")
+            response = requests.get(url, timeout=10)
+            reason = classify_throttle(response.status_code, response.url, response.text)
+            with lock:
+                results["throttled" if reason else "ok"] += 1
+            if reason:
+                governor.report_throttle("submit", reason)
+            else:
+                governor.report_success("submit")
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    rate, _ = governor.rates()["submit"]
+    print(
+        f"{results['ok']} accepted ({results['ok'] / seconds * 60:.1f}/min against a limit of {limit_per_min}/min), "
+        f"{results['throttled']} throttled, final rate {rate:.1f}/min"
+    )
+
+def run_cli(argv=None):
+    """Inspect or reset the shared governor, or run it against a local throttling stand-in."""
+    parser = argparse.ArgumentParser(description="Shared submission rate governor")
+    parser.add_argument("--db", help="Path to the governor database (defaults to GOVERNOR_DB from the config)")
+    parser.add_argument("--config", default=str(DEFAULT_CONFIG_PATH), help="config.json with the configured rates")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the current rate of each bucket")
+    commands.add_parser("reset", help="Forget learned rates and pauses")
+    simulate_cmd = commands.add_parser("simulate", help="Run against a local server that throttles")
+    simulate_cmd.add_argument("--limit", type=int, default=40, help="Calls per minute the stand-in allows")
+    simulate_cmd.add_argument("--workers", type=int, default=4)
+    simulate_cmd.add_argument("--seconds", type=int, default=120)
+    args = parser.parse_args(argv)
+
+    if args.command == "simulate":
+        simulate(args.limit, args.workers, args.seconds)
+        return
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    db = args.db or config.get("GOVERNOR_DB", DEFAULT_GOVERNOR_PATH)
+    if args.command == "reset":
+        # Reset to the rates the sessions are configured with, so they do not reset it again on start
+        RateGovernor(db, bucket_settings(config)).reset()
+        print("Governor state reset")
+    else:
+        for name, (rate, paused) in sorted(read_rates(db).items()):
+            print(f"{name:<10} {rate:6.1f}/min" + (f"  paused {paused:.0f}s" if paused else ""))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    run_cli()
@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import platform
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from index_utils import form_key
+
+DEFAULT_HISTORY_PATH = Path(os.getenv("APPDATA", ".")) / "TRC_AUTO" / "history.db"
+REPORT_STAGES = ("row", "load", "download", "upload", "fill", "submit")
+SIGNIFICANCE_LEVEL = 0.05
+MIN_SAMPLES = 5
+
+def schema_hash(form_headers):
+    """Hash the form's question titles so runs against a changed form can be told apart."""
+    return hashlib.sha256(json.dumps(list(form_headers), ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) with linear interpolation, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def mann_whitney_slower(base, new):
+    """One-sided Mann-Whitney U test that new samples are larger than base samples.
+
+    Uses the normal approximation with tie and continuity correction; returns
+    the p-value, or None when either side has fewer than MIN_SAMPLES samples.
+    """
+    n1, n2 = len(base), len(new)
+    if n1 < MIN_SAMPLES or n2 < MIN_SAMPLES:
+        return None
+    combined = sorted([(v, 0) for v in base] + [(v, 1) for v in new])
+    rank_sum_new = 0.0
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        rank_sum_new += average_rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 1)
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+    n = n1 + n2
+    u_new = rank_sum_new - n2 * (n2 + 1) / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u_new - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+class RunHistory:
+    """Per-run and per-stage timing aggregates, with raw samples kept for comparisons."""
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id INTEGER PRIMARY KEY AUTOINCREMENT, started_at REAL NOT NULL, finished_at REAL NOT NULL,"
+            " form_key TEXT, schema_hash TEXT, machine TEXT, input_file TEXT,"
+            " rows_total INTEGER, rows_done INTEGER, rows_failed INTEGER);"
+            "CREATE TABLE IF NOT EXISTS stage_stats ("
+            " run_id INTEGER NOT NULL, stage TEXT NOT NULL, samples INTEGER, total REAL, p50 REAL, p95 REAL,"
+            " PRIMARY KEY (run_id, stage));"
+            "CREATE TABLE IF NOT EXISTS stage_samples ("
+            " run_id INTEGER NOT NULL, stage TEXT NOT NULL, seconds REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS stage_samples_run ON stage_samples (run_id, stage);"
+        )
+        self.conn.commit()
+
+    def record_run(self, progress, form_url, form_headers, input_file, started_at):
+        """Store a finished run from a ProgressTracker's counters and stage samples; returns its id."""
+        snapshot = progress.snapshot()
+        samples = progress.samples()
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started_at, finished_at, form_key, schema_hash, machine, input_file,"
+                " rows_total, rows_done, rows_failed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started_at, time.time(), form_key(form_url), schema_hash(form_headers) if form_headers else None,
+                 platform.node(), str(input_file), snapshot["total_rows"], snapshot["rows_done"],
+                 snapshot["rows_failed"])
+            )
+            run_id = cursor.lastrowid
+            for stage, values in samples.items():
+                self.conn.execute(
+                    "INSERT INTO stage_stats (run_id, stage, samples, total, p50, p95) VALUES (?, ?, ?, ?, ?, ?)",
+                    (run_id, stage, len(values), sum(values), percentile(values, 50), percentile(values, 95))
+                )
+                self.conn.executemany(
+                    "INSERT INTO stage_samples (run_id, stage, seconds) VALUES (?, ?, ?)",
+                    [(run_id, stage, value) for value in values]
+                )
+        logging.info(f"Recorded run {run_id} in run history")
+        return run_id
+
+    def runs(self, limit=20):
+        """Return the most recent runs as dicts, newest first."""
+        cursor = self.conn.execute("SELECT * FROM runs ORDER BY run_id DESC LIMIT ?", (limit,))
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def run(self, run_id):
+        """Return one run as a dict, or None."""
+        cursor = self.conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+        row = cursor.fetchone()
+        return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def stage_stats(self, run_id):
+        """Return {stage: (samples, total, p50, p95)} for a run."""
+        rows = self.conn.execute(
+            "SELECT stage, samples, total, p50, p95 FROM stage_stats WHERE run_id = ?", (run_id,)
+        )
+        return {stage: (samples, total, p50, p95) for stage, samples, total, p50, p95 in rows}
+
+    def samples(self, run_id, stage):
+        """Return the raw durations of one stage in a run."""
+        rows = self.conn.execute(
+            "SELECT seconds FROM stage_samples WHERE run_id = ? AND stage = ?", (run_id, stage)
+        )
+        return [r[0] for r in rows]
+
+    def compare(self, base_id, new_id, alpha=SIGNIFICANCE_LEVEL):
+        """Compare two runs stage by stage; returns dicts with medians, p95s, p-value and a slower flag."""
+        base_stats, new_stats = self.stage_stats(base_id), self.stage_stats(new_id)
+        stages = [s for s in REPORT_STAGES if s in base_stats or s in new_stats]
+        stages += sorted((set(base_stats) | set(new_stats)) - set(stages))
+        results = []
+        for stage in stages:
+            base, new = self.samples(base_id, stage), self.samples(new_id, stage)
+            p_value = mann_whitney_slower(base, new)
+            base_p50, new_p50 = percentile(base, 50), percentile(new, 50)
+            change = (new_p50 / base_p50 - 1) * 100 if base_p50 and new_p50 is not None else None
+            results.append({
+                "stage": stage,
+                "base_p50": base_p50, "new_p50": new_p50,
+                "base_p95": percentile(base, 95), "new_p95": percentile(new, 95),
+                "change_pct": change,
+                "p_value": p_value,
+                "slower": p_value is not None and p_value < alpha,
+            })
+        return results
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+def _seconds(value):
+    """Format an optional duration for the report."""
+    return f"{value:.2f}" if value is not None else "-"
+
+def format_comparison(base, new, results):
+    """Format a run comparison as a text table."""
+    lines = [
+        f"Base run {base['run_id']} ({datetime.fromtimestamp(base['started_at']):%Y-%m-%d %H:%M}, "
+        f"{base['machine']}, schema {base['schema_hash']})",
+        f"New run  {new['run_id']} ({datetime.fromtimestamp(new['started_at']):%Y-%m-%d %H:%M}, "
+        f"{new['machine']}, schema {new['schema_hash']})",
+    ]
+    if base["form_key"] != new["form_key"]:
+        lines.append("Warning: the runs are against different forms")
+    elif base["schema_hash"] != new["schema_hash"]:
+        lines.append("Note: the form's questions changed between the runs")
+    lines.append("")
+    lines.append(f"{'Stage':<16} {'p50 base':>9} {'p50 new':>9} {'p95 base':>9} {'p95 new':>9} {'Change':>8} {'p':>7}")
+    for r in results:
+        change = f"{r['change_pct']:+.0f}%" if r["change_pct"] is not None else "-"
+        p_value = f"{r['p_value']:.3f}" if r["p_value"] is not None else "-"
+        flag = "  SLOWER" if r["slower"] else ""
+        lines.append(
+            f"{r['stage'][:16]:<16} {_seconds(r['base_p50']):>9} {_seconds(r['new_p50']):>9} "
+            f"{_seconds(r['base_p95']):>9} {_seconds(r['new_p95']):>9} {change:>8} {p_value:>7}{flag}"
+        )
+    return "\n".join(lines)
+
+def run_cli(argv=None):
+    """Report command: list recorded runs, show one, or compare two for significant slowdowns."""
+    parser = argparse.ArgumentParser(description="Inspect the run-history metrics store")
+    parser.add_argument("--history", default=str(DEFAULT_HISTORY_PATH), help="Path to the history database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_cmd = commands.add_parser("list", help="List recent runs")
+    list_cmd.add_argument("--limit", type=int, default=20)
+    show_cmd = commands.add_parser("show", help="Show a run's stage percentiles")
+    show_cmd.add_argument("run_id", type=int)
+    compare_cmd = commands.add_parser("compare", help="Compare two runs (default: the last two)")
+    compare_cmd.add_argument("base_id", type=int, nargs="?")
+    compare_cmd.add_argument("new_id", type=int, nargs="?")
+    compare_cmd.add_argument("--alpha", type=float, default=SIGNIFICANCE_LEVEL)
+    args = parser.parse_args(argv)
+
+    history = RunHistory(args.history)
+    try:
+        if args.command == "list":
+            for run in history.runs(args.limit):
+                print(
+                    f"{run['run_id']:5d}  {datetime.fromtimestamp(run['started_at']):%Y-%m-%d %H:%M}  "
+                    f"{run['rows_done']:4d} ok {run['rows_failed']:3d} failed  "
+                    f"{run['machine']}  {Path(run['input_file']).name}"
+                )
+        elif args.command == "show":
+            run = history.run(args.run_id)
+            if run is None:
+                parser.error(f"No run {args.run_id}")
+            print(f"Run {run['run_id']}: {run['rows_done']} ok, {run['rows_failed']} failed of {run['rows_total']}")
+            for stage, (samples, total, p50, p95) in sorted(history.stage_stats(args.run_id).items()):
+                print(f"{stage:<16} {samples:6d} samples  total {total:8.1f}s  p50 {_seconds(p50)}s  p95 {_seconds(p95)}s")
+        else:
+            if args.base_id is None or args.new_id is None:
+                recent = history.runs(2)
+                if len(recent) < 2:
+                    parser.error("Need two recorded runs to compare")
+                args.base_id, args.new_id = recent[1]["run_id"], recent[0]["run_id"]
+            base, new = history.run(args.base_id), history.run(args.new_id)
+            if base is None or new is None:
+                parser.error("Unknown run id")
+            print(format_comparison(base, new, history.compare(args.base_id, args.new_id, args.alpha)))
+    finally:
+        history.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    run_cli()
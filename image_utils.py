@@ -1,9 +1,126 @@
+import hashlib
 import logging
 import os
 import re
 import tempfile
+import time
 import requests
 from urllib.parse import urlparse
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from governor_utils import SignInRequired, acquire_slot, report_reply
+
+# Streaming download settings
+MAX_DOWNLOAD_SIZE = 10 * 1024 * 1024  # 10 MB
+DOWNLOAD_TIMEOUT = (10, 60)  # (connect, read) seconds per request
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+TARGET_CHUNK_SECONDS = 0.25  # Grow chunks while a read takes less than this
+MAX_RESUME_ATTEMPTS = 5
+IMAGE_SIGNATURES = (
+    b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"RIFF", b"BM", b"II*\x00", b"MM\x00*"
+)
+# ISO-BMFF images (HEIC from phones, AVIF) start with an ftyp box naming one of these brands
+IMAGE_FTYP_BRANDS = (b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1", b"avif", b"avis")
+
+def is_image_data(head):
+    """Tell whether the first bytes of a download look like a supported image."""
+    if head.startswith(IMAGE_SIGNATURES):
+        return True
+    return head[4:8] == b"ftyp" and head[8:12] in IMAGE_FTYP_BRANDS
+
+class DownloadError(Exception):
+    """Raised when a streamed download cannot be completed or fails validation."""
+
+def _next_chunk_size(chunk_size, elapsed):
+    """Double the chunk size while reads are fast, halve it when they are slow."""
+    if elapsed < TARGET_CHUNK_SECONDS / 2:
+        return min(chunk_size * 2, MAX_CHUNK_SIZE)
+    if elapsed > TARGET_CHUNK_SECONDS * 2:
+        return max(chunk_size // 2, MIN_CHUNK_SIZE)
+    return chunk_size
+
+def _resume_offset(response, offset):
+    """Return the offset the response body starts at, or None if the server ignored the Range."""
+    if response.status_code == 206:
+        match = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else None
+    if response.status_code == 200:
+        return 0
+    raise DownloadError(f"Unexpected status {response.status_code} while resuming at byte {offset}")
+
+def stream_to_file(session, url, headers, response, out_file, max_size=MAX_DOWNLOAD_SIZE):
+    """Stream a response into out_file, resuming with HTTP Range requests after interruption.
+
+    The content is hashed and size-checked as it is written, so validation needs no extra
+    pass over the data. Returns the hex SHA-256 digest of the complete file.
+    """
+    sha256 = hashlib.sha256()
+    offset = 0
+    attempts = 0
+    chunk_size = MIN_CHUNK_SIZE
+    expected_size = None
+
+    while True:
+        try:
+            if response is None:
+                range_headers = dict(headers, Range=f"bytes={offset}-")
+                range_headers['Accept-Encoding'] = 'identity'
+                response = session.get(url, stream=True, headers=range_headers, timeout=DOWNLOAD_TIMEOUT)
+                start = _resume_offset(response, offset)
+                if start != offset:
+                    # The body does not continue the file; restart from scratch
+                    logging.warning(f"Server answered a Range request at byte {offset} from byte {start}, restarting")
+                    out_file.seek(0)
+                    out_file.truncate()
+                    sha256 = hashlib.sha256()
+                    offset = 0
+                    if start != 0:
+                        # Neither a continuation nor the whole file, so fetch it again without a Range
+                        response.close()
+                        response = session.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+                        if response.status_code != 200:
+                            raise DownloadError(f"Unexpected status {response.status_code} on restart")
+            if expected_size is None and response.status_code == 200:
+                length = response.headers.get('Content-Length')
+                expected_size = int(length) if length and length.isdigit() else None
+                if expected_size is not None and expected_size > max_size:
+                    raise DownloadError(f"File exceeds maximum size limit: {max_size} bytes")
+
+            raw = response.raw
+            while True:
+                read_start = time.perf_counter()
+                chunk = raw.read(chunk_size, decode_content=True)
+                if not chunk:
+                    break
+                if offset == 0 and not is_image_data(chunk):
+                    raise DownloadError("Downloaded content is not a recognised image")
+                offset += len(chunk)
+                if offset > max_size:
+                    raise DownloadError(f"File exceeds maximum size limit: {max_size} bytes")
+                sha256.update(chunk)
+                out_file.write(chunk)
+                chunk_size = _next_chunk_size(chunk_size, time.perf_counter() - read_start)
+            response.close()
+
+            if expected_size is not None and offset < expected_size:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"Connection closed at byte {offset} of {expected_size}"
+                )
+            return sha256.hexdigest()
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+                ProtocolError, ReadTimeoutError) as e:
+            if response is not None:
+                response.close()
+            response = None
+            attempts += 1
+            if attempts > MAX_RESUME_ATTEMPTS:
+                raise DownloadError(f"Giving up after {MAX_RESUME_ATTEMPTS} resume attempts: {e}")
+            out_file.flush()
+            chunk_size = MIN_CHUNK_SIZE
+            logging.warning(f"Download interrupted at byte {offset} ({e}), resuming (attempt {attempts})")
+            time.sleep(min(2 ** (attempts - 1), 8))
 
 def download_google_drive_image(google_drive_link, driver, temp_dir="images"):
     """Download an image from a Google Drive link using WebDriver cookies."""
@@ -60,16 +177,19 @@ def download_google_drive_image(google_drive_link, driver, temp_dir="images"):
             )
         }
 
-        # Make the request with the session
-        response = session.get(download_url, stream=True, headers=headers, timeout=600)
-        if response.status_code != 200:
-            logging.error(f"Failed to download file from {download_url}: Status {response.status_code}")
-            return None
-        
-        # Verify content type
+        # Make the request with the session, paced by the shared rate governor
+        acquire_slot("download")
+        response = session.get(download_url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT)
         content_type = response.headers.get('Content-Type', '')
-        if not content_type.startswith('image/'):
-            logging.error(f"Unexpected content type: {content_type}")
+        if response.status_code != 200 or not content_type.startswith('image/'):
+            text = response.text if content_type.startswith('text/html') else ""
+            reason = report_reply("download", response.status_code, response.url, text)
+            if reason:
+                logging.error(f"Google Drive is throttling downloads ({reason}): {download_url}")
+            elif response.status_code != 200:
+                logging.error(f"Failed to download file from {download_url}: Status {response.status_code}")
+            else:
+                logging.error(f"Unexpected content type: {content_type}")
             return None
 
         # Create temp directory and file
@@ -79,24 +199,25 @@ def download_google_drive_image(google_drive_link, driver, temp_dir="images"):
             suffix='.png',
             dir=temp_dir
         )
-        
-        # Download file with size limit
-        max_size = 10 * 1024 * 1024  # 10 MB
-        downloaded_size = 0
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                downloaded_size += len(chunk)
-                if downloaded_size > max_size:
-                    temp_file.close()
-                    os.unlink(temp_file.name)
-                    logging.error(f"File exceeds maximum size limit: {max_size} bytes")
-                    return None
-                temp_file.write(chunk)
+
+        # Download file with size limit, resuming with Range requests on interruption
+        try:
+            digest = stream_to_file(session, download_url, headers, response, temp_file)
+        except DownloadError as e:
+            temp_file.close()
+            os.unlink(temp_file.name)
+            logging.error(f"Failed to download file from {download_url}: {e}")
+            return None
         temp_file.close()
+        report_reply("download", response.status_code, response.url)
+        logging.info(f"Downloaded {os.path.getsize(temp_file.name)} bytes (sha256 {digest})")
         
         logging.info(f"Downloaded image to {temp_file.name}")
         return temp_file.name
 
+    except SignInRequired as e:
+        logging.error(f"Google Drive file is not accessible without signing in: {e}")
+        return None
     except requests.exceptions.Timeout:
         logging.error(f"Download timed out for link: {google_drive_link}")
         return None
@@ -0,0 +1,153 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+DEFAULT_INDEX_PATH = Path(os.getenv("APPDATA", ".")) / "TRC_AUTO" / "submissions.db"
+IGNORED_HEADERS = {"note"}
+
+def form_key(form_url):
+    """Identify a form by its URL without query string or trailing view path."""
+    base = form_url.split("?", 1)[0].rstrip("/")
+    for suffix in ("/viewform", "/formResponse"):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    return base
+
+def _normalize_value(value):
+    """Render a cell value the same way regardless of the input format it came from."""
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return " ".join(str(value).split()) if value is not None else ""
+
+def row_hash(headers, row):
+    """Hash a row's content by header name, ignoring column order and the Note column."""
+    pairs = sorted(
+        (header.strip(), _normalize_value(value))
+        for header, value in zip(headers, row)
+        if header.strip().lower() not in IGNORED_HEADERS
+    )
+    return hashlib.sha256(json.dumps(pairs, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class SubmissionIndex:
+    """Content-hash index of rows already submitted, kept per form in SQLite."""
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            " form_key TEXT NOT NULL, row_hash TEXT NOT NULL, submitted_at REAL NOT NULL,"
+            " source TEXT, PRIMARY KEY (form_key, row_hash))"
+        )
+        self.conn.commit()
+        self._cache = {}
+
+    def _hashes(self, form_url):
+        """Load the hashes for a form into memory once so lookups are O(1)."""
+        key = form_key(form_url)
+        if key not in self._cache:
+            rows = self.conn.execute("SELECT row_hash FROM submissions WHERE form_key = ?", (key,))
+            self._cache[key] = {r[0] for r in rows}
+            logging.info(f"Loaded {len(self._cache[key])} submitted row hashes for {key}")
+        return self._cache[key]
+
+    def contains(self, form_url, headers, row):
+        """Tell whether this row's content was already submitted to the form."""
+        return row_hash(headers, row) in self._hashes(form_url)
+
+    def add(self, form_url, headers, row, source=""):
+        """Record a row as submitted to the form."""
+        digest = row_hash(headers, row)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO submissions (form_key, row_hash, submitted_at, source) VALUES (?, ?, ?, ?)",
+            (form_key(form_url), digest, time.time(), str(source))
+        )
+        self.conn.commit()
+        self._hashes(form_url).add(digest)
+
+    def rebuild(self, form_url, headers, rows, notes, reset=False):
+        """Add the rows a workbook's notes mark as Inserted; returns how many were new.
+
+        With reset, the form's existing entries are dropped first.
+        """
+        key = form_key(form_url)
+        added = 0
+        with self.conn:
+            if reset:
+                self.conn.execute("DELETE FROM submissions WHERE form_key = ?", (key,))
+            for row, note in zip(rows, notes):
+                if note == "Inserted":
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO submissions (form_key, row_hash, submitted_at, source)"
+                        " VALUES (?, ?, ?, ?)",
+                        (key, row_hash(headers, row), time.time(), "rebuild")
+                    )
+                    added += cursor.rowcount
+        self._cache.pop(key, None)
+        return added
+
+    def prune(self, older_than_days, form_url=None):
+        """Delete entries older than the given number of days, optionally for one form."""
+        cutoff = time.time() - older_than_days * 86400
+        query = "DELETE FROM submissions WHERE submitted_at < ?"
+        params = [cutoff]
+        if form_url:
+            query += " AND form_key = ?"
+            params.append(form_key(form_url))
+        with self.conn:
+            removed = self.conn.execute(query, params).rowcount
+        self._cache.clear()
+        return removed
+
+    def stats(self):
+        """Return (form_key, count) pairs for every indexed form."""
+        return self.conn.execute(
+            "SELECT form_key, COUNT(*) FROM submissions GROUP BY form_key ORDER BY form_key"
+        ).fetchall()
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+def run_cli(argv=None):
+    """Maintenance command: rebuild the index from a workbook, prune old entries or show stats."""
+    from excel_utils import read_input_data, read_notes
+
+    parser = argparse.ArgumentParser(description="Maintain the submitted-rows index")
+    parser.add_argument("--index", default=str(DEFAULT_INDEX_PATH), help="Path to the index database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = commands.add_parser("rebuild", help="Index the rows a workbook marks as Inserted")
+    rebuild_cmd.add_argument("form_url")
+    rebuild_cmd.add_argument("input_file")
+    rebuild_cmd.add_argument("--reset", action="store_true", help="Drop the form's entries first")
+    prune_cmd = commands.add_parser("prune", help="Remove entries older than N days")
+    prune_cmd.add_argument("days", type=float)
+    prune_cmd.add_argument("--form-url")
+    commands.add_parser("stats", help="Show indexed row counts per form")
+    args = parser.parse_args(argv)
+
+    index = SubmissionIndex(args.index)
+    try:
+        if args.command == "rebuild":
+            headers, rows = read_input_data(args.input_file)
+            notes = read_notes(args.input_file, headers, rows)
+            print(f"Indexed {index.rebuild(args.form_url, headers, rows, notes, args.reset)} new rows")
+        elif args.command == "prune":
+            print(f"Removed {index.prune(args.days, args.form_url)} entries")
+        else:
+            for key, count in index.stats():
+                print(f"{count:8d}  {key}")
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    run_cli()
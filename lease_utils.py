@@ -0,0 +1,395 @@
+import argparse
+import hmac
+import json
+import logging
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+LEASE_SECONDS = 180
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 3
+IDLE_POLL_SECONDS = 5
+DEFAULT_CONFIG_PATH = Path(os.getenv("APPDATA", ".")) / "TRC_AUTO" / "config.json"
+# Shared secret between the lease service and its workers, also accepted from --token
+TOKEN_ENV = "TRC_LEASE_TOKEN"
+
+class LeaseStore:
+    """SQLite-backed queue of workbook rows handed out to workers as timed leases."""
+    def __init__(self, path):
+        self.path = str(path)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                " row_idx INTEGER PRIMARY KEY, payload TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'pending',"
+                " worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, note TEXT)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection per call so the HTTP service can use the store from any thread."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, input_file, form_url):
+        """Queue the input file's pending rows, skipping rows already marked or indexed."""
+        from excel_utils import read_input_data, open_status
+        from index_utils import SubmissionIndex, _normalize_value
+
+        headers, rows = read_input_data(input_file)
+        status = open_status(input_file, headers, rows)
+        index = SubmissionIndex()
+        queued = 0
+        try:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for key, value in (("headers", headers), ("form_url", form_url), ("input_file", str(input_file))):
+                    conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+                for idx, row in enumerate(rows, start=2):
+                    if status.get(idx) == "Inserted" or index.contains(form_url, headers, row):
+                        continue
+                    # Stored as the index renders each cell, so a worker's row hashes like the GUI's
+                    payload = [_normalize_value(value) for value in row]
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO rows (row_idx, payload) VALUES (?, ?)", (idx, json.dumps(payload))
+                    )
+                    queued += cursor.rowcount
+                conn.execute("COMMIT")
+        finally:
+            index.close()
+        logging.info(f"Queued {queued} rows from {input_file}")
+        return queued
+
+    def meta(self):
+        """Return the queue's headers, form URL and input file."""
+        with self._connect() as conn:
+            return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        """Lease the next pending or expired row to worker; returns {row_idx, row} or None."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE rows SET state = 'failed', worker = NULL, note = 'Lease expired after final attempt'"
+                " WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS)
+            )
+            found = conn.execute(
+                "SELECT row_idx, payload FROM rows"
+                " WHERE attempts < ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))"
+                " ORDER BY row_idx LIMIT 1",
+                (MAX_ATTEMPTS, now)
+            ).fetchone()
+            if found is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE rows SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1"
+                " WHERE row_idx = ?",
+                (worker, now + lease_seconds, found[0])
+            )
+            conn.execute("COMMIT")
+        return {"row_idx": found[0], "row": json.loads(found[1])}
+
+    def heartbeat(self, worker, row_idx, lease_seconds=LEASE_SECONDS):
+        """Extend worker's lease on row_idx; returns False if the lease was lost."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE rows SET lease_expires = ? WHERE row_idx = ? AND worker = ? AND state = 'leased'",
+                (time.time() + lease_seconds, row_idx, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, worker, row_idx, success, note=""):
+        """Record the result of a leased row; failed rows go back to pending until MAX_ATTEMPTS."""
+        state = "done" if success else "pending"
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE rows SET state = CASE WHEN ? = 'pending' AND attempts >= ? THEN 'failed' ELSE ? END,"
+                " worker = NULL, lease_expires = NULL, note = ?"
+                " WHERE row_idx = ? AND worker = ? AND state = 'leased'",
+                (state, MAX_ATTEMPTS, state, note, row_idx, worker)
+            )
+            return cursor.rowcount == 1
+
+    def counts(self):
+        """Return the number of rows in each state."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT state, COUNT(*) FROM rows GROUP BY state").fetchall())
+
+    def write_back(self):
+        """Write finished rows' notes into the input file (or its status sidecar)."""
+        from excel_utils import open_status
+
+        meta = self.meta()
+        status = open_status(meta["input_file"], meta["headers"])
+        with self._connect() as conn:
+            finished = conn.execute("SELECT row_idx, state, note FROM rows WHERE state IN ('done', 'failed')")
+            for row_idx, state, note in finished:
+                status.set(row_idx, "Inserted" if state == "done" else note)
+        status.save()
+
+class _LeaseRequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoints exposing a LeaseStore to workers holding the service's shared token."""
+    store = None
+    token = None
+
+    def log_message(self, format, *args):
+        logging.debug(f"Lease service: {format % args}")
+
+    def _authorized(self):
+        """Check the request's bearer token, replying 401 when it is missing or wrong."""
+        supplied = self.headers.get("Authorization", "")
+        if hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {self.token}".encode("utf-8")):
+            return True
+        self._reply({"error": "unauthorized"}, 401)
+        return False
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/meta":
+            self._reply(self.store.meta())
+        elif self.path == "/counts":
+            self._reply(self.store.counts())
+        else:
+            self._reply({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        try:
+            args = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/claim":
+                self._reply(self.store.claim(args["worker"], args.get("lease_seconds", LEASE_SECONDS)))
+            elif self.path == "/heartbeat":
+                self._reply(self.store.heartbeat(args["worker"], args["row_idx"], args.get("lease_seconds", LEASE_SECONDS)))
+            elif self.path == "/complete":
+                self._reply(self.store.complete(args["worker"], args["row_idx"], args["success"], args.get("note", "")))
+            else:
+                self._reply({"error": "not found"}, 404)
+        except Exception as e:
+            logging.error(f"Lease service error on {self.path}: {e}")
+            self._reply({"error": str(e)}, 500)
+
+def make_server(store, token, host="127.0.0.1", port=8765):
+    """Create the lease service's HTTP server; every request must carry token."""
+    if not token:
+        raise ValueError("The lease service needs a shared token")
+    handler = type("LeaseRequestHandler", (_LeaseRequestHandler,), {"store": store, "token": token})
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(store, token, host="127.0.0.1", port=8765):
+    """Serve a LeaseStore over HTTP until interrupted."""
+    server = make_server(store, token, host, port)
+    logging.info(f"Lease service listening on {host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+class HttpLeaseClient:
+    """Talk to a lease service with the same methods as LeaseStore."""
+    def __init__(self, base_url, token):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def _get(self, path):
+        response = self.session.get(f"{self.base_url}{path}", timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def _post(self, path, **args):
+        response = self.session.post(f"{self.base_url}{path}", json=args, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def meta(self):
+        return self._get("/meta")
+
+    def counts(self):
+        return self._get("/counts")
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        return self._post("/claim", worker=worker, lease_seconds=lease_seconds)
+
+    def heartbeat(self, worker, row_idx, lease_seconds=LEASE_SECONDS):
+        return self._post("/heartbeat", worker=worker, row_idx=row_idx, lease_seconds=lease_seconds)
+
+    def complete(self, worker, row_idx, success, note=""):
+        return self._post("/complete", worker=worker, row_idx=row_idx, success=success, note=note)
+
+def _heartbeat_loop(queue, worker, row_idx, stop, lost):
+    """Keep a lease alive while its row is being filled, setting lost if another worker took it."""
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            if not queue.heartbeat(worker, row_idx):
+                logging.warning(f"Lease on row {row_idx} was lost")
+                lost.set()
+                return
+        except Exception as e:
+            logging.warning(f"Heartbeat for row {row_idx} failed: {e}")
+
+def run_worker(config, queue, worker=None):
+    """Claim leased rows from queue and submit them until no rows are left."""
+    from driver_utils import initialize_driver
+    from form_utils import get_form_headers, fill_google_form
+    from governor_utils import SignInRequired, configure_governor
+    from index_utils import SubmissionIndex
+    from matching_utils import match_headers
+    from progress_utils import ProgressTracker
+    from watchdog_utils import BrowserWatchdog
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    meta = queue.meta()
+    config = dict(config, GOOGLE_FORM_URL=meta["form_url"])
+    excel_headers = meta["headers"]
+    # Pace submits and downloads through the same buckets as every other session on the machine
+    configure_governor(config)
+    progress = ProgressTracker()
+    index = SubmissionIndex()
+    watchdog = BrowserWatchdog(config, lambda: initialize_driver(config))
+    processed = 0
+    try:
+        form_headers = get_form_headers(watchdog.start(), config)
+        header_mapping, _ = match_headers(excel_headers, form_headers)
+        while True:
+            lease = queue.claim(worker)
+            if lease is None:
+                counts = queue.counts()
+                if not counts.get("leased"):
+                    break
+                # Other workers hold the remaining rows; wait in case their leases expire
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            row_idx, row = lease["row_idx"], lease["row"]
+            logging.info(f"Worker {worker} processing row {row_idx}")
+            stop, lost = threading.Event(), threading.Event()
+            threading.Thread(target=_heartbeat_loop, args=(queue, worker, row_idx, stop, lost), daemon=True).start()
+
+            def still_leased():
+                """Confirm the lease right before submitting, so a re-claimed row is never submitted twice."""
+                try:
+                    held = not lost.is_set() and queue.heartbeat(worker, row_idx)
+                except Exception as e:
+                    logging.warning(f"Could not confirm the lease on row {row_idx}: {e}")
+                    held = False
+                if not held:
+                    lost.set()
+                return held
+
+            try:
+                success = fill_google_form(
+                    watchdog.driver, row, excel_headers, header_mapping, config, progress, before_submit=still_leased
+                )
+            except SignInRequired:
+                raise  # The lease expires and another worker can take the row
+            except Exception as e:
+                logging.error(f"Browser session failed on row {row_idx}: {e}")
+                success = False
+            finally:
+                stop.set()
+            if lost.is_set() and not success:
+                logging.warning(f"Abandoned row {row_idx}: its lease was lost before submitting")
+                processed += 1
+                watchdog.after_row()
+                continue
+            if success:
+                index.add(config["GOOGLE_FORM_URL"], excel_headers, row, source=f"lease:{worker}")
+            note = "" if success else f"Failed to insert row {row_idx-1} on worker {worker}"
+            if not queue.complete(worker, row_idx, success, note):
+                logging.warning(f"Result for row {row_idx} not recorded: lease expired and was reassigned")
+            processed += 1
+            if not success:
+                watchdog.recover()
+            watchdog.after_row()
+    finally:
+        index.close()
+        watchdog.stop()
+    logging.info(f"Worker {worker} finished after {processed} rows")
+    return processed
+
+def run_cli(argv=None):
+    """Command line entry point for the coordinator and its workers."""
+    parser = argparse.ArgumentParser(description="Split a workbook into row leases for many workers")
+    parser.add_argument("--db", help="Lease database (defaults to <input>.leases.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue_cmd = commands.add_parser("enqueue", help="Queue an input file's pending rows")
+    enqueue_cmd.add_argument("input_file")
+    enqueue_cmd.add_argument("--form-url", help="Defaults to GOOGLE_FORM_URL from config.json")
+    serve_cmd = commands.add_parser("serve", help="Serve the queue over HTTP")
+    serve_cmd.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 to accept workers on other machines")
+    serve_cmd.add_argument("--port", type=int, default=8765)
+    serve_cmd.add_argument("--token", default=os.getenv(TOKEN_ENV), help=f"Shared token (default ${TOKEN_ENV}, else generated)")
+    work_cmd = commands.add_parser("work", help="Run a worker against the database or a lease service")
+    work_cmd.add_argument("--url", help="Lease service URL, e.g. http://host:8765")
+    work_cmd.add_argument("--token", default=os.getenv(TOKEN_ENV), help=f"The service's shared token (default ${TOKEN_ENV})")
+    work_cmd.add_argument("--config", default=str(DEFAULT_CONFIG_PATH))
+    commands.add_parser("status", help="Show row counts per state")
+    commands.add_parser("writeback", help="Write finished rows' notes into the input file")
+    args = parser.parse_args(argv)
+
+    db = args.db
+    if db is None and args.command == "enqueue":
+        db = args.input_file + ".leases.db"
+    if args.command == "work" and args.url:
+        if not args.token:
+            parser.error(f"--token or ${TOKEN_ENV} is required with --url")
+        queue = HttpLeaseClient(args.url, args.token)
+    elif db:
+        queue = LeaseStore(db)
+    else:
+        parser.error("--db is required unless enqueueing or working against --url")
+
+    if args.command == "enqueue":
+        form_url = args.form_url
+        if not form_url:
+            with open(DEFAULT_CONFIG_PATH, "r", encoding="utf-8") as f:
+                form_url = json.load(f)["GOOGLE_FORM_URL"]
+        print(f"Queued {queue.enqueue(args.input_file, form_url)} rows in {db}")
+    elif args.command == "serve":
+        token = args.token or secrets.token_urlsafe(24)
+        if not args.token:
+            print(f"Workers must pass --token {token}")
+        serve(queue, token, args.host, args.port)
+    elif args.command == "work":
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        run_worker(config, queue)
+    elif args.command == "status":
+        print(queue.counts())
+    else:
+        queue.write_back()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    run_cli()
@@ -25,4 +25,17 @@ def configure_logging():
 
     # Add handlers to the logger
     logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
\ No newline at end of file
+    logger.addHandler(file_handler)
+def configure_app_logging():
+    """Log to app.log, and to stdout when running in a console, unless logging is already set up."""
+    if logging.getLogger().handlers:
+        return
+    log_handlers = [logging.FileHandler("app.log", encoding="utf-8")]
+    # Only add StreamHandler if running in a console environment
+    if hasattr(sys, 'stdout') and sys.stdout is not None and hasattr(sys.stdout, 'encoding'):
+        log_handlers.append(logging.StreamHandler(sys.stdout))
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=log_handlers
+    )
@@ -1,16 +1,34 @@
+import time
+_PROCESS_START = time.perf_counter()
+
 import logging
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
+import importlib
 import json
 import os
-import openpyxl
+import queue
 import sys
 import threading
-from driver_utils import terminate_chrome_processes, initialize_driver
-from excel_utils import read_excel_data
-from form_utils import get_form_headers, fill_google_form
-from matching_utils import match_headers
+from logging_config import configure_app_logging
+
+# Heavy modules (selenium, openpyxl, bs4, fuzzywuzzy, requests) are imported lazily in
+# main() or by the background prewarm thread so the window can appear immediately.
+PREWARM_MODULES = ("excel_utils", "matching_utils", "driver_utils", "form_utils")
+STARTUP_BUDGET_SECONDS = 1.0  # Target from process start until the window is shown
+PROGRESS_POLL_MS = 500
+SUPPORTED_INPUT_SUFFIXES = (".xlsx", ".xlsm", ".csv")  # Mirrors excel_utils.INPUT_READERS
+
+configure_app_logging()
+
+def check_startup_budget(startup_seconds):
+    """Log the cold start time; warns and returns False when it went over STARTUP_BUDGET_SECONDS."""
+    if startup_seconds > STARTUP_BUDGET_SECONDS:
+        logging.warning(f"Cold start took {startup_seconds:.2f}s, over the {STARTUP_BUDGET_SECONDS:.2f}s budget")
+        return False
+    logging.info(f"Cold start took {startup_seconds:.2f}s")
+    return True
 
 # Dynamic resource path for PyInstaller
 def resource_path(relative_path):
@@ -25,6 +43,8 @@ def resource_path(relative_path):
 APP_DATA_DIR = Path(os.getenv("APPDATA")) / "TRC_AUTO"
 APP_DATA_DIR.mkdir(exist_ok=True)
 CONFIG_JSON = str(APP_DATA_DIR / "config.json")
+SUBMISSION_INDEX_PATH = APP_DATA_DIR / "submissions.db"
+RUN_HISTORY_PATH = APP_DATA_DIR / "history.db"
 
 class ConfigGUI:
     """GUI for managing configuration settings stored in config.json."""
@@ -35,11 +55,13 @@ class ConfigGUI:
         self.entries = {}
         self.is_running = False
         self.workbook = None  # Store workbook for access during cleanup
+        self.progress_queue = None
+        self.account_name, self.email = "Loading...", "Loading..."
         self.load_config()
         
         # Center the window on the screen
         window_width = 700
-        window_height = 500
+        window_height = 580
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
         x_position = (screen_width - window_width) // 2
@@ -48,6 +70,32 @@ class ConfigGUI:
         
         self.create_widgets()
         self.apply_styles()
+        self.root.after_idle(self.on_window_ready)
+
+    def on_window_ready(self):
+        """Record the startup time and start background preparation once the window is shown."""
+        check_startup_budget(time.perf_counter() - _PROCESS_START)
+        threading.Thread(target=self.prewarm, args=(dict(self.config_values),), daemon=True).start()
+
+    def prewarm(self, config):
+        """Load account info, heavy modules and the ChromeDriver path in the background."""
+        account_name, email = self.get_account_info(config)
+        self.root.after(0, lambda: self.update_account_labels(account_name, email))
+        start = time.perf_counter()
+        try:
+            for module_name in PREWARM_MODULES:
+                importlib.import_module(module_name)
+            from driver_utils import resolve_driver_path
+            resolve_driver_path(config)
+            logging.info(f"Background preparation finished in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logging.warning(f"Background preparation failed, will retry on run: {e}")
+
+    def update_account_labels(self, account_name, email):
+        """Show the given account name and email in the GUI."""
+        self.account_name, self.email = account_name, email
+        self.account_name_label.config(text=f"Account Name: {self.account_name}")
+        self.email_label.config(text=f"Email: {self.email}")
 
     def apply_styles(self):
         """Apply custom styles for a good and cute GUI."""
@@ -85,12 +133,11 @@ class ConfigGUI:
             if key not in self.config_values:
                 self.config_values[key] = value
 
-        self.account_name, self.email = self.get_account_info()
-
-    def get_account_info(self):
+    def get_account_info(self, config=None):
         """Retrieve account name and email from Chrome's Local State file."""
+        config = config or self.config_values
         try:
-            local_state_path = Path(self.config_values["USER_DATA_DIR"]) / "Local State"
+            local_state_path = Path(config["USER_DATA_DIR"]) / "Local State"
             if not local_state_path.is_file():
                 logging.warning(f"Local State file not found at {local_state_path}")
                 return "Not available", "Not available"
@@ -99,7 +146,7 @@ class ConfigGUI:
                 local_state = json.load(f)
 
             profile_cache = local_state.get("profile", {}).get("info_cache", {})
-            profile_info = profile_cache.get(self.config_values["PROFILE_DIR"], {})
+            profile_info = profile_cache.get(config["PROFILE_DIR"], {})
 
             account_name = profile_info.get("name", "Not available")
             email = profile_info.get("user_name", "Not available")
@@ -113,7 +160,9 @@ class ConfigGUI:
     def save_config(self):
         """Save configuration to config.json."""
         try:
+            # Keep tuning keys that have no widget (USE_SESSION_SNAPSHOT, SESSION_SNAPSHOT_MAX_AGE_HOURS, ...)
             config_data = {
+                **self.config_values,
                 "GOOGLE_FORM_URL": self.entries["GOOGLE_FORM_URL"].get().strip(),
                 "EXCEL_FILE": str(Path(self.entries["EXCEL_FILE"].get())) if self.entries["EXCEL_FILE"].get() else "",
                 "USER_DATA_DIR": str(Path(self.entries["USER_DATA_DIR"].get())),
@@ -228,10 +277,14 @@ class ConfigGUI:
         self.status_label = ttk.Label(main_frame, text="Ready", foreground="black")
         self.status_label.grid(row=row_offset + 3, column=0, pady=10, sticky=tk.EW)
 
+        # Live throughput dashboard, fed by the worker's progress queue
+        self.progress_label = ttk.Label(main_frame, text="", foreground="#555555", justify=tk.LEFT)
+        self.progress_label.grid(row=row_offset + 4, column=0, sticky=tk.EW)
+
     def browse_file(self, config_key):
         """Open file/directory dialog for specific configuration fields and update account info."""
         if config_key == "EXCEL_FILE":
-            file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
+            file_path = filedialog.askopenfilename(filetypes=[("Spreadsheets", "*.xlsx *.xlsm *.csv")])
             if file_path and Path(file_path).is_file():
                 self.entries[config_key].delete(0, tk.END)
                 self.entries[config_key].insert(0, str(Path(file_path)))
@@ -266,7 +319,7 @@ class ConfigGUI:
             # Save the workbook if it exists
             if self.workbook is not None:
                 try:
-                    self.workbook.save(self.config_values["EXCEL_FILE"])
+                    self.workbook.save()
                     logging.info("Excel file saved before closing application")
                 except Exception as e:
                     logging.error(f"Failed to save Excel file before closing: {e}")
@@ -296,6 +349,8 @@ class ConfigGUI:
             excel_path = Path(excel_file)
             if not excel_path.is_file():
                 raise ValueError(f"Excel file does not exist: {excel_file}")
+            if excel_path.suffix.lower() not in SUPPORTED_INPUT_SUFFIXES:
+                raise ValueError(f"Unsupported input file type '{excel_path.suffix}': use .xlsx, .xlsm or .csv")
             if not user_data_dir:
                 raise ValueError("User data directory cannot be empty")
             if not Path(user_data_dir).is_dir():
@@ -318,7 +373,10 @@ class ConfigGUI:
             self.status_label.config(text="Running, please wait for Excel update...", foreground="red")
             self.root.protocol("WM_DELETE_WINDOW", self.prevent_close)
 
+            self.progress_queue = queue.Queue(maxsize=1000)
+            self.progress_label.config(text="")
             threading.Thread(target=self.run_automation, daemon=True).start()
+            self.root.after(PROGRESS_POLL_MS, self.poll_progress)
 
         except ValueError as e:
             logging.error(f"Validation error: {e}")
@@ -337,6 +395,22 @@ class ConfigGUI:
         finally:
             self.root.after(0, self.reset_gui)
 
+    def poll_progress(self):
+        """Drain the progress queue without blocking and show the latest snapshot."""
+        if self.progress_queue is None:
+            return
+        latest = None
+        try:
+            while True:
+                latest = self.progress_queue.get_nowait()
+        except queue.Empty:
+            pass
+        if latest is not None:
+            from progress_utils import format_progress
+            self.progress_label.config(text=format_progress(latest))
+        if self.is_running:
+            self.root.after(PROGRESS_POLL_MS, self.poll_progress)
+
     def show_result(self, result):
         """Display the result of the automation process."""
         google_form_name = self.config_values["GOOGLE_FORM_URL"].split('/')[-2] if '/' in self.config_values["GOOGLE_FORM_URL"] else "Google Form"
@@ -352,6 +426,7 @@ class ConfigGUI:
 
     def reset_gui(self):
         """Re-enable the GUI after automation completes."""
+        self.poll_progress()
         self.is_running = False
         self.workbook = None  # Clear workbook reference
         self.save_run_btn.config(state="normal")
@@ -359,10 +434,55 @@ class ConfigGUI:
         if self.status_label.cget("text").startswith("Running"):
             self.status_label.config(text="Ready", foreground="black")
 
+def run_row(watchdog, row, excel_headers, header_mapping, config, progress, preloader=None):
+    """Fill one row on the watchdog's current session, treating a driver crash as a failure."""
+    from form_utils import fill_google_form
+    from governor_utils import SignInRequired
+    try:
+        return fill_google_form(watchdog.driver, row, excel_headers, header_mapping, config, progress, preloader)
+    except SignInRequired:
+        raise
+    except Exception as e:
+        logging.error(f"Browser session failed while filling the form: {e}")
+        return False
+
 def main(config, gui):
     """Main function to orchestrate the automation process."""
-    driver = None
-    wb = None
+    from command_utils import CommandAccounting, command_scope
+    from driver_utils import initialize_driver
+    from excel_utils import InputRows, open_status
+    from form_utils import form_url_for_row, get_form_headers
+    from governor_utils import configure_governor, throttled_since, wait_out_pause
+    from history_utils import RunHistory
+    from trace_utils import start_tracing, stop_tracing
+    from index_utils import SubmissionIndex
+    from matching_utils import match_headers
+    from progress_utils import ProgressTracker
+    from watchdog_utils import BrowserWatchdog
+
+    progress = ProgressTracker(getattr(gui, "progress_queue", None))
+    configure_governor(config)
+    accounting = CommandAccounting()
+    asset_cache = None
+    if config.get("ASSET_CACHE", False):
+        from cache_utils import AssetCache
+        asset_cache = AssetCache(max_mb=config.get("ASSET_CACHE_MAX_MB", 200))
+
+    def start_session():
+        driver = accounting.instrument(initialize_driver(config))
+        if asset_cache is not None:
+            try:
+                asset_cache.start(driver)
+            except Exception as e:
+                logging.warning(f"Asset cache unavailable, loading assets from the network: {e}")
+        return driver
+
+    watchdog = BrowserWatchdog(config, start_session)
+    status = None
+    index = None
+    input_rows = None
+    form_headers = []
+    run_started_at = time.time()
     filepath = Path(config["EXCEL_FILE"])
     try:
         if not filepath:
@@ -371,34 +491,43 @@ def main(config, gui):
             raise FileNotFoundError(f"Excel file not found: {filepath}")
 
         try:
-            wb = openpyxl.load_workbook(filepath)
-            gui.workbook = wb  # Store workbook in GUI instance for access during cleanup
+            # Only the header row is read here; data rows stream in as they are processed
+            input_rows = InputRows(filepath)
+            excel_headers = input_rows.headers
+            status = open_status(filepath, excel_headers, note_position=input_rows.note_position)
+            gui.workbook = status  # Store status store in GUI instance for access during cleanup
         except Exception as e:
             logging.error(f"Failed to load Excel file: {e}")
             raise ValueError(f"Failed to load Excel file: {e}")
 
-        sheet = wb.active
-        excel_headers, rows = read_excel_data(config["EXCEL_FILE"])
-        logging.info(f"Total rows to process: {len(rows)}")
-
-        note_column = None
-        for col_idx, cell in enumerate(sheet[1], start=1):
-            if cell.value and isinstance(cell.value, str) and cell.value.lower() == "note":
-                note_column = col_idx
-                break
-        if not note_column:
-            note_column = len(excel_headers) + 1
-            sheet.cell(row=1, column=note_column).value = "Note"
-            logging.info(f"Added 'Note' column to Excel file at column {note_column}")
-            wb.save(filepath)
-
-        if not rows:
-            logging.info("No data rows to process in Excel file")
-            wb.save(filepath)
+        # Skip rows already marked in the sheet or already submitted from any workbook
+        index = SubmissionIndex(SUBMISSION_INDEX_PATH)
+        skipped = 0
+
+        def pending_rows():
+            nonlocal skipped
+            for idx, row in input_rows:
+                if status.get(idx, row) == "Inserted":
+                    logging.info(f"Row {idx} already inserted, skipping")
+                elif index.contains(config["GOOGLE_FORM_URL"], excel_headers, row):
+                    status.set(idx, "Inserted")
+                    logging.info(f"Row {idx} already submitted to this form (submission index), skipping")
+                else:
+                    yield idx, row
+                    continue
+                skipped += 1
+                progress.row_skipped()
+
+        total_rows = input_rows.count_rows()
+        logging.info(f"Total rows to process: {total_rows}")
+        pending = pending_rows()
+        upcoming = next(pending, None)
+        if upcoming is None:
+            logging.info("No pending data rows to process in Excel file")
+            status.save()
             return "Success"
 
-        terminate_chrome_processes()
-        driver = initialize_driver(config)
+        driver = watchdog.start()
         form_headers = get_form_headers(driver, config)
         # Save headers to a text file
         with open("form_headers.txt", "w", encoding="utf-8") as f:
@@ -407,60 +536,112 @@ def main(config, gui):
 
         header_mapping, unmatched_headers = match_headers(excel_headers, form_headers)
 
-        for idx, row in enumerate(rows, start=2):
-            note_cell = sheet.cell(row=idx, column=note_column).value
-            if note_cell == "Inserted":
-                logging.info(f"Row {idx} already inserted, skipping")
-                continue
+        if config.get("ENGINE") == "tabs":
+            from tab_utils import run_rows_in_tabs
+            failed = []
+
+            def on_result(idx, row, success):
+                if success:
+                    status.set(idx, "Inserted")
+                    index.add(config["GOOGLE_FORM_URL"], excel_headers, row, source=filepath.name)
+                    logging.info(f"Row {idx} processed successfully")
+                else:
+                    failed.append(idx)
+                    status.set(idx, f"Failed to insert row {idx-1}: Form submission error, check field mappings or network connection")
+                    logging.error(f"Failed to insert row {idx} - Row data: {row}")
+
+            jobs = [upcoming, *pending]
+            progress.start(len(jobs))
+            run_rows_in_tabs(driver, jobs, excel_headers, header_mapping, config, on_result, progress)
+            # on_result runs inside the tabs' event loop, so notes are written once here rather than per row;
+            # the submission index already records each submitted row as it finishes
+            status.save()
+            if failed:
+                return f"Failed to insert {len(failed)} rows: {', '.join(str(idx - 1) for idx in failed)}"
+            return "Success"
+
+        # Rows are still streaming in, so the total is the row count less the rows skipped so far
+        progress.start(total_rows - skipped)
+        tracer = start_tracing(config.get("TRACE_DIR", "traces")) if config.get("TRACE_MODE", False) else None
 
+        preloader = None
+        if config.get("PRELOAD_NEXT_FORM", False):
+            from preload_utils import FormPreloader
+            preloader = FormPreloader()
+
+        while upcoming is not None:
+            idx, row = upcoming
+            upcoming = next(pending, None)  # Read one row ahead for the preloader
             logging.info(f"Processing row {idx}: {row}")
-            success = fill_google_form(driver, row, excel_headers, header_mapping, config)
+            progress.row_started(idx)
+            if tracer is not None:
+                tracer.start_row(idx, progress)
+            if preloader is not None and upcoming is not None:
+                preloader.next_url = form_url_for_row(upcoming[1], excel_headers, header_mapping, config)[0]
+            with command_scope(row=idx):
+                row_started_at = time.time()
+                success = run_row(watchdog, row, excel_headers, header_mapping, config, progress, preloader)
+                if not success and watchdog.recover():
+                    logging.warning(f"Browser session restarted, retrying row {idx}")
+                    success = run_row(watchdog, row, excel_headers, header_mapping, config, progress, preloader)
+                elif not success and throttled_since(row_started_at):
+                    bucket = throttled_since(row_started_at)
+                    logging.warning(f"Row {idx} was throttled on '{bucket}', retrying it after the governor's pause")
+                    wait_out_pause(bucket)
+                    success = run_row(watchdog, row, excel_headers, header_mapping, config, progress, preloader)
+            progress.row_finished(idx, success)
+            if tracer is not None:
+                tracer.finish_row(success, progress)
             if success:
-                sheet.cell(row=idx, column=note_column).value = "Inserted"
+                status.set(idx, "Inserted")
+                index.add(config["GOOGLE_FORM_URL"], excel_headers, row, source=filepath.name)
                 logging.info(f"Row {idx} processed successfully")
             else:
                 error_message = f"Failed to insert row {idx-1}: Form submission error, check field mappings or network connection"
-                sheet.cell(row=idx, column=note_column).value = error_message
+                status.set(idx, error_message)
                 logging.error(f"{error_message} - Row data: {row}")
-                wb.save(filepath)
+                status.save()
                 logging.info(f"Excel file saved with error note for row {idx}")
                 return error_message
 
-            wb.save(filepath)
-            logging.info(f"Excel file saved after processing row {idx}")
+            status.checkpoint()
+            watchdog.after_row()
 
-        wb.save(filepath)
+        status.save()
         logging.info("Final Excel file save completed")
         return "Success"
 
     except Exception as e:
         error_message = f"Main process error: {e}"
         logging.error(error_message)
-        if wb is not None:
+        if status is not None:
             try:
-                sheet = wb.active
-                note_column = None
-                for col_idx, cell in enumerate(sheet[1], start=1):
-                    if cell.value and isinstance(cell.value, str) and cell.value.lower() == "note":
-                        note_column = col_idx
-                        break
-                if not note_column:
-                    note_column = sheet.max_column + 1
-                    sheet.cell(row=1, column=note_column).value = "Note"
-                sheet.cell(row=2, column=note_column).value = f"Error: {str(e)}"
-                wb.save(filepath)
+                status.set(2, f"Error: {str(e)}")
+                status.save()
                 logging.info("Excel file saved with error note due to critical error")
             except Exception as save_err:
                 logging.error(f"Failed to save Excel file: {save_err}")
         return error_message
 
     finally:
-        if driver:
+        if input_rows is not None:
+            input_rows.close()
+        if index is not None:
+            index.close()
+        stop_tracing()
+        if asset_cache is not None:
+            asset_cache.stop()
+        watchdog.stop()
+        if progress.started_at is not None:
             try:
-                driver.quit()
-                logging.info("WebDriver closed")
+                history = RunHistory(RUN_HISTORY_PATH)
+                try:
+                    history.record_run(progress, config["GOOGLE_FORM_URL"], form_headers, filepath, run_started_at)
+                finally:
+                    history.close()
             except Exception as e:
-                logging.error(f"Error closing WebDriver: {e}")
+                logging.warning(f"Failed to record run history: {e}")
+        logging.info(f"WebDriver command accounting:\n{accounting.report()}")
 
 if __name__ == "__main__":
     root = tk.Tk()
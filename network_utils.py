@@ -0,0 +1,109 @@
+import json
+import logging
+import time
+import weakref
+from collections import deque, namedtuple
+
+# Chrome performance log settings, applied to the driver options in driver_utils
+PERFORMANCE_LOGGING_PREFS = {"performance": "ALL"}
+PERF_LOGGING_PREFS = {"enableNetwork": True, "enablePage": False}
+
+NetworkResponse = namedtuple("NetworkResponse", "request_id url method status latency error")
+
+_logs = weakref.WeakKeyDictionary()
+
+class NetworkEventLog:
+    """Buffer DevTools Network events read from a driver's performance log.
+
+    get_log("performance") drains Chrome's log, so every consumer reads through this
+    buffer instead and keeps a mark (an absolute event position) to read from.
+    """
+    def __init__(self, driver, maxlen=5000):
+        self.driver = driver
+        self.events = deque(maxlen=maxlen)
+        self.position = 0
+        self.available = True
+        self.listeners = []
+
+    def poll(self):
+        """Read new Network events from the driver and return them."""
+        if not self.available:
+            return []
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            logging.warning(f"Performance log unavailable, falling back to page checks: {e}")
+            self.available = False
+            return []
+        new_events = []
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            if message.get("method", "").startswith("Network."):
+                new_events.append(message)
+        self.events.extend(new_events)
+        self.position += len(new_events)
+        for listener in self.listeners:
+            listener(new_events)
+        return new_events
+
+    def mark(self):
+        """Return the current position so later reads only see newer events."""
+        self.poll()
+        return self.position
+
+    def events_since(self, mark):
+        """Return buffered events recorded after mark."""
+        first_position = self.position - len(self.events)
+        return list(self.events)[max(mark - first_position, 0):]
+
+    def wait_for_response(self, url_fragment, since, timeout, method=None, accept=None, poll_interval=0.05):
+        """Wait for the response to a request whose URL contains url_fragment.
+
+        Returns a NetworkResponse as soon as the server replies or the request fails,
+        or None if nothing arrived within timeout. If accept is given, responses it
+        rejects (called with the DevTools response dict) are skipped.
+        """
+        requests_seen = {}
+        deadline = time.monotonic() + timeout
+        checked = since
+        while True:
+            events = self.events_since(checked)
+            checked = self.position
+            for event in events:
+                params = event.get("params", {})
+                request_id = params.get("requestId")
+                name = event["method"]
+                if name == "Network.requestWillBeSent":
+                    request = params.get("request", {})
+                    if url_fragment in request.get("url", "") and (method is None or request.get("method") == method):
+                        requests_seen.setdefault(request_id, (request.get("method"), params.get("timestamp")))
+                elif request_id in requests_seen:
+                    request_method, started = requests_seen[request_id]
+                    if name == "Network.responseReceived":
+                        response = params.get("response", {})
+                        if accept is not None and not accept(response):
+                            continue
+                        return NetworkResponse(
+                            request_id, response.get("url", ""), request_method, response.get("status"),
+                            params.get("timestamp", started) - started, None
+                        )
+                    if name == "Network.loadingFailed":
+                        return NetworkResponse(
+                            request_id, "", request_method, None,
+                            params.get("timestamp", started) - started, params.get("errorText")
+                        )
+            if not self.available or time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+            self.poll()
+
+def network_log(driver):
+    """Return the shared NetworkEventLog for a driver."""
+    log = _logs.get(driver)
+    if log is None:
+        log = NetworkEventLog(driver)
+        _logs[driver] = log
+    return log
@@ -0,0 +1,73 @@
+import logging
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+PRELOAD_READY_TIMEOUT = 15
+
+class FormPreloader:
+    """Double-buffer form loads: a background tab loads row k+1's form while row k is filled.
+
+    The caller sets next_url before each row; fill_google_form activates the tab
+    preloaded for its URL and, once its own form is up, starts loading next_url.
+    """
+    def __init__(self):
+        self.driver = None
+        self.handle = None
+        self.url = None
+        self.next_url = None
+
+    def _reset(self, driver):
+        """Forget tabs that belonged to an earlier (recycled) session."""
+        if self.driver is not driver:
+            self.driver = driver
+            self.handle = None
+            self.url = None
+
+    def _close(self, driver, handle):
+        """Close a tab without switching to it, so its beforeunload prompt cannot block."""
+        try:
+            driver.execute_cdp_cmd("Target.closeTarget", {"targetId": handle})
+        except WebDriverException as e:
+            logging.warning(f"Failed to close tab {handle}: {e}")
+
+    def activate(self, driver, url):
+        """Switch to the tab preloaded for url; return False when the caller must load it itself."""
+        self._reset(driver)
+        handle, self.handle = self.handle, None
+        if handle is None:
+            return False
+        if url != self.url:
+            logging.info("Preloaded form is for another row, discarding it")
+            self._close(driver, handle)
+            return False
+        previous = driver.current_window_handle
+        try:
+            driver.switch_to.window(handle)
+            WebDriverWait(driver, PRELOAD_READY_TIMEOUT).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
+        except WebDriverException as e:
+            logging.warning(f"Preloaded tab unusable, loading the form directly: {e}")
+            driver.switch_to.window(previous)
+            return False
+        self._close(driver, previous)
+        logging.info("Switched to preloaded form tab")
+        return True
+
+    def preload_next(self, driver):
+        """Start loading next_url in a background tab and return to the current one."""
+        self._reset(driver)
+        url, self.next_url = self.next_url, None
+        if url is None:
+            return
+        current = driver.current_window_handle
+        try:
+            driver.switch_to.new_window("tab")
+            self.handle = driver.current_window_handle
+            self.url = url
+            # Assigning location returns at once, unlike driver.get which waits for the load
+            driver.execute_script("window.location.href = arguments[0];", url)
+        except WebDriverException as e:
+            logging.warning(f"Failed to preload next form: {e}")
+        finally:
+            driver.switch_to.window(current)
@@ -0,0 +1,129 @@
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+PROGRESS_QUEUE_SIZE = 1000
+
+class ProgressTracker:
+    """Collect per-row stage timings and publish progress snapshots to a thread-safe queue."""
+    def __init__(self, events=None, total_rows=0):
+        self.events = events if events is not None else queue.Queue(maxsize=PROGRESS_QUEUE_SIZE)
+        self.total_rows = total_rows
+        self.rows_done = 0
+        self.rows_failed = 0
+        self.current_row = None
+        self.current_stage = None
+        self.stage_totals = defaultdict(float)
+        self.stage_samples = defaultdict(list)
+        self.row_starts = {}
+        self.started_at = None
+        self._lock = threading.Lock()
+
+    def start(self, total_rows):
+        """Reset counters for a run over total_rows pending rows."""
+        with self._lock:
+            self.total_rows = total_rows
+            self.rows_done = 0
+            self.rows_failed = 0
+            self.started_at = time.monotonic()
+        self.publish()
+
+    def row_skipped(self):
+        """Drop a row found already submitted from the run's total."""
+        with self._lock:
+            self.total_rows = max(self.total_rows - 1, 0)
+
+    def row_started(self, row_idx):
+        """Mark row_idx as the row currently being processed."""
+        with self._lock:
+            self.current_row = row_idx
+            self.current_stage = None
+            self.row_starts[row_idx] = time.perf_counter()
+        self.publish()
+
+    def row_finished(self, row_idx, success):
+        """Count row_idx as done or failed and record its duration as a 'row' sample."""
+        with self._lock:
+            start = self.row_starts.pop(row_idx, None)
+            if start is not None:
+                seconds = time.perf_counter() - start
+                self.stage_totals["row"] += seconds
+                self.stage_samples["row"].append(seconds)
+            if success:
+                self.rows_done += 1
+            else:
+                self.rows_failed += 1
+            self.current_stage = None
+        self.publish()
+
+    def add_timing(self, name, seconds):
+        """Record a duration for a named stage without a context manager."""
+        with self._lock:
+            self.stage_totals[name] += seconds
+            self.stage_samples[name].append(seconds)
+
+    def samples(self):
+        """Return a copy of every stage's recorded durations."""
+        with self._lock:
+            return {name: list(values) for name, values in self.stage_samples.items()}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the wrapped block as one sample of the named stage."""
+        with self._lock:
+            previous_stage = self.current_stage
+            self.current_stage = name
+        self.publish()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.perf_counter() - start)
+            with self._lock:
+                self.current_stage = previous_stage
+
+    def snapshot(self):
+        """Return the current progress as a plain dict."""
+        with self._lock:
+            processed = self.rows_done + self.rows_failed
+            elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+            rows_per_min = processed / elapsed * 60 if elapsed > 0 and processed else 0.0
+            remaining = max(self.total_rows - processed, 0)
+            eta_seconds = remaining / rows_per_min * 60 if rows_per_min else None
+            return {
+                "total_rows": self.total_rows,
+                "rows_done": self.rows_done,
+                "rows_failed": self.rows_failed,
+                "current_row": self.current_row,
+                "current_stage": self.current_stage,
+                "rows_per_min": rows_per_min,
+                "eta_seconds": eta_seconds,
+                "stage_totals": dict(self.stage_totals),
+            }
+
+    def publish(self):
+        """Put a snapshot on the event queue without ever blocking the worker."""
+        try:
+            self.events.put_nowait(self.snapshot())
+        except queue.Full:
+            logging.debug("Progress queue full, dropping event")
+
+def format_progress(snapshot):
+    """Format a progress snapshot as dashboard text for the GUI."""
+    eta = snapshot["eta_seconds"]
+    eta_text = f"{int(eta // 60)}m {int(eta % 60):02d}s" if eta is not None else "--"
+    stage = snapshot["current_stage"] or "-"
+    row = snapshot["current_row"] if snapshot["current_row"] is not None else "-"
+    totals = snapshot["stage_totals"]
+    split = " | ".join(
+        f"{name}: {totals.get(name, 0.0):.0f}s" for name in ("download", "upload", "fill", "submit")
+    )
+    return (
+        f"Rows: {snapshot['rows_done']} done, {snapshot['rows_failed']} failed of {snapshot['total_rows']}"
+        f"    Row {row} ({stage})\n"
+        f"Speed: {snapshot['rows_per_min']:.1f} rows/min    ETA: {eta_text}\n"
+        f"{split}"
+    )
@@ -0,0 +1,62 @@
+import logging
+import random
+import time
+
+class RetryBudgetExceeded(Exception):
+    """Raised when a step cannot be retried because the time budget is spent."""
+
+class StepRetryPolicy:
+    """Retry single steps with jittered exponential backoff inside a shared time budget."""
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=8.0, budget_seconds=120):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_seconds = budget_seconds
+        # The clock starts with the first step run, so work before it never spends the budget
+        self.deadline = None
+        self.attempt = 0
+
+    def remaining(self):
+        """Return the seconds left in the budget."""
+        if self.deadline is None:
+            return float(self.budget_seconds)
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def timeout(self, limit):
+        """Return how long the current attempt may wait: limit, clipped to the time left in the budget."""
+        return min(limit, self.remaining())
+
+    def backoff(self, attempt):
+        """Return the jittered delay before the given retry attempt (1-based)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    def run(self, name, step, before_retry=None, fatal=()):
+        """Run step, retrying only it on failure; before_retry may return a result to stop early.
+
+        Exceptions listed in fatal are raised at once without retrying.
+        """
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.budget_seconds
+        for attempt in range(1, self.max_attempts + 1):
+            if self.remaining() <= 0:
+                raise RetryBudgetExceeded(f"No time left to run step '{name}'")
+            self.attempt = attempt
+            try:
+                return step()
+            except fatal:
+                raise
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logging.error(f"Step '{name}' failed after {attempt} attempts: {e}")
+                    raise
+                delay = min(self.backoff(attempt), self.remaining())
+                logging.warning(f"Step '{name}' failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                if self.remaining() <= 0:
+                    raise RetryBudgetExceeded(f"No time left to retry step '{name}'") from e
+                if before_retry is not None:
+                    result = before_retry()
+                    if result is not None:
+                        logging.info(f"Step '{name}' no longer needed after check, continuing")
+                        return result
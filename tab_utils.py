@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from cdp_utils import CdpConnection, CdpTab, debugger_address
+from form_utils import (
+    CHECKBOX_SCRIPT, DATE_SCRIPT, DROPDOWN_SCRIPT, FIELD_TYPES, FORM_ANSWERS_SCRIPT, PAGE_HELPERS, SUBMIT_TIMEOUT,
+    TEXT_SCRIPT, UPLOAD_TIMEOUT, find_picker_file_input, form_url_for_row, is_file_field, normalize_text,
+    date_parts, page_function, prefilled_answer_ok
+)
+from governor_utils import SignInRequired, acquire_slot, report_reply
+from image_utils import download_google_drive_image
+from progress_utils import ProgressTracker
+
+TAB_CONCURRENCY = 4
+FORM_LOAD_TIMEOUT = 30
+
+EMAIL_SCRIPT = """
+return () => {
+    const box = document.evaluate('//div[.//span[text()="Email"]]/following::div[@role="checkbox"][1]',
+        document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (box && box.getAttribute("aria-checked") !== "true") box.click();
+    return !!box;
+};
+"""
+
+ADD_FILE_SCRIPT = PAGE_HELPERS + """
+return async header => {
+    const item = findItem(header);
+    const button = item && [...item.querySelectorAll("div[role=button]")].find(
+        b => b.getAttribute("aria-label") === "Add File" || b.textContent.includes("Add File"));
+    if (!button) return false;
+    button.click();
+    for (let i = 0; i < 50; i++) {
+        if (document.querySelector("div.picker-dialog iframe[src*='docs.google.com/picker']")) return true;
+        await sleep(100);
+    }
+    return false;
+};
+"""
+
+FILE_LISTED_SCRIPT = PAGE_HELPERS + """
+return async (header, fileName, timeoutMs) => {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+        const item = findItem(header);
+        if (item && [...item.querySelectorAll("div[role=listitem] div")].some(d => d.textContent.includes(fileName)))
+            return true;
+        await sleep(250);
+    }
+    return false;
+};
+"""
+
+SUBMIT_SCRIPT = """
+return () => {
+    const span = [...document.querySelectorAll("div[role=button] span")].find(s => s.textContent === "Submit");
+    const button = span && span.closest("div[role=button]");
+    if (!button || button.getAttribute("aria-disabled") === "true") return false;
+    button.click();
+    return true;
+};
+"""
+
+async def handle_text_field_async(tab, form_header, value, form_header_cleaned):
+    """Set a text or textarea answer from page script."""
+    return await tab.call(page_function(TEXT_SCRIPT), form_header_cleaned[:50], str(value))
+
+async def handle_date_field_async(tab, form_header, value, form_header_cleaned):
+    """Set a date answer, in either the native or the split month/day/year input."""
+    parts = date_parts(value)
+    if not parts:
+        logging.warning(f"Invalid date value for '{form_header}': {value}")
+        return False
+    year, month, day = parts
+    return await tab.call(page_function(DATE_SCRIPT), form_header_cleaned[:50], month, day, year)
+
+async def handle_checkbox_field_async(tab, form_header, value, form_header_cleaned):
+    """Tick each comma-separated checkbox value."""
+    values = [v.strip() for v in str(value).split(",") if v.strip()]
+    return await tab.call(page_function(CHECKBOX_SCRIPT), form_header_cleaned[:50], values)
+
+async def handle_dropdown_field_async(tab, form_header, value, form_header_cleaned):
+    """Open a dropdown and pick the matching option."""
+    return await tab.call(page_function(DROPDOWN_SCRIPT), form_header_cleaned[:50], str(value))
+
+# Async counterparts of the handlers named in form_utils.FIELD_TYPES
+ASYNC_HANDLERS = {
+    "handle_text_field": handle_text_field_async,
+    "handle_date_field": handle_date_field_async,
+    "handle_checkbox_field": handle_checkbox_field_async,
+    "handle_dropdown_field": handle_dropdown_field_async,
+}
+
+async def fill_form_field_async(tab, form_header, value, form_header_cleaned):
+    """Fill a single field with the async handler for its FIELD_TYPES entry."""
+    if "Number of cable * Core" in form_header_cleaned:
+        return await handle_text_field_async(tab, form_header, value, form_header_cleaned.split()[0])
+    for field_type, config in FIELD_TYPES.items():
+        if any(keyword in form_header_cleaned for keyword in config["keywords"]):
+            return await ASYNC_HANDLERS[config["handler"]](tab, form_header, value, form_header_cleaned)
+    logging.warning(f"Unknown field type for header: {form_header}")
+    return False
+
+class _CookieSource:
+    """Expose cookies fetched over DevTools through the driver.get_cookies() interface."""
+    def __init__(self, cookies):
+        self.cookies = cookies
+
+    def get_cookies(self):
+        return self.cookies
+
+async def upload_file_async(tab, form_header, form_header_cleaned, temp_file_path):
+    """Open the picker, inject the file into its input and wait until the form lists it."""
+    if not await tab.call(page_function(ADD_FILE_SCRIPT), form_header_cleaned[:50]):
+        logging.error(f"Could not open file picker for '{form_header}'")
+        return False
+    document = await tab.send("DOM.getDocument", {"depth": -1, "pierce": True})
+    backend_node_id = find_picker_file_input(document["root"])
+    if not backend_node_id:
+        logging.error(f"Picker file input not reachable for '{form_header}'")
+        return False
+    await tab.send("DOM.setFileInputFiles", {
+        "files": [os.path.abspath(temp_file_path)], "backendNodeId": backend_node_id
+    })
+    file_name = os.path.basename(temp_file_path)
+    return await tab.call(
+        page_function(FILE_LISTED_SCRIPT), form_header_cleaned[:50], file_name, UPLOAD_TIMEOUT * 1000,
+        timeout=UPLOAD_TIMEOUT + 5
+    )
+
+async def submit_async(tab):
+    """Click Submit, paced by the shared rate governor, and wait for the formResponse reply."""
+    await asyncio.get_running_loop().run_in_executor(None, acquire_slot, "submit")
+    response = tab.expect_event(
+        "Network.responseReceived", lambda params: "formResponse" in params.get("response", {}).get("url", "")
+    )
+    try:
+        if not await tab.call(page_function(SUBMIT_SCRIPT)):
+            logging.error("Submit button missing or disabled, likely due to unfilled required fields")
+            return False
+        params = await asyncio.wait_for(response, SUBMIT_TIMEOUT)
+    finally:
+        response.cancel()
+    status = params["response"].get("status", 0)
+    reason = report_reply("submit", status, params["response"].get("url", ""))
+    if reason:
+        logging.error(f"Form submission throttled by Google ({reason})")
+        return False
+    if not 200 <= status < 300:
+        logging.error(f"Form submission rejected with status {status}")
+        return False
+    return True
+
+async def fill_google_form_async(tab, row, headers, header_mapping, config, cookies, progress=None):
+    """Fill and submit a Google Form for one row in one tab, like form_utils.fill_google_form."""
+    progress = progress or ProgressTracker()
+    loop = asyncio.get_running_loop()
+    temp_dir = Path("images")
+    temp_dir.mkdir(exist_ok=True)
+    temp_files = []
+    try:
+        form_url, prefilled = form_url_for_row(row, headers, header_mapping, config)
+        start = time.perf_counter()
+        await tab.navigate(form_url, FORM_LOAD_TIMEOUT)
+        progress.add_timing("load", time.perf_counter() - start)
+        await tab.call(page_function(EMAIL_SCRIPT))
+        form_answers = {}
+        if prefilled:
+            answers = await tab.call(f"() => {{ {FORM_ANSWERS_SCRIPT} }}")
+            form_answers = {normalize_text(title): values for title, values in (answers or {}).items()}
+
+        for excel_header, value in zip(headers, row):
+            if excel_header not in header_mapping:
+                continue
+            form_header = header_mapping[excel_header]
+            form_header_cleaned = normalize_text(form_header)
+            if is_file_field(form_header):
+                if not (isinstance(value, str) and "drive.google.com" in value):
+                    logging.warning(f"Invalid Google Drive URL for image field '{form_header}': {value}")
+                    return False
+                start = time.perf_counter()
+                temp_file_path = await loop.run_in_executor(
+                    None, download_google_drive_image, value, _CookieSource(cookies), str(temp_dir)
+                )
+                progress.add_timing("download", time.perf_counter() - start)
+                if not temp_file_path:
+                    return False
+                temp_files.append(temp_file_path)
+                start = time.perf_counter()
+                uploaded = await upload_file_async(tab, form_header, form_header_cleaned, temp_file_path)
+                progress.add_timing("upload", time.perf_counter() - start)
+                if not uploaded:
+                    return False
+                continue
+            if form_header in prefilled and prefilled_answer_ok(
+                    form_answers, form_header_cleaned, prefilled[form_header]):
+                continue
+            start = time.perf_counter()
+            filled = await fill_form_field_async(tab, form_header, value, form_header_cleaned)
+            progress.add_timing("fill", time.perf_counter() - start)
+            if not filled:
+                logging.warning(f"Failed to fill field '{form_header}' with value '{value}'")
+                return False
+
+        start = time.perf_counter()
+        submitted = await submit_async(tab)
+        progress.add_timing("submit", time.perf_counter() - start)
+        return submitted
+    except SignInRequired:
+        raise
+    except Exception as e:
+        logging.error(f"Error while filling the form in tab {tab.target_id}: {e}")
+        return False
+    finally:
+        for f in temp_files:
+            try:
+                os.remove(f)
+            except OSError as e:
+                logging.warning(f"Failed to delete temp file: {f} - {e}")
+
+async def _run_rows(address, jobs, headers, header_mapping, config, on_result, progress, concurrency):
+    """Fill every (row_idx, row) job across a pool of tabs in one browser."""
+    connection = await CdpConnection.connect(address)
+    tabs = asyncio.Queue()
+    opened = []
+    try:
+        cookies = (await connection.send("Storage.getCookies")).get("cookies", [])
+        for _ in range(min(concurrency, len(jobs))):
+            tab = await CdpTab.open(connection)
+            opened.append(tab)
+            # Only one tab has real focus; emulated focus keeps the others' timers and focus events running
+            await tab.send("Emulation.setFocusEmulationEnabled", {"enabled": True})
+            tabs.put_nowait(tab)
+
+        async def run_job(row_idx, row):
+            tab = await tabs.get()
+            try:
+                progress.row_started(row_idx)
+                success = await fill_google_form_async(
+                    tab, row, headers, header_mapping, config, cookies, progress
+                )
+            finally:
+                tabs.put_nowait(tab)
+            progress.row_finished(row_idx, success)
+            on_result(row_idx, row, success)
+
+        await asyncio.gather(*(run_job(row_idx, row) for row_idx, row in jobs))
+    finally:
+        for tab in opened:
+            await tab.close()
+        await connection.close()
+
+def run_rows_in_tabs(driver, jobs, headers, header_mapping, config, on_result, progress=None):
+    """Drive many form tabs in the Selenium-launched browser over an async DevTools connection.
+
+    on_result(row_idx, row, success) is called as each row finishes; at most
+    TAB_CONCURRENCY (or config["TAB_CONCURRENCY"]) tabs run at once.
+
+    Known limitations compared with form_utils.fill_google_form: there is no verify and
+    repair pass and no per-step upload retries or upload budget, and a rejected upload
+    is only seen as the file never being listed. Any field that fails fails the whole
+    row, which is then left unsubmitted.
+    """
+    concurrency = max(int(config.get("TAB_CONCURRENCY", TAB_CONCURRENCY)), 1)
+    logging.info(f"Filling {len(jobs)} rows in up to {concurrency} tabs")
+    asyncio.run(_run_rows(
+        debugger_address(driver), jobs, headers, header_mapping, config, on_result,
+        progress or ProgressTracker(), concurrency
+    ))
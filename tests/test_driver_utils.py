@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+import pytest
+import driver_utils
+from driver_utils import prepare_session_profile, refresh_session_snapshot, terminate_profile_processes
+
+def make_profile(tmp_path):
+    user_data = tmp_path / "User Data"
+    (user_data / "Profile 1" / "Network").mkdir(parents=True)
+    (user_data / "Local State").write_text("{}")
+    (user_data / "Profile 1" / "Network" / "Cookies").write_bytes(b"cookies")
+    (user_data / "Profile 1" / "Preferences").write_text("{}")
+    return {"USER_DATA_DIR": str(user_data), "PROFILE_DIR": "Profile 1"}
+
+def test_concurrent_sessions_share_one_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(driver_utils, "SNAPSHOT_ROOT", tmp_path / "snapshots")
+    config = make_profile(tmp_path)
+    sessions, errors = [], []
+
+    def launch(force):
+        try:
+            if force:
+                refresh_session_snapshot(config, force=True)
+            sessions.append(prepare_session_profile(config))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=launch, args=(i % 2 == 0,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    for session_dir in sessions:
+        assert (session_dir / "Default" / "Network" / "Cookies").read_bytes() == b"cookies"
+        assert (session_dir / "Local State").is_file()
+    # Only the snapshot itself is left behind: no staging directories or lock file
+    assert [path.name for path in (tmp_path / "snapshots").iterdir()] == ["Profile_1"]
+
+class FakeProcess:
+    def __init__(self, pid, name, cmdline):
+        self.pid = pid
+        self.info = {"pid": pid, "name": name, "cmdline": cmdline}
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+def test_only_the_profiles_browser_is_terminated(tmp_path, monkeypatch):
+    profile = str(tmp_path / "User Data")
+    processes = [
+        FakeProcess(1, "chrome.exe", ["chrome.exe", f"--user-data-dir={profile}"]),
+        FakeProcess(2, "chrome.exe", ["chrome.exe", f"--user-data-dir={tmp_path / 'trc_session_x'}"]),
+        FakeProcess(3, "python.exe", ["python.exe", f"--user-data-dir={profile}"]),
+    ]
+    monkeypatch.setattr(driver_utils.psutil, "process_iter", lambda attrs: processes)
+    terminate_profile_processes(profile)
+    assert [proc.killed for proc in processes] == [True, False, False]
+
+def write_cookies(path, sid):
+    import sqlite3
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE cookies (host_key TEXT, name TEXT, value TEXT, encrypted_value BLOB)")
+    conn.executemany("INSERT INTO cookies VALUES (?, ?, '', ?)", [
+        (".google.com", "SID", sid.encode()),
+        (".google.com", "__Secure-1PSIDTS", str(time.time()).encode()),
+    ])
+    conn.commit()
+    conn.close()
+
+def test_snapshot_kept_until_sign_in_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(driver_utils, "SNAPSHOT_ROOT", tmp_path / "snapshots")
+    config = make_profile(tmp_path)
+    cookies = tmp_path / "User Data" / "Profile 1" / "Network" / "Cookies"
+    write_cookies(cookies, "first")
+    snapshot = refresh_session_snapshot(config)
+    created = (snapshot / "snapshot.json").read_text()
+
+    # Chrome rewriting its cookie store, e.g. rotating short-lived cookies, keeps the snapshot
+    write_cookies(cookies, "first")
+    os.utime(cookies, (time.time() + 60, time.time() + 60))
+    assert (refresh_session_snapshot(config) / "snapshot.json").read_text() == created
+
+    write_cookies(cookies, "second")
+    assert (refresh_session_snapshot(config) / "snapshot.json").read_text() != created
+
+def test_held_lock_is_kept_fresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(driver_utils, "SNAPSHOT_LOCK_STALE_SECONDS", 0.4)
+    monkeypatch.setattr(driver_utils, "SNAPSHOT_LOCK_TIMEOUT", 1)
+    snapshot_dir = tmp_path / "snapshots" / "Profile_1"
+    with driver_utils._snapshot_lock(snapshot_dir):
+        time.sleep(0.6)  # Longer than the stale age; the holder keeps touching the lock
+        with pytest.raises(TimeoutError):
+            with driver_utils._snapshot_lock(snapshot_dir):
+                pass
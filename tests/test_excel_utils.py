@@ -0,0 +1,122 @@
+import openpyxl
+import excel_utils
+from excel_utils import InputRows, open_status, read_input_data, read_notes
+
+def make_workbook(path, with_note):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Name", "Age"] + (["Note"] if with_note else []))
+    ws.append(["a", 1] + (["Inserted"] if with_note else []))
+    ws.append(["b", 2])
+    wb.save(path)
+
+def test_notes_read_without_loading_workbook_again(tmp_path, monkeypatch):
+    path = tmp_path / "rows.xlsx"
+    make_workbook(path, with_note=True)
+    headers, rows = read_input_data(path)
+    loads = []
+    real_load = excel_utils.openpyxl.load_workbook
+
+    def load_workbook(*args, **kwargs):
+        # Count writable loads only; reading the header row streams the file read-only
+        if not kwargs.get("read_only"):
+            loads.append(1)
+        return real_load(*args, **kwargs)
+
+    monkeypatch.setattr(excel_utils.openpyxl, "load_workbook", load_workbook)
+
+    status = open_status(path, headers, rows)
+    assert status.get(2) == "Inserted"
+    assert status.get(3) is None
+    status.save()
+    assert loads == []
+
+    status.set(3, "Inserted")
+    status.save()
+    status.set(3, "Inserted")
+    status.save()
+    assert len(loads) == 1
+    assert openpyxl.load_workbook(path).active.cell(row=3, column=3).value == "Inserted"
+
+def test_note_column_added_on_first_write(tmp_path):
+    path = tmp_path / "rows.xlsx"
+    make_workbook(path, with_note=False)
+    headers, rows = read_input_data(path)
+    status = open_status(path, headers, rows)
+    assert status.get(2) is None
+    status.set(2, "Inserted")
+    status.save()
+    sheet = openpyxl.load_workbook(path).active
+    assert sheet.cell(row=1, column=3).value == "Note"
+    assert sheet.cell(row=2, column=3).value == "Inserted"
+
+def test_read_notes_leaves_workbook_untouched(tmp_path):
+    path = tmp_path / "rows.xlsx"
+    make_workbook(path, with_note=False)
+    before = path.read_bytes()
+    headers, rows = read_input_data(path)
+    assert read_notes(path, headers, rows) == [None, None]
+    assert path.read_bytes() == before
+
+def test_read_rows_from_starts_at_row(tmp_path):
+    from excel_utils import read_rows_from
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_text("Name,Age\na,1\nb,2\nc,3\n", encoding="utf-8")
+    assert read_rows_from(csv_path, 3) == (["Name", "Age"], [(3, ["b", "2"]), (4, ["c", "3"])])
+
+    xlsx_path = tmp_path / "rows.xlsx"
+    make_workbook(xlsx_path, with_note=True)
+    headers, rows = read_rows_from(xlsx_path, 3)
+    assert headers == ["Name", "Age", "Note"]
+    assert rows == [(3, ["b", 2, ""])]
+
+def test_note_column_found_past_blank_header_cells(tmp_path):
+    path = tmp_path / "rows.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Name", None, "Age", "Note"])
+    ws.append(["a", "x", 1, "Inserted"])
+    ws.append(["b", "y", 2, None])
+    wb.save(path)
+
+    headers, rows = read_input_data(path)
+    assert headers == ["Name", "Age", "Note"]
+    assert read_notes(path, headers, rows) == ["Inserted", None]
+    status = open_status(path, headers, rows)
+    status.set(3, "Inserted")
+    status.save()
+    sheet = openpyxl.load_workbook(path).active
+    assert [cell.value for cell in sheet[3]] == ["b", "y", 2, "Inserted"]
+
+def test_rows_stream_while_notes_are_saved(tmp_path, monkeypatch):
+    path = tmp_path / "rows.xlsx"
+    wb = openpyxl.Workbook()
+    wb.active.append(["Name", "Note"])
+    for i in range(50):
+        wb.active.append([f"row {i}"])
+    wb.save(path)
+
+    with InputRows(path) as input_rows:
+        assert input_rows.count_rows() == 50
+        status = open_status(path, input_rows.headers, note_position=input_rows.note_position)
+        seen = []
+        for idx, row in input_rows:
+            assert status.get(idx, row) is None
+            seen.append(row[0])
+            status.set(idx, "Inserted")
+            status.checkpoint()
+            if idx == 10:
+                # A due checkpoint rewrites the file while the rest is still being read
+                monkeypatch.setattr(excel_utils, "STATUS_CHECKPOINT_SECONDS", 0)
+        status.save()
+    assert seen == [f"row {i}" for i in range(50)]
+    headers, rows = read_input_data(path)
+    assert read_notes(path, headers, rows) == ["Inserted"] * 50
+
+def test_csv_rows_are_read_lazily(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("Name,Age\na,1\nb,2\nc,3", encoding="utf-8")
+    with InputRows(path) as input_rows:
+        assert input_rows.headers == ["Name", "Age"]
+        assert input_rows.count_rows() == 3
+        assert next(iter(input_rows)) == (2, ["a", "1"])
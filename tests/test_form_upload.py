@@ -0,0 +1,65 @@
+import time
+import pytest
+import form_utils
+from form_utils import upload_file
+from retry_utils import RetryBudgetExceeded, StepRetryPolicy
+from selenium.common.exceptions import TimeoutException
+
+class FakeDriver:
+    class switch_to:
+        @staticmethod
+        def default_content():
+            pass
+
+class SilentLog:
+    """Network log that sees no upload response, as when the upload request stalls."""
+    available = True
+
+    def __init__(self):
+        self.marks = 0
+
+    def mark(self):
+        self.marks += 1
+        return self.marks
+
+    def wait_for_response(self, url_fragment, since, timeout, **kwargs):
+        return None
+
+@pytest.fixture
+def upload(monkeypatch):
+    state = {"sent": 0, "waits": [], "listed_after": 2, "log": SilentLog(), "spends_budget": None}
+
+    def send_file(driver, form_header, form_header_cleaned, temp_file_path):
+        state["sent"] += 1
+        return True
+
+    def wait_for_listed_file(driver, form_header_cleaned, file_name, timeout):
+        state["waits"].append(timeout)
+        if state["spends_budget"] is not None:
+            state["spends_budget"].deadline = time.monotonic() - 1  # The wait used up the row's budget
+        if state["sent"] >= state["listed_after"]:
+            return True
+        raise TimeoutException("file not listed")
+
+    monkeypatch.setattr(form_utils, "_send_file", send_file)
+    monkeypatch.setattr(form_utils, "_wait_for_listed_file", wait_for_listed_file)
+    monkeypatch.setattr(form_utils, "_file_is_listed", lambda driver, header, name: False)
+    monkeypatch.setattr(form_utils, "network_log", lambda driver: state["log"])
+    monkeypatch.setattr(form_utils.time, "sleep", lambda seconds: None)
+    return state
+
+def test_stalled_upload_is_sent_again(upload):
+    policy = StepRetryPolicy(budget_seconds=120)
+    assert upload_file(FakeDriver(), "Photo", "Photo", "images/photo.png", policy)
+    assert upload["sent"] == 2
+    # Without an upload response only the short file-list check runs, never a second full wait
+    assert all(timeout <= form_utils.LISTED_FILE_TIMEOUT for timeout in upload["waits"])
+    assert upload["log"].marks == 2
+
+def test_upload_retries_stop_at_the_budget(upload):
+    upload["listed_after"] = 99
+    policy = upload["spends_budget"] = StepRetryPolicy(max_attempts=5, budget_seconds=120)
+    with pytest.raises(RetryBudgetExceeded):
+        upload_file(FakeDriver(), "Photo", "Photo", "images/photo.png", policy)
+    assert upload["sent"] == 1
+    assert upload["waits"] == [form_utils.LISTED_FILE_TIMEOUT]
@@ -0,0 +1,91 @@
+import governor_utils
+import json
+from governor_utils import BUCKET_DEFAULTS, RateGovernor, configure_governor, run_cli
+
+def submit_bucket(**overrides):
+    return {"submit": dict(BUCKET_DEFAULTS["submit"], **overrides)}
+
+def test_success_adds_and_throttle_halves(tmp_path):
+    governor = RateGovernor(tmp_path / "governor.db", submit_bucket(rate=10.0, max_rate=12.0))
+    for _ in range(5):
+        governor.report_success("submit")
+    assert governor.rates()["submit"][0] == 12.0
+
+    governor.report_throttle("submit", "rate_limited")
+    rate, paused = governor.rates()["submit"]
+    assert rate == 6.0
+    assert paused > 0
+    # Replies from calls already in flight do not cut the rate again
+    governor.report_throttle("submit", "rate_limited")
+    assert governor.rates()["submit"][0] == 6.0
+
+def test_acquire_spends_burst_then_waits(tmp_path):
+    governor = RateGovernor(tmp_path / "governor.db", submit_bucket(rate=60.0, burst=2))
+    assert governor._take("submit") == 0
+    assert governor._take("submit") == 0
+    assert 0 < governor._take("submit") <= 1.0
+
+def test_configured_rate_replaces_learned_rate(tmp_path):
+    path = tmp_path / "governor.db"
+    governor = configure_governor({"GOVERNOR_DB": str(path)})
+    governor.report_throttle("submit", "captcha")
+    assert governor.rates()["submit"][0] == 15.0
+    # Same settings on the next start keep the learned rate
+    assert configure_governor({"GOVERNOR_DB": str(path)}).rates()["submit"][0] == 15.0
+
+    governor = configure_governor({"GOVERNOR_DB": str(path), "SUBMIT_RATE_PER_MIN": 10})
+    assert governor.rates()["submit"] == (10.0, 0)
+    for _ in range(3):
+        governor.report_success("submit")
+    assert governor.rates()["submit"][0] == 10.0
+
+def test_stored_rate_is_clamped_to_ceiling(tmp_path):
+    path = tmp_path / "governor.db"
+    governor = RateGovernor(path, submit_bucket(rate=10.0, max_rate=50.0))
+    with governor._connect() as conn:
+        conn.execute("UPDATE buckets SET rate = 80 WHERE name = 'submit'")
+    assert RateGovernor(path, submit_bucket(rate=10.0, max_rate=50.0)).rates()["submit"][0] == 50.0
+
+def test_cli_status_keeps_configured_state(tmp_path, capsys):
+    path = tmp_path / "governor.db"
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"GOVERNOR_DB": str(path), "SUBMIT_RATE_PER_MIN": 10}))
+    configure_governor(json.loads(config_path.read_text())).report_throttle("submit", "captcha")
+
+    run_cli(["--db", str(path), "status"])
+    assert "submit" in capsys.readouterr().out
+    rate, paused = configure_governor({"GOVERNOR_DB": str(path), "SUBMIT_RATE_PER_MIN": 10}).rates()["submit"]
+    assert rate == 5.0 and paused > 0
+
+    run_cli(["--config", str(config_path), "reset"])
+    with governor_utils._governor._connect() as conn:
+        assert conn.execute(
+            "SELECT rate, configured, max_rate, paused_until FROM buckets WHERE name = 'submit'"
+        ).fetchone() == (10.0, 10.0, 10.0, 0)
+
+def teardown_function():
+    governor_utils._governor = None
+
+def test_sign_in_redirect_is_not_throttling(tmp_path):
+    import pytest
+    from governor_utils import SignInRequired, classify_throttle, report_reply
+    url = "https://accounts.google.com/v3/signin/identifier?continue=https://docs.google.com/forms"
+    assert classify_throttle(302, url) is None
+    governor_utils._governor = RateGovernor(tmp_path / "governor.db", submit_bucket())
+    with pytest.raises(SignInRequired):
+        report_reply("submit", url=url)
+    assert governor_utils._governor.rates()["submit"] == (30.0, 0)
+    assert report_reply("submit", 429, "https://docs.google.com/forms/formResponse") == "rate_limited"
+
+def test_pause_is_waited_on_the_throttled_bucket(tmp_path, monkeypatch):
+    from governor_utils import throttled_since, wait_out_pause
+    started = governor_utils.time.time()
+    governor = configure_governor({"GOVERNOR_DB": str(tmp_path / "governor.db")})
+    assert throttled_since(started) is None
+    governor.report_throttle("download", "rate_limited")
+    assert throttled_since(started) == "download"
+
+    slept = []
+    monkeypatch.setattr(governor_utils.time, "sleep", slept.append)
+    wait_out_pause(throttled_since(started))
+    assert len(slept) == 1 and 0 < slept[0] <= governor_utils.THROTTLE_COOLDOWN_SECONDS
@@ -0,0 +1,82 @@
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+import image_utils
+from image_utils import DownloadError, is_image_data, stream_to_file
+
+BODY = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 2000
+
+class DriveStandIn(BaseHTTPRequestHandler):
+    """Serve BODY, cutting the first reply short and answering Range requests per the server's mode."""
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get("Range"))
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range") or "")
+        if match is None or server.mode == "ignore_range":
+            body, status, start = server.body, 200, 0
+        elif server.mode == "wrong_offset":
+            start = int(match.group(1)) // 2
+            body, status = server.body[start:], 206
+        else:
+            start = int(match.group(1))
+            body, status = server.body[start:], 206
+        self.send_response(status)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{len(server.body) - 1}/{len(server.body)}")
+        self.end_headers()
+        if len(server.requests) == 1 and server.cut:
+            self.wfile.write(body[:len(body) // 3])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def drive(monkeypatch):
+    monkeypatch.setattr(image_utils.time, "sleep", lambda seconds: None)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DriveStandIn)
+    server.requests, server.mode, server.body, server.cut = [], "resume", BODY, True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def download(server, tmp_path):
+    url = f"http://127.0.0.1:{server.server_address[1]}/file"
+    session = requests.Session()
+    response = session.get(url, stream=True, timeout=10)
+    with open(tmp_path / "image.png", "wb") as out_file:
+        digest = stream_to_file(session, url, {}, response, out_file)
+    return digest, (tmp_path / "image.png").read_bytes()
+
+@pytest.mark.parametrize("mode, expected_ranges", [
+    ("resume", lambda r: r[1].startswith("bytes=") and r[1] != "bytes=0-"),
+    ("ignore_range", lambda r: r[1].startswith("bytes=")),
+    ("wrong_offset", lambda r: r[2] is None),
+])
+def test_interrupted_download_completes(drive, tmp_path, mode, expected_ranges):
+    drive.mode = mode
+    digest, data = download(drive, tmp_path)
+    assert data == BODY
+    assert digest == hashlib.sha256(BODY).hexdigest()
+    assert drive.requests[0] is None
+    assert expected_ranges(drive.requests)
+
+def test_non_image_body_is_rejected(drive, tmp_path):
+    drive.body, drive.cut = b"<html>Sign in to continue</html>", False
+    with pytest.raises(DownloadError):
+        download(drive, tmp_path)
+
+def test_heic_and_avif_are_images():
+    assert is_image_data(b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00")
+    assert is_image_data(b"\x00\x00\x00\x1cftypavif\x00\x00\x00\x00")
+    assert not is_image_data(b"\x00\x00\x00\x18ftypisom\x00\x00\x00\x00")
+    assert not is_image_data(b"<!DOCTYPE html>")
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+import pytest
+import requests
+import governor_utils
+import lease_utils
+from lease_utils import HttpLeaseClient, LeaseStore, make_server, run_worker
+
+FORM_URL = "https://docs.google.com/forms/d/x/viewform"
+
+@pytest.fixture
+def store(tmp_path):
+    store = LeaseStore(tmp_path / "rows.leases.db")
+    with store._connect() as conn:
+        for row_idx in range(2, 12):
+            conn.execute("INSERT INTO rows (row_idx, payload) VALUES (?, ?)", (row_idx, f'["row {row_idx}"]'))
+        for key, value in (("headers", '["Name"]'), ("form_url", f'"{FORM_URL}"'), ("input_file", '"rows.xlsx"')):
+            conn.execute("INSERT INTO meta VALUES (?, ?)", (key, value))
+    return store
+
+@pytest.fixture
+def service(store):
+    server = make_server(store, "s3cret", port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_service_requires_the_shared_token(service):
+    assert requests.get(f"{service}/counts", timeout=5).status_code == 401
+    assert requests.post(f"{service}/claim", json={"worker": "w"}, timeout=5).status_code == 401
+    with pytest.raises(requests.HTTPError):
+        HttpLeaseClient(service, "guess").claim("w")
+    client = HttpLeaseClient(service, "s3cret")
+    assert client.claim("w")["row_idx"] == 2
+    assert client.counts() == {"leased": 1, "pending": 9}
+
+def test_service_listens_on_loopback_by_default(store):
+    server = make_server(store, "s3cret", port=0)
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+    finally:
+        server.server_close()
+    with pytest.raises(ValueError):
+        make_server(store, "", port=0)
+
+class FakeDriver:
+    def execute_script(self, script, *args):
+        return 1
+
+    def quit(self):
+        pass
+
+@pytest.fixture
+def mock_form(tmp_path, monkeypatch):
+    """Replace the browser side of run_worker with an in-memory form that records submissions."""
+    import driver_utils
+    import form_utils
+    import index_utils
+
+    form = {"submitted": [], "lock": threading.Lock(), "before_submit_hook": None}
+
+    def fill_google_form(driver, row, headers, header_mapping, config, progress=None, before_submit=None):
+        governor_utils.acquire_slot("submit")
+        if form["before_submit_hook"] is not None:
+            form["before_submit_hook"](row)
+        if before_submit is not None and not before_submit():
+            return False
+        with form["lock"]:
+            form["submitted"].append(row[0])
+        return True
+
+    real_index = index_utils.SubmissionIndex
+    monkeypatch.setattr(driver_utils, "initialize_driver", lambda config: FakeDriver())
+    monkeypatch.setattr(form_utils, "get_form_headers", lambda driver, config: ["Name"])
+    monkeypatch.setattr(form_utils, "fill_google_form", fill_google_form)
+    monkeypatch.setattr(index_utils, "SubmissionIndex", lambda: real_index(tmp_path / "index.db"))
+    return form
+
+def run_workers(queues, config=None):
+    results, errors = {}, []
+    config = config or {"RATE_GOVERNOR": False}
+
+    def work(name, queue):
+        try:
+            results[name] = run_worker(config, queue, worker=name)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(f"worker-{i}", queue)) for i, queue in enumerate(queues)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert not any(thread.is_alive() for thread in threads)
+    assert errors == []
+    return results
+
+def worker_process(db_path, service_url, workdir, name, results):
+    """Run one lease worker in its own process against a browserless form that logs each submission."""
+    os.chdir(workdir)
+    import driver_utils
+    import form_utils
+    import index_utils
+
+    def fill_google_form(driver, row, headers, header_mapping, config, progress=None, before_submit=None):
+        if before_submit is not None and not before_submit():
+            return False
+        # O_APPEND writes of one short line do not interleave between processes
+        with open(os.path.join(workdir, "submitted.txt"), "a", encoding="utf-8") as f:
+            f.write(f"{row[0]}\n")
+        time.sleep(0.02)
+        return True
+
+    driver_utils.initialize_driver = lambda config: FakeDriver()
+    form_utils.get_form_headers = lambda driver, config: ["Name"]
+    form_utils.fill_google_form = fill_google_form
+    real_index = index_utils.SubmissionIndex
+    index_utils.SubmissionIndex = lambda: real_index(os.path.join(workdir, "index.db"))
+    lease_utils.IDLE_POLL_SECONDS = 0.05
+    queue = HttpLeaseClient(service_url, "s3cret") if service_url else LeaseStore(db_path)
+    results[name] = run_worker({"RATE_GOVERNOR": False}, queue, worker=name)
+
+def test_worker_processes_submit_every_row_once(store, service, tmp_path):
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.dict()
+        processes = [
+            context.Process(target=worker_process, args=(store.path, url, str(tmp_path), f"worker-{i}", results))
+            for i, url in enumerate([None, service, None, service])
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+        results = dict(results)
+    submitted = (tmp_path / "submitted.txt").read_text(encoding="utf-8").splitlines()
+    assert sorted(submitted) == sorted(f"row {idx}" for idx in range(2, 12))
+    assert sum(results.values()) == 10
+    assert store.counts() == {"done": 10}
+
+def test_enqueued_rows_hash_like_the_input(tmp_path, monkeypatch):
+    import excel_utils
+    import index_utils
+    from index_utils import row_hash
+
+    headers = ["Name", "Length", "Cost", "Date of Damage"]
+    rows = [["Cable  A", 12.0, Decimal("3.50"), datetime(2024, 3, 7, 9, 30)]]
+    monkeypatch.setattr(excel_utils, "read_input_data", lambda path: (headers, rows))
+    monkeypatch.setattr(excel_utils, "open_status", lambda path, headers, rows: {})
+    real_index = index_utils.SubmissionIndex
+    monkeypatch.setattr(index_utils, "SubmissionIndex", lambda: real_index(tmp_path / "index.db"))
+
+    store = LeaseStore(tmp_path / "rows.leases.db")
+    assert store.enqueue(tmp_path / "rows.xlsx", FORM_URL) == 1
+    leased = store.claim("w")["row"]
+    assert leased == ["Cable A", "12", "3.50", "2024-03-07"]
+    assert row_hash(headers, leased) == row_hash(headers, rows[0])
+
+def test_row_with_lost_lease_is_not_submitted(store, mock_form):
+    stolen = []
+
+    def steal_first_row(row):
+        # While worker-0 fills row 2 its lease expires and another worker re-claims the row
+        if row[0] == "row 2" and not stolen:
+            with store._connect() as conn:
+                conn.execute("UPDATE rows SET lease_expires = 0 WHERE row_idx = 2")
+            stolen.append(store.claim("other-worker"))
+            store.complete("other-worker", 2, True)
+
+    mock_form["before_submit_hook"] = steal_first_row
+    assert run_workers([store]) == {"worker-0": 10}
+    assert stolen[0]["row_idx"] == 2
+    assert "row 2" not in mock_form["submitted"]
+    assert len(mock_form["submitted"]) == 9
+    assert store.counts() == {"done": 10}
+
+def test_worker_draws_from_the_shared_governor(store, mock_form, tmp_path):
+    path = tmp_path / "governor.db"
+    config = {"GOVERNOR_DB": str(path), "SUBMIT_RATE_PER_MIN": 600}
+    start = time.monotonic()
+    assert run_workers([store], config) == {"worker-0": 10}
+    # A burst of 2, then one token every 0.1s for the other 8 rows
+    assert time.monotonic() - start >= 0.7
+    assert governor_utils._governor.path == path
+    assert governor_utils._governor._take("submit") > 0
+
+def teardown_function():
+    governor_utils._governor = None
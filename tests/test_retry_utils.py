@@ -0,0 +1,31 @@
+import time
+import pytest
+import retry_utils
+from retry_utils import RetryBudgetExceeded, StepRetryPolicy
+
+def test_budget_starts_at_first_step():
+    policy = StepRetryPolicy(budget_seconds=0.05)
+    time.sleep(0.1)  # Page load, downloads and fills before the first upload
+    assert policy.run("send file", lambda: "sent") == "sent"
+
+def test_every_attempt_is_clipped_to_the_budget():
+    policy = StepRetryPolicy(budget_seconds=10)
+    assert policy.run("first upload", lambda: policy.timeout(30)) <= 10
+    policy.deadline = time.monotonic() - 1
+    assert policy.timeout(30) == 0
+    with pytest.raises(RetryBudgetExceeded):
+        policy.run("second upload", lambda: "ok")
+
+def test_retries_stop_when_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(retry_utils.time, "sleep", lambda seconds: None)
+    policy = StepRetryPolicy(max_attempts=5, budget_seconds=0.05)
+    calls = []
+
+    def step():
+        calls.append(1)
+        policy.deadline = time.monotonic() - 1  # Budget runs out during the first attempt
+        raise RuntimeError("picker did not open")
+
+    with pytest.raises(RetryBudgetExceeded):
+        policy.run("open picker", step)
+    assert len(calls) == 1
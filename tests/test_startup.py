@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("selenium", "openpyxl", "bs4", "fuzzywuzzy", "requests", "form_utils", "excel_utils")
+
+def test_main_imports_within_startup_budget(tmp_path):
+    probe = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import main\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'budget': main.STARTUP_BUDGET_SECONDS,"
+        f" 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    env = dict(os.environ, APPDATA=str(tmp_path), PYTHONPATH=str(REPO))
+    result = subprocess.run(
+        [sys.executable, "-c", probe], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report["heavy"] == []
+    # Importing main must leave most of the budget for creating the window
+    assert report["elapsed"] < report["budget"] / 2
+
+def test_over_budget_start_warns(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv("APPDATA", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    import main
+
+    assert main.check_startup_budget(main.STARTUP_BUDGET_SECONDS / 2)
+    assert not main.check_startup_budget(main.STARTUP_BUDGET_SECONDS + 0.5)
+    assert "over the" in caplog.text
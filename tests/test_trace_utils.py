@@ -0,0 +1,24 @@
+from trace_utils import FormTracer
+
+class TabbedDriver:
+    """Stand-in driver whose DevTools commands go to the current tab, like chromedriver's."""
+    def __init__(self):
+        self.current_window_handle = "tab-1"
+        self.enabled = set()
+
+    def execute_cdp_cmd(self, cmd, params):
+        if cmd == "Performance.enable":
+            self.enabled.add(self.current_window_handle)
+            return {}
+        assert self.current_window_handle in self.enabled, "Performance is not enabled in this tab"
+        return {"metrics": [{"name": "TaskDuration", "value": 1.0}]}
+
+def test_metrics_are_enabled_in_every_tab(tmp_path):
+    tracer = FormTracer(tmp_path)
+    driver = TabbedDriver()
+    assert tracer._metrics(driver) == {"TaskDuration": 1.0}
+    # A preloaded tab becomes current for the next row
+    driver.current_window_handle = "tab-2"
+    assert tracer._metrics(driver) == {"TaskDuration": 1.0}
+    assert driver.enabled == {"tab-1", "tab-2"}
+    tracer.close()
@@ -0,0 +1,51 @@
+import os
+import watch_utils
+from watch_utils import WatchState, scan_file, watched_files
+
+def write_csv(path, rows, mtime):
+    path.write_text("\n".join(",".join(row) for row in [["Name", "Age"]] + rows) + "\n", encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+def handle(state, path, result):
+    headers, changed, scanned = result
+    for row_idx, row, digest in changed:
+        state.set_fingerprint(path, row_idx, digest)
+    state.save_file(path, *scanned)
+    return [row_idx for row_idx, _, _ in changed]
+
+def test_only_new_and_edited_rows_are_returned(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_utils, "REVERIFY_TAIL_ROWS", 2)
+    path = tmp_path / "rows.csv"
+    state = WatchState(tmp_path / "watch.db")
+    write_csv(path, [["a", "1"], ["b", "2"], ["c", "3"], ["", ""]], 1000)
+    assert handle(state, path, scan_file(state, path)) == [2, 3, 4]
+    assert scan_file(state, path) is None
+
+    write_csv(path, [["a", "9"], ["b", "2"], ["c", "30"], ["d", "4"]], 2000)
+    # Row 2 lies above the re-verified tail, so its edit is not read
+    assert handle(state, path, scan_file(state, path)) == [4, 5]
+
+def test_unsettled_files_and_lock_files_are_skipped(tmp_path):
+    path = tmp_path / "rows.csv"
+    write_csv(path, [["a", "1"]], 1000)
+    (tmp_path / "~$rows.xlsx").write_text("")
+    (tmp_path / "rows.csv.status.json").write_text("{}")
+    assert watched_files(tmp_path) == [path]
+    state = WatchState(tmp_path / "watch.db")
+    os.utime(path)  # Just saved
+    assert scan_file(state, path) is None
+
+def test_rows_left_unhandled_are_found_again(tmp_path):
+    path = tmp_path / "rows.csv"
+    state = WatchState(tmp_path / "watch.db")
+    write_csv(path, [["a", "1"], ["b", "2"]], 1000)
+    headers, changed, scanned = scan_file(state, path)
+    # Stopped after the first row: no file state is recorded, so both scans see row 3 again
+    row_idx, _, digest = changed[0]
+    state.set_fingerprint(path, row_idx, digest)
+    assert [row_idx for row_idx, _, _ in scan_file(state, path)[1]] == [3]
+
+    # A failed row stays unfingerprinted; a forced scan finds it although the file is unchanged
+    state.save_file(path, *scanned)
+    assert scan_file(state, path) is None
+    assert [row_idx for row_idx, _, _ in scan_file(state, path, force=True)[1]] == [3]
@@ -0,0 +1,41 @@
+import pytest
+import watchdog_utils
+from watchdog_utils import BrowserWatchdog
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return 1
+
+    def quit(self):
+        pass
+
+@pytest.fixture
+def watchdog(monkeypatch):
+    monkeypatch.setattr(watchdog_utils, "close_driver", lambda driver: None)
+    watchdog = BrowserWatchdog({"MAX_DRIVER_RESTARTS": 2, "HEALTHY_ROWS_TO_RESET_RESTARTS": 3}, FakeDriver)
+    watchdog.rss_mb = lambda: 0
+    watchdog.start()
+    return watchdog
+
+def crash(watchdog):
+    watchdog.driver.alive = False
+    return watchdog.recover()
+
+def test_crashes_spread_over_a_long_run_do_not_give_up(watchdog):
+    for _ in range(5):
+        assert crash(watchdog)
+        for _ in range(3):
+            watchdog.after_row()
+    assert watchdog.restarts == 0
+
+def test_consecutive_crashes_give_up(watchdog):
+    assert crash(watchdog)
+    watchdog.after_row()
+    assert crash(watchdog)
+    with pytest.raises(RuntimeError):
+        crash(watchdog)
@@ -0,0 +1,169 @@
+import json
+import logging
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from network_utils import network_log
+
+# Performance.getMetrics counters that split a span into script, layout and style work
+DURATION_METRICS = ("TaskDuration", "ScriptDuration", "LayoutDuration", "RecalcStyleDuration")
+COUNT_METRICS = ("LayoutCount", "RecalcStyleCount", "Nodes", "JSHeapUsedSize")
+SLOWEST_REQUESTS = 5
+
+_active = None
+
+class FormTracer:
+    """Collect DevTools page metrics and network timing per traced span and write one JSONL line per row."""
+    def __init__(self, trace_dir):
+        self.path = Path(trace_dir) / f"trace-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        # Performance.enable applies to one target, so it is tracked per driver and window handle
+        self.enabled_tabs = weakref.WeakKeyDictionary()
+        self.row = None
+        self.spans = []
+        self.stage_counts = {}
+        self.row_started_at = None
+
+    def _metrics(self, driver):
+        """Return the page's Performance.getMetrics counters as a dict."""
+        tabs = self.enabled_tabs.setdefault(driver, set())
+        handle = driver.current_window_handle
+        if handle not in tabs:
+            driver.execute_cdp_cmd("Performance.enable", {"timeDomain": "timeTicks"})
+            tabs.add(handle)
+        result = driver.execute_cdp_cmd("Performance.getMetrics", {})
+        return {m["name"]: m["value"] for m in result.get("metrics", [])}
+
+    @contextmanager
+    def span(self, driver, name):
+        """Trace the wrapped block: wall time, page metric deltas and the requests it made."""
+        try:
+            events = network_log(driver)
+            mark = events.mark()
+            before = self._metrics(driver)
+        except Exception as e:
+            logging.warning(f"Could not start trace span '{name}': {e}")
+            yield
+            return
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            record = {"span": name, "seconds": round(time.perf_counter() - start, 4)}
+            if error:
+                record["error"] = error[:200]
+            try:
+                after = self._metrics(driver)
+                events.poll()
+                # Counters restart with a new document, so a span that navigated reports the new page's totals
+                navigated = after.get("NavigationStart") != before.get("NavigationStart")
+                baseline = {} if navigated else before
+                record["navigated"] = navigated
+                record["page"] = {
+                    key: round(after.get(key, 0) - baseline.get(key, 0), 4)
+                    for key in DURATION_METRICS + COUNT_METRICS
+                }
+                record["network"] = summarize_network(events.events_since(mark))
+            except Exception as e:
+                logging.warning(f"Could not finish trace span '{name}': {e}")
+            self.spans.append(record)
+
+    def start_row(self, row_idx, progress):
+        """Start collecting spans for a row, remembering where its Python stage samples begin."""
+        self.row = row_idx
+        self.spans = []
+        self.stage_counts = {stage: len(values) for stage, values in progress.samples().items()}
+        self.row_started_at = time.time()
+
+    def finish_row(self, success, progress):
+        """Write the row's spans alongside the Python stage timings it added."""
+        stages = {
+            stage: [round(v, 4) for v in values[self.stage_counts.get(stage, 0):]]
+            for stage, values in progress.samples().items()
+        }
+        record = {
+            "row": self.row,
+            "started_at": self.row_started_at,
+            "success": success,
+            "spans": self.spans,
+            "stages": {stage: values for stage, values in stages.items() if values},
+        }
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.row = None
+        self.spans = []
+
+    def close(self):
+        """Close the trace file."""
+        self.file.close()
+        logging.info(f"Browser trace written to {self.path}")
+
+def summarize_network(events):
+    """Summarize Network events: request count, bytes, phase totals and the slowest requests."""
+    requests = {}
+    for event in events:
+        params = event.get("params", {})
+        request_id = params.get("requestId")
+        name = event.get("method")
+        if name == "Network.requestWillBeSent":
+            requests[request_id] = {
+                "url": params.get("request", {}).get("url", "")[:160],
+                "type": params.get("type"),
+                "start": params.get("timestamp"),
+            }
+        elif request_id in requests:
+            request = requests[request_id]
+            if name == "Network.responseReceived":
+                response = params.get("response", {})
+                request["status"] = response.get("status")
+                request["cached"] = bool(response.get("fromDiskCache") or response.get("fromServiceWorker"))
+                timing = response.get("timing") or {}
+                if timing:
+                    request["dns_ms"] = max(timing.get("dnsEnd", -1) - timing.get("dnsStart", -1), 0)
+                    request["connect_ms"] = max(timing.get("connectEnd", -1) - timing.get("connectStart", -1), 0)
+                    request["wait_ms"] = max(timing.get("receiveHeadersEnd", 0) - timing.get("sendEnd", 0), 0)
+            elif name == "Network.loadingFinished":
+                request["bytes"] = params.get("encodedDataLength", 0)
+                request["ms"] = round((params.get("timestamp", request["start"]) - request["start"]) * 1000, 1)
+            elif name == "Network.loadingFailed":
+                request["error"] = params.get("errorText")
+                request["ms"] = round((params.get("timestamp", request["start"]) - request["start"]) * 1000, 1)
+    finished = [r for r in requests.values() if "ms" in r]
+    summary = {
+        "requests": len(requests),
+        "bytes": sum(r.get("bytes", 0) for r in finished),
+        "cached": sum(1 for r in finished if r.get("cached")),
+        "failed": sum(1 for r in finished if "error" in r),
+        "dns_ms": round(sum(r.get("dns_ms", 0) for r in finished), 1),
+        "connect_ms": round(sum(r.get("connect_ms", 0) for r in finished), 1),
+        "wait_ms": round(sum(r.get("wait_ms", 0) for r in finished), 1),
+    }
+    slowest = sorted(finished, key=lambda r: -r["ms"])[:SLOWEST_REQUESTS]
+    summary["slowest"] = [{k: v for k, v in r.items() if k != "start"} for r in slowest]
+    return summary
+
+def start_tracing(trace_dir):
+    """Turn on tracing for the rest of the run and return the tracer."""
+    global _active
+    _active = FormTracer(trace_dir)
+    logging.info(f"Browser tracing enabled, writing to {_active.path}")
+    return _active
+
+def stop_tracing():
+    """Turn tracing off and close the trace file."""
+    global _active
+    if _active is not None:
+        _active.close()
+        _active = None
+
+def trace_span(driver, name):
+    """Trace a block when tracing is on; a no-op context otherwise."""
+    if _active is None or _active.row is None:
+        return nullcontext()
+    return _active.span(driver, name)
@@ -0,0 +1,304 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+WATCH_POLL_SECONDS = 2
+# A file must be unchanged this long before it is read, so a save in progress is never parsed
+SETTLE_SECONDS = 2
+# Rows just below the high-water mark are fingerprinted again on every change, to catch edits to recent rows
+REVERIFY_TAIL_ROWS = 50
+# Failed rows are retried with exponential backoff, then left for the user to edit
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 600
+MAX_ROW_ATTEMPTS = 5
+DEFAULT_WATCH_STATE_PATH = Path(os.getenv("APPDATA", ".")) / "TRC_AUTO" / "watch.db"
+DEFAULT_CONFIG_PATH = Path(os.getenv("APPDATA", ".")) / "TRC_AUTO" / "config.json"
+
+def _is_blank(row):
+    """Tell whether a row has no values at all."""
+    return all(value in ("", None) for value in row)
+
+class WatchState:
+    """Per-file high-water marks and row fingerprints for watch mode, kept in SQLite."""
+    def __init__(self, path=DEFAULT_WATCH_STATE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL,"
+            " headers TEXT NOT NULL, high_water INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " path TEXT NOT NULL, row_idx INTEGER NOT NULL, row_hash TEXT NOT NULL, PRIMARY KEY (path, row_idx));"
+        )
+        self.conn.commit()
+
+    def file(self, path):
+        """Return (mtime, size, headers, high_water) recorded for a file, or None."""
+        row = self.conn.execute(
+            "SELECT mtime, size, headers, high_water FROM files WHERE path = ?", (str(path),)
+        ).fetchone()
+        return (row[0], row[1], json.loads(row[2]), row[3]) if row else None
+
+    def save_file(self, path, mtime, size, headers, high_water):
+        """Record that a file was scanned up to high_water at the given mtime and size."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, mtime, size, headers, high_water) VALUES (?, ?, ?, ?, ?)",
+                (str(path), mtime, size, json.dumps(headers, ensure_ascii=False), high_water)
+            )
+
+    def fingerprints(self, path, start_row):
+        """Return {row_idx: row_hash} for a file's rows from start_row on."""
+        rows = self.conn.execute(
+            "SELECT row_idx, row_hash FROM fingerprints WHERE path = ? AND row_idx >= ?", (str(path), start_row)
+        )
+        return dict(rows.fetchall())
+
+    def set_fingerprint(self, path, row_idx, digest):
+        """Remember the content a row had when it was handled."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (path, row_idx, row_hash) VALUES (?, ?, ?)",
+                (str(path), row_idx, digest)
+            )
+
+    def forget(self, path):
+        """Drop a file's state so its next change is scanned from the top."""
+        with self.conn:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (str(path),))
+            self.conn.execute("DELETE FROM fingerprints WHERE path = ?", (str(path),))
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+def watched_files(folder):
+    """Return the supported input files in a folder, skipping Office lock files."""
+    from excel_utils import INPUT_READERS
+
+    return sorted(
+        path for path in Path(folder).iterdir()
+        if path.is_file() and path.suffix.lower() in INPUT_READERS and not path.name.startswith("~$")
+    )
+
+def _read_rows(path, start_row):
+    """Return (headers, Note column position in the raw header row, [(row_idx, row)]) from start_row on."""
+    from excel_utils import InputRows
+
+    with InputRows(path, start_row) as rows:
+        return rows.headers, rows.note_position, list(rows)
+
+def scan_file(state, path, force=False):
+    """Return (headers, [(row_idx, row, row_hash)], scanned) for a changed file's new or edited rows, or None.
+
+    Only rows from a little below the high-water mark are read; the whole sheet is read
+    when the file is new, shrank or its header row changed. force reads the tail even if
+    the file is unchanged. Pass scanned to WatchState.save_file once the rows are handled.
+    """
+    from excel_utils import row_note
+    from index_utils import row_hash
+
+    stat = path.stat()
+    if time.time() - stat.st_mtime < SETTLE_SECONDS:
+        return None
+    known = state.file(path)
+    if not force and known and known[0] == stat.st_mtime and known[1] == stat.st_size:
+        return None
+
+    start_row = 2
+    if known and stat.st_size >= known[1]:
+        start_row = max(known[3] - REVERIFY_TAIL_ROWS + 1, 2)
+    try:
+        headers, note_index, rows = _read_rows(path, start_row)
+    except Exception as e:
+        logging.warning(f"Could not read {path.name} yet, will retry: {e}")
+        return None
+    if known and headers != known[2] and start_row > 2:
+        logging.info(f"Header row of {path.name} changed, rescanning the whole sheet")
+        state.forget(path)
+        start_row = 2
+        headers, note_index, rows = _read_rows(path, start_row)
+
+    seen = state.fingerprints(path, start_row)
+    high_water = known[3] if known and start_row > 2 else 1
+    changed = []
+    for row_idx, row in rows:
+        if _is_blank(row):
+            continue
+        high_water = max(high_water, row_idx)
+        digest = row_hash(headers, row)
+        if seen.get(row_idx) == digest:
+            continue
+        if row_note(note_index, row) == "Inserted":
+            # Submitted by a normal run, which writes its notes into the workbook
+            state.set_fingerprint(path, row_idx, digest)
+            continue
+        changed.append((row_idx, row, digest))
+    if changed:
+        logging.info(f"{path.name}: {len(changed)} new or changed rows (read from row {start_row})")
+    return headers, changed, (stat.st_mtime, stat.st_size, headers, high_water)
+
+def run_watch(config, folder, stop=None, state_path=DEFAULT_WATCH_STATE_PATH):
+    """Watch a folder and submit new or changed rows on one long-running browser session.
+
+    Row notes go to <file>.status.json sidecars, never into a workbook a field team may have open.
+    """
+    from driver_utils import initialize_driver
+    from excel_utils import SidecarStatus
+    from form_utils import fill_google_form, get_form_headers
+    from governor_utils import SignInRequired, configure_governor, throttled_since, wait_out_pause
+    from index_utils import SubmissionIndex
+    from matching_utils import match_headers
+    from progress_utils import ProgressTracker
+    from watchdog_utils import BrowserWatchdog
+
+    stop = stop or threading.Event()
+    configure_governor(config)
+    state = WatchState(state_path)
+    index = SubmissionIndex()
+    progress = ProgressTracker()
+    watchdog = BrowserWatchdog(config, lambda: initialize_driver(config))
+    mappings = {}
+    # (path, row_idx) -> [attempts, next_try_at, headers, row, row_hash] for rows that failed
+    retries = {}
+    processed = 0
+
+    def process(path, headers, row_idx, row, digest, status):
+        """Submit one row; True once it is done, False if it should be retried."""
+        key = tuple(headers)
+        if key not in mappings:
+            mappings[key], _ = match_headers(headers, form_headers)
+        if index.contains(config["GOOGLE_FORM_URL"], headers, row):
+            status.set(row_idx, "Inserted")
+            state.set_fingerprint(path, row_idx, digest)
+            return True
+        logging.info(f"Processing {path.name} row {row_idx}")
+        progress.row_started(row_idx)
+
+        def attempt():
+            try:
+                return fill_google_form(watchdog.driver, row, headers, mappings[key], config, progress)
+            except SignInRequired:
+                raise
+            except Exception as e:
+                logging.error(f"Browser session failed on {path.name} row {row_idx}: {e}")
+                return False
+
+        row_started_at = time.time()
+        success = attempt()
+        if not success and watchdog.recover():
+            logging.warning(f"Browser session restarted, retrying {path.name} row {row_idx}")
+            success = attempt()
+        elif not success and throttled_since(row_started_at):
+            wait_out_pause(throttled_since(row_started_at))
+            success = attempt()
+        progress.row_finished(row_idx, success)
+        if success:
+            index.add(config["GOOGLE_FORM_URL"], headers, row, source=path.name)
+            status.set(row_idx, "Inserted")
+            # Only handled rows are fingerprinted, so an interrupted or failed row is picked up again
+            state.set_fingerprint(path, row_idx, digest)
+        status.save()
+        watchdog.after_row()
+        return success
+
+    def failed(path, headers, row_idx, row, digest, status):
+        """Schedule a failed row for another try, or give up on it after MAX_ROW_ATTEMPTS."""
+        entry = retries.get((path, row_idx))
+        attempts = entry[0] + 1 if entry and entry[4] == digest else 1
+        if attempts >= MAX_ROW_ATTEMPTS:
+            retries.pop((path, row_idx), None)
+            status.set(row_idx, f"Failed to insert row {row_idx-1} after {attempts} attempts: edit the row to retry it")
+            state.set_fingerprint(path, row_idx, digest)
+            status.save()
+            return
+        delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+        retries[(path, row_idx)] = [attempts, time.monotonic() + delay, headers, row, digest]
+        status.set(row_idx, f"Failed to insert row {row_idx-1} (attempt {attempts}), retrying in {delay}s")
+        status.save()
+
+    try:
+        form_headers = get_form_headers(watchdog.start(), config)
+        logging.info(f"Watching {folder} for new rows every {WATCH_POLL_SECONDS}s")
+        # The first pass re-reads every file's tail, so rows left unhandled by the last run are found
+        force = True
+        while not stop.is_set():
+            did_work = False
+            for path in watched_files(folder):
+                if stop.is_set():
+                    break
+                result = scan_file(state, path, force)
+                if result is None:
+                    continue
+                headers, changed, scanned = result
+                status = SidecarStatus(path)
+                for row_idx, row, digest in changed:
+                    if stop.is_set():
+                        break
+                    entry = retries.get((path, row_idx))
+                    if entry and entry[4] == digest:
+                        continue  # Unchanged failed row, left to its backoff below
+                    did_work = True
+                    processed += 1
+                    if process(path, headers, row_idx, row, digest, status):
+                        retries.pop((path, row_idx), None)
+                    else:
+                        failed(path, headers, row_idx, row, digest, status)
+                status.save()  # Rows skipped as already indexed only set notes
+                if not stop.is_set():
+                    # Recorded last, so a stop mid-file leaves the file to be scanned again
+                    state.save_file(path, *scanned)
+            force = False
+
+            now = time.monotonic()
+            for (path, row_idx), (_, next_try_at, headers, row, digest) in list(retries.items()):
+                if stop.is_set() or next_try_at > now or not path.exists():
+                    continue
+                did_work = True
+                processed += 1
+                status = SidecarStatus(path)
+                if process(path, headers, row_idx, row, digest, status):
+                    retries.pop((path, row_idx), None)
+                else:
+                    failed(path, headers, row_idx, row, digest, status)
+            if not did_work:
+                stop.wait(WATCH_POLL_SECONDS)
+    finally:
+        index.close()
+        state.close()
+        watchdog.stop()
+    logging.info(f"Watch mode stopped after {processed} rows")
+    return processed
+
+def run_cli(argv=None):
+    """Command line entry point for watch mode."""
+    parser = argparse.ArgumentParser(description="Submit rows appended to workbooks in a folder as they are saved")
+    parser.add_argument("folder", help="Folder with the .xlsx, .xlsm or .csv files to watch")
+    parser.add_argument("--config", default=str(DEFAULT_CONFIG_PATH))
+    parser.add_argument("--state", default=str(DEFAULT_WATCH_STATE_PATH), help="Path to the watch state database")
+    parser.add_argument("--reset", action="store_true", help="Forget high-water marks and fingerprints first")
+    args = parser.parse_args(argv)
+
+    if not Path(args.folder).is_dir():
+        parser.error(f"Not a folder: {args.folder}")
+    if args.reset:
+        state = WatchState(args.state)
+        for path in watched_files(args.folder):
+            state.forget(path)
+        state.close()
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    try:
+        run_watch(config, args.folder, state_path=args.state)
+    except KeyboardInterrupt:
+        logging.info("Watch mode interrupted")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    run_cli()
@@ -0,0 +1,130 @@
+import logging
+import threading
+import psutil
+from driver_utils import close_driver
+
+RECYCLE_AFTER_ROWS = 150
+RECYCLE_RSS_MB = 1500
+MAX_DRIVER_RESTARTS = 3
+# Rows a restarted session must finish before its earlier crashes stop counting toward MAX_DRIVER_RESTARTS
+HEALTHY_ROWS_TO_RESET_RESTARTS = 5
+RESPONSIVE_TIMEOUT = 10
+
+class BrowserWatchdog:
+    """Own the WebDriver session and recycle it on row count, memory growth or a crash."""
+    def __init__(self, config, start_session):
+        self.start_session = start_session
+        self.recycle_after_rows = config.get("RECYCLE_AFTER_ROWS", RECYCLE_AFTER_ROWS)
+        self.max_rss_mb = config.get("RECYCLE_RSS_MB", RECYCLE_RSS_MB)
+        self.max_restarts = config.get("MAX_DRIVER_RESTARTS", MAX_DRIVER_RESTARTS)
+        self.healthy_rows_to_reset = config.get("HEALTHY_ROWS_TO_RESET_RESTARTS", HEALTHY_ROWS_TO_RESET_RESTARTS)
+        self.driver = None
+        self.rows_since_start = 0
+        self.restarts = 0
+
+    def start(self):
+        """Launch a new session and return its driver."""
+        self.driver = self.start_session()
+        self.rows_since_start = 0
+        return self.driver
+
+    def _process_tree(self):
+        """Return the chromedriver process and every browser process it launched."""
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            return [root] + root.children(recursive=True)
+        except (AttributeError, psutil.Error):
+            return []
+
+    def rss_mb(self):
+        """Return the resident memory of the session's process tree in MB."""
+        total = 0
+        for proc in self._process_tree():
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def is_responsive(self, timeout=RESPONSIVE_TIMEOUT):
+        """Tell whether the browser answers a trivial script within timeout seconds."""
+        result = {}
+
+        def ping():
+            try:
+                result["ok"] = self.driver.execute_script("return 1") == 1
+            except Exception as e:
+                result["error"] = e
+
+        worker = threading.Thread(target=ping, daemon=True)
+        worker.start()
+        worker.join(timeout)
+        if worker.is_alive():
+            logging.warning(f"Browser did not respond within {timeout}s")
+            return False
+        if "error" in result:
+            logging.warning(f"Browser health check failed: {result['error']}")
+        return result.get("ok", False)
+
+    def _kill_tree(self):
+        """Kill the session's processes when a normal quit is not possible."""
+        for proc in reversed(self._process_tree()):
+            try:
+                proc.kill()
+            except psutil.Error:
+                continue
+
+    def recycle(self, reason):
+        """Close the current session and start a fresh one."""
+        logging.info(f"Recycling browser session after {self.rows_since_start} rows: {reason}")
+        old_driver = self.driver
+        processes = self._process_tree()
+        try:
+            close_driver(old_driver)
+        except Exception as e:
+            logging.warning(f"Failed to close browser session cleanly, killing it: {e}")
+        for proc in reversed(processes):
+            try:
+                if proc.is_running():
+                    proc.kill()
+            except psutil.Error:
+                continue
+        return self.start()
+
+    def after_row(self):
+        """Count a finished row and recycle the session if it is due or too large."""
+        self.rows_since_start += 1
+        if self.restarts and self.rows_since_start >= self.healthy_rows_to_reset:
+            # Only consecutive crashes give up the run, not a few spread over a long one
+            logging.info(f"Browser session healthy for {self.rows_since_start} rows, clearing {self.restarts} restarts")
+            self.restarts = 0
+        rss = self.rss_mb()
+        logging.info(f"Browser session: {self.rows_since_start} rows, {rss:.0f} MB RSS")
+        if self.recycle_after_rows and self.rows_since_start >= self.recycle_after_rows:
+            self.recycle(f"reached {self.recycle_after_rows} rows")
+        elif self.max_rss_mb and rss > self.max_rss_mb:
+            self.recycle(f"memory {rss:.0f} MB above {self.max_rss_mb} MB")
+
+    def recover(self):
+        """Restart the session if it crashed or hung; returns True if it was restarted.
+
+        Gives up after more than max_restarts crashes without healthy_rows_to_reset rows in between.
+        """
+        if self.is_responsive():
+            return False
+        self.restarts += 1
+        if self.restarts > self.max_restarts:
+            raise RuntimeError(f"Browser crashed {self.restarts} times, giving up")
+        self.recycle("browser crashed or stopped responding")
+        return True
+
+    def stop(self):
+        """Close the current session."""
+        if self.driver is None:
+            return
+        try:
+            close_driver(self.driver)
+        except Exception as e:
+            logging.error(f"Error closing WebDriver: {e}")
+            self._kill_tree()
+        self.driver = None